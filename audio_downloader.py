@@ -0,0 +1,257 @@
+import argparse
+import base64
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from db_migrations import migrate
+from scrape_engine import RETRY_STATUSES, backoff_delay, retry_after
+
+# Downloads the audio files the scraper found (recordings whose file_path
+# is still a URL) into a local directory mirroring the site's paths:
+#
+#   python audio_downloader.py --db adidam_recordings.db --dest downloads
+#
+# Files are streamed to a .part file in chunks and resumed with a Range
+# request after a dropped connection or an interrupted run. A finished
+# file is checked against the size the server announced (and its
+# Repr-Digest/Digest SHA-256 when it sends one), renamed into place, and
+# its recordings repointed at it in one transaction.
+
+DOWNLOAD_DIR = 'downloads'
+WORKERS = 4
+CHUNK_SIZE = 64 * 1024
+MAX_RETRIES = 5
+TIMEOUT = 60
+PART_SUFFIX = '.part'
+
+Download = namedtuple('Download', 'url path size sha256 resumed_from')
+
+def local_path(url, dest_dir):
+    """Where a URL's file goes: dest_dir/host/path, with unsafe characters replaced"""
+    parts = urlsplit(url)
+    segments = [re.sub(r'[^\w.-]', '_', unquote(segment)) for segment in parts.path.split('/')]
+    segments = [segment for segment in segments if segment.strip('.')] or ['index']
+    if parts.query:
+        stem, ext = os.path.splitext(segments[-1])
+        segments[-1] = f"{stem}-{hashlib.sha1(parts.query.encode('utf-8')).hexdigest()[:8]}{ext}"
+    return os.path.abspath(os.path.join(dest_dir, re.sub(r'[^\w.-]', '_', parts.netloc), *segments))
+
+def assign_paths(urls, dest_dir, taken=()):
+    """{url: local path} for URLs to download together
+
+    URLs whose path another URL in the batch or an existing recording
+    (taken) already has get the first 8 hex digits of their SHA-1 appended,
+    so no two downloads write the same file.
+    """
+    by_path = {}
+    for url in sorted(urls):
+        by_path.setdefault(local_path(url, dest_dir), []).append(url)
+
+    paths = {}
+    for path, group in by_path.items():
+        for i, url in enumerate(group):
+            if i or path in taken:
+                stem, ext = os.path.splitext(path)
+                paths[url] = f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+            else:
+                paths[url] = path
+    return paths
+
+def announced_sha256(response):
+    """Hex SHA-256 from a Repr-Digest or Digest header (None if there isn't one)"""
+    for header, pattern in (('Repr-Digest', r'sha-256=:([^:]+):'), ('Digest', r'sha-256=([^,\s]+)')):
+        match = re.search(pattern, response.headers.get(header) or '', re.IGNORECASE)
+        if match:
+            try:
+                return base64.b64decode(match.group(1)).hex()
+            except ValueError:
+                return None
+    return None
+
+def total_size(response, offset):
+    """Full size of the file being sent (None if the server doesn't say)"""
+    content_range = response.headers.get('Content-Range') or ''
+    match = re.search(r'/(\d+)$', content_range)
+    if match:
+        return int(match.group(1))
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length and length.isdigit() else None
+
+def hash_file(path, hasher, chunk_size=CHUNK_SIZE):
+    """Feed a file to hasher in chunks"""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher
+
+class AudioDownloader:
+    """Downloads files through a requests.Session on a bounded pool of threads
+
+    The session can be the scraper's logged-in one. Each file is retried
+    up to max_retries times on connection errors and 429/5xx responses,
+    carrying on from the bytes already on disk.
+    """
+
+    def __init__(self, session=None, dest_dir=DOWNLOAD_DIR, workers=WORKERS, chunk_size=CHUNK_SIZE,
+                 max_retries=MAX_RETRIES, backoff_base=1.0, timeout=TIMEOUT):
+        self.session = session or requests.Session()
+        self.dest_dir = dest_dir
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+
+    def download(self, url, path):
+        """Download url to path; returns a Download
+
+        Raises ValueError for responses that retrying won't fix (e.g. a
+        404), or the last error once the retries are used up.
+        """
+        part = path + PART_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A file renamed into place by a run that died before updating the
+        # database: check it like a partial download
+        if os.path.exists(path) and not os.path.exists(part):
+            os.replace(path, part)
+
+        for attempt in range(self.max_retries + 1):
+            wait = None
+            try:
+                result, response = self._attempt(url, path, part)
+                if result is not None:
+                    return result
+                wait = retry_after(response)
+                error = IOError(f"status {response.status_code}")
+            except (requests.RequestException, IOError) as e:
+                error = e
+            if attempt == self.max_retries:
+                break
+            delay = max(backoff_delay(attempt, self.backoff_base), wait or 0)
+            logging.warning(f"Retrying {url} in {delay:.1f}s ({error})")
+            time.sleep(delay)
+        raise error
+
+    def _attempt(self, url, path, part):
+        """One request for the rest of a file; returns (Download or None to retry, response)"""
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Nothing left to send: the part is complete unless its size is off
+                if total_size(response, offset) != offset:
+                    os.remove(part)
+                    raise IOError(f"partial file doesn't match the server's ({offset} bytes)")
+                return self._finish(url, path, part, offset, None, offset), response
+            if response.status_code in RETRY_STATUSES:
+                return None, response
+            if response.status_code not in (200, 206):
+                raise ValueError(f"status {response.status_code}")
+
+            # A 200 (the server ignored the Range) starts the file over
+            resumed_from = offset if response.status_code == 206 else 0
+            if resumed_from and not (response.headers.get('Content-Range') or '').startswith(f"bytes {offset}-"):
+                raise IOError(f"unexpected Content-Range {response.headers.get('Content-Range')!r}")
+            expected_size = total_size(response, resumed_from)
+            expected_sha256 = announced_sha256(response)
+
+            with open(part, 'ab' if resumed_from else 'wb') as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    f.write(chunk)
+
+        size = os.path.getsize(part)
+        if expected_size is not None and size != expected_size:
+            # Cut off; the next attempt carries on from here
+            raise IOError(f"got {size} of {expected_size} bytes")
+        return self._finish(url, path, part, size, expected_sha256, resumed_from), response
+
+    def _finish(self, url, path, part, size, expected_sha256, resumed_from):
+        sha256 = hash_file(part, hashlib.sha256(), self.chunk_size).hexdigest()
+        if expected_sha256 and sha256 != expected_sha256:
+            os.remove(part)
+            raise IOError("SHA-256 doesn't match the server's; starting over")
+        os.replace(part, path)
+        return Download(url, path, size, sha256, resumed_from)
+
+    def run(self, db_path):
+        """Download every recording whose file_path is a URL and point it at the local file
+
+        Files download in parallel; the database is only written from this
+        thread, one transaction per file. Returns (downloaded, failed).
+        """
+        conn = sqlite3.connect(db_path)
+        try:
+            migrate(conn)
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT file_path FROM recordings
+                WHERE file_path LIKE 'http://%' OR file_path LIKE 'https://%'
+            """)
+            urls = [url for (url,) in cursor.fetchall()]
+            cursor.execute("""
+                SELECT file_path FROM recordings
+                WHERE file_path IS NOT NULL AND file_path NOT LIKE 'http://%' AND file_path NOT LIKE 'https://%'
+            """)
+            paths = assign_paths(urls, self.dest_dir, {path for (path,) in cursor.fetchall()})
+            logging.info(f"{len(urls)} audio files to download to {self.dest_dir}")
+
+            downloaded = failed = 0
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self.download, url, paths[url]): url for url in urls}
+                for future in as_completed(futures):
+                    url = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"Failed to download {url}: {e}")
+                        failed += 1
+                        continue
+
+                    # Every recording still pointing at the URL, in one go
+                    try:
+                        conn.execute(
+                            """
+                            UPDATE recordings
+                            SET file_path = ?, remote_url = ?, file_size = ?, file_sha256 = ?
+                            WHERE file_path = ?
+                            """,
+                            (result.path, url, result.size, result.sha256, url)
+                        )
+                        conn.commit()
+                    except sqlite3.Error as e:
+                        conn.rollback()
+                        logging.error(f"Downloaded {url} but couldn't update its recordings: {e}")
+                        failed += 1
+                        continue
+                    downloaded += 1
+                    resumed = f", resumed at {result.resumed_from} bytes" if result.resumed_from else ""
+                    logging.info(f"Downloaded {url} ({result.size} bytes{resumed})")
+
+            logging.info(f"Downloads complete: {downloaded} downloaded, {failed} failed")
+            return downloaded, failed
+        finally:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the scraped recordings' audio files")
+    parser.add_argument("--db", default="adidam_recordings.db", help="Recordings database")
+    parser.add_argument("--dest", default=DOWNLOAD_DIR, help="Directory to download into")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Files downloaded at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    downloaded, failed = AudioDownloader(dest_dir=args.dest, workers=args.workers).run(args.db)
+    print(f"Downloaded {downloaded} files ({failed} failed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+import argparse
+import os
+import sqlite3
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from db_migrations import migrate
+
+# Fills in recordings.file_size, audio_format, bitrate, sample_rate and
+# duration from the audio files themselves. Only the container and frame
+# headers are read (MP3 frame headers with their Xing/Info or VBRI tag,
+# WAV chunks, FLAC STREAMINFO, the M4A moov atom), never the audio, so a
+# file costs a few small reads however long it is:
+#
+#   python audio_metadata.py --db adidam_recordings.db
+#   python audio_metadata.py talk.mp3 other.flac     (just print them)
+#
+# Files are read in a pool of worker processes; only this process writes
+# to the database, in batches. Files that can't be read are recorded in
+# file_index (see file_index.py) and skipped until they change.
+
+# Recordings updated per transaction
+BATCH_SIZE = 500
+
+# Paths handed to a worker at a time
+WORKER_CHUNK = 16
+
+# Bytes searched for the first MP3 frame after any ID3v2 tag
+MP3_SEARCH = 64 * 1024
+
+# Largest moov atom read from an M4A file
+MAX_MOOV_SIZE = 16 * 1024 * 1024
+
+# kbit/s by [MPEG-1?][layer][bitrate index]; index 0 (free) and 15 are invalid
+MP3_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# Hz by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1) and rate index
+MP3_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+def format_duration(seconds):
+    """Seconds as H:MM:SS, the way the browse views show durations"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def _metadata(audio_format, file_size, duration, sample_rate, bitrate=None):
+    if not duration or duration <= 0:
+        raise ValueError(f"{audio_format} file with no duration")
+    if bitrate is None:
+        bitrate = file_size * 8 / duration / 1000
+    return {'file_size': file_size, 'audio_format': audio_format, 'bitrate': int(round(bitrate)),
+            'sample_rate': sample_rate, 'duration': duration}
+
+def id3v2_size(header):
+    """Bytes taken by an ID3v2 tag starting with these 10 bytes (0 if there isn't one)"""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] & 0x7f) << 21 | (header[7] & 0x7f) << 14 | (header[8] & 0x7f) << 7 | header[9] & 0x7f
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+def mp3_frame_header(data, pos):
+    """The MPEG audio frame header at pos as a dict (None if it isn't one)"""
+    if pos + 4 > len(data):
+        return None
+    header = int.from_bytes(data[pos:pos + 4], 'big')
+    if header >> 21 != 0x7ff:
+        return None
+    version = header >> 19 & 3
+    layer = 4 - (header >> 17 & 3)  # 1, 2 or 3 (4 is reserved)
+    bitrate_index = header >> 12 & 15
+    rate_index = header >> 10 & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[mpeg1][layer][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = header >> 9 & 1
+    mono = header >> 6 & 3 == 3
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return {'mpeg1': mpeg1, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+            'samples': samples, 'length': length, 'mono': mono}
+
+def find_mp3_frame(data):
+    """Offset and header of the first frame followed by another valid frame"""
+    pos = data.find(b'\xff')
+    while pos != -1:
+        frame = mp3_frame_header(data, pos)
+        if frame is not None:
+            following = pos + frame['length']
+            if following + 4 > len(data) or mp3_frame_header(data, following) is not None:
+                return pos, frame
+        pos = data.find(b'\xff', pos + 1)
+    raise ValueError("no MPEG audio frame found")
+
+def read_mp3(f, file_size, start):
+    f.seek(start)
+    data = f.read(MP3_SEARCH)
+    offset, frame = find_mp3_frame(data)
+    audio_start = start + offset
+
+    audio_end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b'TAG':
+            audio_end -= 128  # ID3v1 tag
+    audio_bytes = audio_end - audio_start
+
+    # A VBR file's first frame carries its frame count: Xing/Info after the
+    # side information, or VBRI 32 bytes in
+    side_info = (17 if frame['mono'] else 32) if frame['mpeg1'] else (9 if frame['mono'] else 17)
+    xing = offset + 4 + side_info
+    frames = stream_bytes = None
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        pos = xing + 8
+        if flags & 1:
+            frames = int.from_bytes(data[pos:pos + 4], 'big')
+            pos += 4
+        if flags & 2:
+            stream_bytes = int.from_bytes(data[pos:pos + 4], 'big')
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        stream_bytes, frames = struct.unpack('>II', data[offset + 46:offset + 54])
+
+    audio_format = f"MP{frame['layer']}"
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+        return _metadata(audio_format, file_size, duration, frame['sample_rate'],
+                         (stream_bytes or audio_bytes) * 8 / duration / 1000)
+    # Constant bitrate
+    duration = audio_bytes * 8 / (frame['bitrate'] * 1000)
+    return _metadata(audio_format, file_size, duration, frame['sample_rate'], frame['bitrate'])
+
+def read_wav(f, file_size):
+    f.seek(12)
+    byte_rate = sample_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file with no data chunk")
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(size)
+            _, _, sample_rate, byte_rate = struct.unpack('<HHII', fmt[:12])
+            f.seek(size & 1, 1)
+        elif chunk_id == b'data':
+            if byte_rate is None:
+                raise ValueError("WAV data before its fmt chunk")
+            # Streamed files may leave the size unset
+            data_size = min(size, file_size - f.tell())
+            return _metadata('WAV', file_size, data_size / byte_rate, sample_rate, byte_rate * 8 / 1000)
+        else:
+            f.seek(size + (size & 1), 1)
+
+def read_flac(f, file_size, start):
+    f.seek(start + 4)
+    block_type, length = f.read(1)[0] & 0x7f, int.from_bytes(f.read(3), 'big')
+    if block_type != 0 or length < 18:
+        raise ValueError("FLAC file without STREAMINFO")
+    info = f.read(18)
+    sample_rate = info[10] << 12 | info[11] << 4 | info[12] >> 4
+    total_samples = (info[13] & 0x0f) << 32 | int.from_bytes(info[14:18], 'big')
+    if not sample_rate:
+        raise ValueError("FLAC file with no sample rate")
+    return _metadata('FLAC', file_size, total_samples / sample_rate, sample_rate)
+
+def mp4_atoms(data, start=0, end=None):
+    """(type, payload start, payload end) of the atoms in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+def find_atom(data, path, start=0, end=None):
+    """Payload (start, end) of the atom at a path like (b'mdia', b'mdhd') (None if missing)"""
+    for kind, payload_start, payload_end in mp4_atoms(data, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            return find_atom(data, path[1:], payload_start, payload_end)
+    return None
+
+def _mp4_duration(data, atom):
+    """Duration in seconds from an mvhd/mdhd payload"""
+    start = atom[0]
+    if data[start] == 1:
+        timescale, duration = struct.unpack('>IQ', data[start + 20:start + 32])
+    else:
+        timescale, duration = struct.unpack('>II', data[start + 12:start + 20])
+    return duration / timescale if timescale else None
+
+def read_m4a(f, file_size):
+    # Top-level atoms are skipped by seeking; only moov is read
+    moov = None
+    media_bytes = 0
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            break
+        if kind == b'moov':
+            if size > MAX_MOOV_SIZE:
+                raise ValueError("M4A moov atom too large")
+            f.seek(pos + header_size)
+            moov = f.read(size - header_size)
+        elif kind == b'mdat':
+            media_bytes += size - header_size
+        pos += size
+    if moov is None:
+        raise ValueError("M4A file without a moov atom")
+
+    duration = sample_rate = None
+    for kind, start, end in mp4_atoms(moov):
+        if kind != b'trak':
+            continue
+        handler = find_atom(moov, (b'mdia', b'hdlr'), start, end)
+        if handler is None or moov[handler[0] + 8:handler[0] + 12] != b'soun':
+            continue
+        mdhd = find_atom(moov, (b'mdia', b'mdhd'), start, end)
+        if mdhd is not None:
+            duration = _mp4_duration(moov, mdhd)
+        stsd = find_atom(moov, (b'mdia', b'minf', b'stbl', b'stsd'), start, end)
+        if stsd is not None:
+            # First sample entry: 8 byte header, then the sample rate (16.16) 24 bytes in
+            entry = stsd[0] + 8 + 8
+            sample_rate = struct.unpack('>I', moov[entry + 24:entry + 28])[0] >> 16
+        break
+
+    if not duration:
+        mvhd = find_atom(moov, (b'mvhd',))
+        duration = _mp4_duration(moov, mvhd) if mvhd is not None else None
+    bitrate = media_bytes * 8 / duration / 1000 if media_bytes and duration else None
+    return _metadata('M4A', file_size, duration, sample_rate, bitrate)
+
+def read_audio_metadata(path):
+    """file_size, audio_format, bitrate (kbit/s), sample_rate (Hz) and duration (seconds) of a file
+
+    The format is told from the file's first bytes, not its extension.
+    Raises ValueError if the file isn't MP3, WAV, FLAC or M4A audio.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(12)
+        if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+            return read_wav(f, file_size)
+        if head[4:8] == b'ftyp':
+            return read_m4a(f, file_size)
+
+        f.seek(0)
+        start = id3v2_size(f.read(10))
+        f.seek(start)
+        if f.read(4) == b'fLaC':
+            return read_flac(f, file_size, start)
+        return read_mp3(f, file_size, start)
+
+def stat_signature(path):
+    """(size, mtime_ns, inode) of a file (None if it doesn't exist)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+def scan_file(path):
+    """Worker: (path, metadata, error) for one file"""
+    try:
+        return path, read_audio_metadata(path), None
+    except (OSError, ValueError, struct.error, IndexError, ZeroDivisionError) as e:
+        return path, None, str(e) or type(e).__name__
+
+def _write_batch(conn, batch):
+    conn.executemany(
+        """
+        UPDATE recordings
+        SET file_size = ?, audio_format = ?, bitrate = ?, sample_rate = ?, duration = ?
+        WHERE file_path = ?
+        """,
+        batch
+    )
+    conn.commit()
+
+def _record_failures(conn, failures):
+    """Remember unreadable files with their stat signatures, the way file_index.py does"""
+    now = datetime.now().isoformat()
+    rows = []
+    for path, error in failures:
+        signature = stat_signature(path)
+        if signature is not None:
+            rows.append((path,) + signature + (error, now))
+    conn.executemany(
+        """
+        INSERT INTO file_index (path, size, mtime_ns, inode, error, missing, date_scanned)
+        VALUES (?, ?, ?, ?, ?, 0, ?)
+        ON CONFLICT (path) DO UPDATE SET
+        size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,
+        fingerprint = NULL, error = excluded.error, missing = 0, date_scanned = excluded.date_scanned
+        """,
+        rows
+    )
+    conn.commit()
+
+def scan_recordings(db_path='adidam_recordings.db', workers=None, batch_size=BATCH_SIZE, rescan=False):
+    """Read the metadata of every local recording file not scanned yet (or all, with rescan)
+
+    Files that failed before are retried once they change (or with
+    rescan). Returns (files updated, files that couldn't be read).
+    """
+    start_time = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT DISTINCT file_path FROM recordings
+            WHERE file_path IS NOT NULL AND file_path != ''
+            AND file_path NOT LIKE 'http://%' AND file_path NOT LIKE 'https://%'
+            {'' if rescan else 'AND sample_rate IS NULL'}
+        """)
+        paths = [path for (path,) in cursor.fetchall()]
+
+        still_unreadable = 0
+        if not rescan:
+            cursor.execute("SELECT path, size, mtime_ns, inode FROM file_index WHERE error IS NOT NULL")
+            unreadable = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+            if unreadable:
+                unchanged = {path for path in paths
+                             if path in unreadable and stat_signature(path) == unreadable[path]}
+                still_unreadable = len(unchanged)
+                paths = [path for path in paths if path not in unchanged]
+        print(f"Reading {len(paths)} audio files ({still_unreadable} unchanged since they couldn't be read)")
+
+        updated = failed = 0
+        batch = []
+        failures = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, metadata, error in pool.map(scan_file, paths, chunksize=WORKER_CHUNK):
+                if error is not None:
+                    print(f"  Skipping {path}: {error}")
+                    failed += 1
+                    failures.append((path, error))
+                    continue
+                batch.append((metadata['file_size'], metadata['audio_format'], metadata['bitrate'],
+                              metadata['sample_rate'], format_duration(metadata['duration']), path))
+                if len(batch) >= batch_size:
+                    _write_batch(conn, batch)
+                    updated += len(batch)
+                    batch = []
+        if batch:
+            _write_batch(conn, batch)
+            updated += len(batch)
+        _record_failures(conn, failures)
+
+        print(f"Updated {updated} files ({failed} unreadable) in {time.perf_counter() - start_time:.1f}s")
+        return updated, failed
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Read duration, bitrate etc. from the recordings' audio files")
+    parser.add_argument("files", nargs="*", help="Just print the metadata of these files")
+    parser.add_argument("--db", default="adidam_recordings.db", help="Recordings database to update")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--rescan", action="store_true", help="Read files that were already scanned or unreadable too")
+    args = parser.parse_args()
+
+    if args.files:
+        for path, metadata, error in map(scan_file, args.files):
+            if error is not None:
+                print(f"{path}: {error}")
+            else:
+                print(f"{path}: {metadata['audio_format']}, {format_duration(metadata['duration'])}, "
+                      f"{metadata['bitrate']} kbit/s, {metadata['sample_rate']} Hz, {metadata['file_size']} bytes")
+        return
+
+    scan_recordings(args.db, args.workers, rescan=args.rescan)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import glob
+import os
+import queue
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+from bulk_import import BulkLoader
+from csv_importer import RecordingWriter, read_csv_records
+from db_migrations import migrate
+from import_manifest import IncrementalImport
+from ooxml_reader import iter_table_rows
+from table_importer import EohTableImporter
+
+# Imports many index documents (.docx, table format) and recordings exports
+# (.csv) at once. The files are parsed in a pool of worker processes, which
+# stream their records through a queue to this process; only this process
+# writes to the database.
+
+IMPORT_EXTENSIONS = ('.docx', '.csv')
+
+# Records per queue message
+CHUNK_SIZE = 500
+
+# Chunks waiting for the writer before the parsers have to wait
+QUEUE_SIZE = 64
+
+# Records written between commits
+COMMIT_EVERY = 50000
+
+def find_import_files(paths):
+    """Expand directories and glob patterns into a sorted list of .docx/.csv files"""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [os.path.join(path, name) for name in os.listdir(path)]
+        elif os.path.exists(path):
+            candidates = [path]
+        else:
+            candidates = glob.glob(path, recursive=True)
+
+        for candidate in candidates:
+            name = os.path.basename(candidate)
+            # Skip Word's ~$ lock files
+            if (os.path.isfile(candidate) and not name.startswith('~$')
+                    and name.lower().endswith(IMPORT_EXTENSIONS)):
+                files.add(os.path.abspath(candidate))
+    return sorted(files)
+
+def parse_docx(docx_path):
+    """Yield ('book', title) and ('essay', number, title) records from the first table
+
+    Rows are classified as in EohTableImporter.import_from_docx.
+    """
+    for i, cells in enumerate(iter_table_rows(docx_path)):
+        if len(cells) < 2:
+            continue
+
+        cell1 = cells[0].strip()
+        cell2 = cells[1].strip()
+        if not cell1 or not cell2:
+            continue
+
+        if i == 0 or not cell1[0].isdigit():
+            yield 'book', cell2
+        else:
+            yield 'essay', cell1, cell2
+
+def parse_csv(csv_path):
+    """Yield ('recording', recording_data) records from a recordings CSV"""
+    for recording_data in read_csv_records(csv_path):
+        yield 'recording', recording_data
+
+PARSERS = {
+    '.docx': parse_docx,
+    '.csv': parse_csv,
+}
+
+def parse_file(path, records_queue, chunk_size=CHUNK_SIZE):
+    """Worker process: parse one file and put its records on the queue in chunks
+
+    Sends ('records', path, chunk) messages followed by ('done', path, count),
+    or ('error', path, message) if the file can't be parsed.
+    """
+    count = 0
+    try:
+        parser = PARSERS[os.path.splitext(path)[1].lower()]
+        chunk = []
+        for record in parser(path):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                records_queue.put(('records', path, chunk))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            records_queue.put(('records', path, chunk))
+            count += len(chunk)
+        records_queue.put(('done', path, count))
+    except Exception as e:
+        records_queue.put(('error', path, str(e)))
+    return count
+
+class ImportWriter:
+    """The single database writer for a batch import
+
+    Records from all files go through one BulkLoader, committed every
+    commit_every records. Each index document gets its own IncrementalImport,
+    so documents that are re-imported only write what changed.
+    """
+
+    def __init__(self, conn, commit_every=COMMIT_EVERY):
+        self.conn = conn
+        self.commit_every = commit_every
+        self.loader = None
+        self.recordings = None
+        self.documents = {}  # path -> (EohTableImporter, IncrementalImport)
+        self.counts = {}  # path -> records written
+        self.failed = {}  # path -> error message
+        self.since_commit = 0
+
+    def begin(self):
+        self.loader = BulkLoader(self.conn)
+        self.loader.begin()
+        self.recordings = RecordingWriter(self.loader.cursor)
+
+    def write(self, path, records):
+        """Write a chunk of records parsed from path"""
+        if path in self.failed:
+            return
+
+        if path.lower().endswith('.docx'):
+            importer, sync = self._document(path)
+            if importer is None:
+                return
+            for record in records:
+                if record[0] == 'book':
+                    importer.process_book_title(record[1], sync)
+                else:
+                    importer.process_essay_entry(record[1], record[2], sync)
+        else:
+            for kind, recording_data in records:
+                self.recordings.add(recording_data)
+
+        self.counts[path] = self.counts.get(path, 0) + len(records)
+        self.since_commit += len(records)
+        if self.since_commit >= self.commit_every:
+            self.recordings.flush()
+            self.loader.checkpoint()
+            self.since_commit = 0
+
+    def _document(self, path):
+        if path not in self.documents:
+            # Rows are read the way table_importer reads them, so share its manifest
+            self.documents[path] = (EohTableImporter(), IncrementalImport(self.loader, path, 'table_importer'))
+        return self.documents[path]
+
+    def finish_file(self, path):
+        """All records of path have been written"""
+        if path in self.failed:
+            return
+
+        summary = ''
+        if path in self.documents:
+            importer, sync = self.documents.pop(path)
+            sync.finish()
+            summary = '\n    ' + sync.summary().replace('\n', '\n    ')
+        print(f"  {os.path.basename(path)}: {self.counts.get(path, 0)} records{summary}")
+
+    def fail_file(self, path, message):
+        """Stop writing path; what was written so far is kept
+
+        Sections of a document that were already written stay, but sections
+        missing from it are not removed.
+        """
+        self.failed[path] = message
+        self.documents.pop(path, None)
+        print(f"  {os.path.basename(path)}: failed: {message}")
+
+    def commit(self):
+        self.recordings.flush()
+        self.loader.commit()
+
+    def rollback(self):
+        self.loader.rollback()
+
+def run_import(paths, db_path='adidam_recordings.db', workers=None, commit_every=COMMIT_EVERY):
+    """Import every .docx/.csv file under paths; returns True if all files were imported"""
+    files = find_import_files(paths)
+    if not files:
+        print("No .docx or .csv files found")
+        return False
+
+    print(f"Importing {len(files)} files into {db_path}")
+    start_time = time.perf_counter()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # Bring the schema up to date (adds the essay sort keys and import manifest)
+        migrate(conn)
+
+        writer = ImportWriter(conn, commit_every)
+        # The manager goes first on exit, so parsers blocked on a full queue
+        # fail instead of keeping the pool from shutting down
+        with ProcessPoolExecutor(max_workers=workers) as pool, Manager() as manager:
+            records_queue = manager.Queue(QUEUE_SIZE)
+            futures = {pool.submit(parse_file, path, records_queue): path for path in files}
+            pending = set(files)
+
+            writer.begin()
+            try:
+                while pending:
+                    try:
+                        kind, path, value = records_queue.get(timeout=1)
+                    except queue.Empty:
+                        # A worker process that died never reports back
+                        for future, path in futures.items():
+                            if path in pending and future.done() and future.exception():
+                                writer.fail_file(path, str(future.exception()))
+                                pending.discard(path)
+                        continue
+
+                    if kind == 'records':
+                        writer.write(path, value)
+                    elif kind == 'done':
+                        writer.finish_file(path)
+                        pending.discard(path)
+                    else:
+                        writer.fail_file(path, value)
+                        pending.discard(path)
+
+                writer.commit()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                writer.rollback()
+                raise
+
+        records = sum(writer.counts.values())
+        elapsed = time.perf_counter() - start_time
+        rate = records / elapsed if elapsed > 0 else 0
+        print(f"Imported {records} records from {len(files) - len(writer.failed)} of {len(files)} files "
+              f"in {elapsed:.2f}s ({rate:,.0f} records/sec)")
+        return not writer.failed
+
+    except Exception as e:
+        print(f"Error during import: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import many EOH index documents and recordings CSVs in parallel")
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns of .docx/.csv files")
+    parser.add_argument("--db", default="adidam_recordings.db", help="Database to import into")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per CPU)")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="Records written between commits")
+    args = parser.parse_args()
+
+    if not run_import(args.paths, args.db, args.workers, args.commit_every):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from ooxml_reader import iter_table_rows
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+def create_scaled_docx(docx_path, scaled_path, factor=100):
+    """Copy docx_path with the rows of its tables repeated factor times"""
+    with zipfile.ZipFile(docx_path) as source, \
+         zipfile.ZipFile(scaled_path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == 'word/document.xml':
+                xml = data.decode('utf-8')
+                first_row = xml.index('<w:tr ')
+                last_row = xml.rindex('</w:tr>') + len('</w:tr>')
+                xml = xml[:first_row] + xml[first_row:last_row] * factor + xml[last_row:]
+                data = xml.encode('utf-8')
+            target.writestr(item, data)
+
+def read_with_python_docx(docx_path):
+    """The importers' python-docx path: cell texts of every row of the first table"""
+    table = Document(docx_path).tables[0]
+    return [[cell.text for cell in row.cells] for row in table.rows]
+
+def read_with_ooxml_reader(docx_path):
+    return list(iter_table_rows(docx_path))
+
+def measure(reader, docx_path):
+    """Return (rows, seconds) for one reader"""
+    start = time.perf_counter()
+    rows = reader(docx_path)
+    return rows, time.perf_counter() - start
+
+def peak_memory(reader, docx_path):
+    """Peak Python memory (MB) while a reader walks the rows without keeping them"""
+    tracemalloc.start()
+    try:
+        for _ in reader(docx_path):
+            pass
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare python-docx with the direct OOXML reader")
+    parser.add_argument("docx", nargs="?", default="EOH Index.docx", help="Index document to scale up")
+    parser.add_argument("--scale", type=int, default=100, help="How many times to repeat the table rows")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.docx):
+        print(f"Error: File not found: {args.docx}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scaled_path = os.path.join(tmp_dir, "scaled.docx")
+        create_scaled_docx(args.docx, scaled_path, args.scale)
+        print(f"Scaled {args.docx} {args.scale}x ({os.path.getsize(scaled_path) / (1024 * 1024):.1f} MB)")
+
+        fast_rows, fast_time = measure(read_with_ooxml_reader, scaled_path)
+        print(f"  OOXML reader: {len(fast_rows)} rows in {fast_time:8.2f}s")
+        print(f"                peak memory {peak_memory(iter_table_rows, scaled_path):.1f} MB")
+
+        if Document is None:
+            print("  python-docx isn't installed; skipping the comparison")
+            return
+
+        docx_rows, docx_time = measure(read_with_python_docx, scaled_path)
+        print(f"  python-docx:  {len(docx_rows)} rows in {docx_time:8.2f}s")
+        if fast_time > 0:
+            print(f"  Speedup:      {docx_time / fast_time:8.1f}x")
+        if docx_rows != fast_rows:
+            print("  Warning: the readers returned different rows")
+
+if __name__ == "__main__":
+    main()
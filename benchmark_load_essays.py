@@ -0,0 +1,166 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from db_access import CACHED_STATEMENTS, CONNECTION_PRAGMAS
+from db_migrations import migrate
+from essay_queries import fetch_essays_with_recordings
+
+def create_benchmark_database(db_path, num_books=250, essays_per_book=200, seed=42):
+    """Create a database with the app schema and generated essays/recordings"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Same tables as create_sample_db.py
+    cursor.execute('''
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            display_order INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE essays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            essay_number TEXT,
+            title TEXT NOT NULL,
+            display_order INTEGER DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE recordings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            essay_id INTEGER NOT NULL,
+            title TEXT,
+            reciter TEXT,
+            recorded_date TEXT,
+            duration TEXT,
+            file_path TEXT,
+            FOREIGN KEY (essay_id) REFERENCES essays (id)
+        )
+    ''')
+
+    rng = random.Random(seed)
+    reciters = ["John Smith", "Jane Doe", "Mark Johnson", "Sarah Williams",
+                "Michael Brown", "David Wilson", "Susan Miller", "Robert Thompson"]
+
+    books = [(book_id, f"Book {book_id}", book_id) for book_id in range(1, num_books + 1)]
+    cursor.executemany("INSERT INTO books (id, title, display_order) VALUES (?, ?, ?)", books)
+
+    essays = []
+    recordings = []
+    essay_id = 1
+    for book_id in range(1, num_books + 1):
+        for essay_num in range(1, essays_per_book + 1):
+            essays.append((essay_id, book_id, str(essay_num), f"Essay {essay_num} of book {book_id}", essay_num))
+            for i in range(rng.randint(0, 4)):
+                recordings.append((
+                    essay_id,
+                    None,
+                    rng.choice(reciters),
+                    f"{rng.randint(2000, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    f"0:{rng.randint(5, 59):02d}:{rng.randint(0, 59):02d}",
+                    "sample.mp3"
+                ))
+            essay_id += 1
+
+    cursor.executemany(
+        "INSERT INTO essays (id, book_id, essay_number, title, display_order) VALUES (?, ?, ?, ?, ?)",
+        essays
+    )
+    cursor.executemany(
+        "INSERT INTO recordings (essay_id, title, reciter, recorded_date, duration, file_path) VALUES (?, ?, ?, ?, ?, ?)",
+        recordings
+    )
+
+    conn.commit()
+    conn.close()
+    return len(essays), len(recordings)
+
+def fetch_essays_per_essay(cursor, book_id):
+    """The original load_essays strategy: one recordings query per essay"""
+    cursor.execute("""
+        SELECT e.id, e.essay_number, e.title
+        FROM essays e
+        WHERE e.book_id = ?
+        ORDER BY
+            CASE
+                WHEN e.essay_number GLOB '[0-9]*' THEN CAST(e.essay_number AS INTEGER)
+                ELSE 999999
+            END,
+            e.display_order,
+            e.title
+    """, (book_id,))
+
+    essays = []
+    for essay_id, essay_number, title in cursor.fetchall():
+        cursor.execute("""
+            SELECT r.id, r.title, r.reciter, r.recorded_date, r.duration
+            FROM recordings r
+            WHERE r.essay_id = ?
+            ORDER BY r.reciter, r.recorded_date
+        """, (essay_id,))
+        essays.append((essay_id, essay_number, title, cursor.fetchall()))
+    return essays
+
+def time_strategy(db_path, strategy, book_ids):
+    """Time loading every book in book_ids over one shared connection, like the app"""
+    # A plain connection rather than AdidamDatabase, which would migrate the file
+    conn = sqlite3.connect(db_path, cached_statements=CACHED_STATEMENTS)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    start = time.perf_counter()
+    for book_id in book_ids:
+        strategy(conn.cursor(), book_id)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare load_essays strategies on a generated database")
+    parser.add_argument("--books", type=int, default=250, help="Number of books to generate")
+    parser.add_argument("--essays-per-book", type=int, default=200, help="Essays generated per book")
+    parser.add_argument("--sample", type=int, default=10, help="Number of books to load per strategy")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Apply db_migrations (covering indexes, sort keys) before timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "benchmark.db")
+        print(f"Generating {args.books * args.essays_per_book} essays...")
+        num_essays, num_recordings = create_benchmark_database(db_path, args.books, args.essays_per_book)
+        print(f"Created {args.books} books, {num_essays} essays and {num_recordings} recordings")
+
+        if args.migrate:
+            conn = sqlite3.connect(db_path)
+            migrate(conn, verbose=True)
+            conn.close()
+
+        book_ids = random.Random(7).sample(range(1, args.books + 1), min(args.sample, args.books))
+
+        # Both strategies must produce the same tree contents
+        conn = sqlite3.connect(db_path)
+        for book_id in book_ids:
+            if fetch_essays_per_essay(conn.cursor(), book_id) != fetch_essays_with_recordings(conn.cursor(), book_id):
+                print(f"Warning: strategies disagree for book {book_id}")
+        conn.close()
+
+        per_essay = time_strategy(db_path, fetch_essays_per_essay, book_ids)
+        grouped = time_strategy(db_path, fetch_essays_with_recordings, book_ids)
+
+        print(f"\nLoaded {len(book_ids)} books ({args.essays_per_book} essays each)")
+        print(f"  Per-essay queries: {per_essay * 1000 / len(book_ids):8.2f} ms/book")
+        print(f"  Grouped query:     {grouped * 1000 / len(book_ids):8.2f} ms/book")
+        if grouped > 0:
+            print(f"  Speedup:           {per_essay / grouped:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import glob
+import os
+import sqlite3
+import time
+import zlib
+
+from page_parser import BACKENDS, empty_item
+from stub_site import page_html
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+# Site chrome around the listing on a real page: menus, footer links, scripts
+CHROME_LINKS = 300
+
+def synthetic_page(page_number, per_page=50):
+    """A stub listing page padded with the kind of markup the real site has around it"""
+    links = '\n'.join(f'<li class="menu-item"><a href="/academy/section-{i}">Section {i}</a></li>'
+                      for i in range(CHROME_LINKS))
+    chrome = (f'<head><script>var config = {{"page": {page_number}}};</script>'
+              f'<link rel="stylesheet" href="/site.css"></head>'
+              f'<nav><ul>{links}</ul></nav>')
+    footer = f'<footer><ul>{links}</ul><p>&copy; Adidam</p></footer>'
+    return page_html(page_number, per_page).replace('<html><body>', f'<html>{chrome}<body>', 1) \
+                                         .replace('</body>', f'{footer}</body>', 1)
+
+def load_fixture_pages(paths, cache_path=None):
+    """HTML of saved pages: .html files/directories and/or the scraper's response cache"""
+    pages = []
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, '*.html'))) if os.path.isdir(path) else [path]
+        for file_path in files:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+
+    if cache_path:
+        conn = sqlite3.connect(cache_path)
+        pages.extend(zlib.decompress(body).decode('utf-8')
+                     for (body,) in conn.execute("SELECT body FROM http_cache WHERE body IS NOT NULL"))
+        conn.close()
+    return pages
+
+def parse_with_soup(html):
+    """The scraper's previous parser: a full html.parser tree and select_one per field"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = []
+    for element in soup.select('.recording-item'):
+        item = empty_item()
+        for field, cls in (('title', 'recording-title'), ('description', 'recording-description'),
+                           ('date', 'recording-date'), ('duration', 'recording-duration'),
+                           ('speaker', 'recording-speaker')):
+            found = element.select_one(f'.{cls}')
+            item[field] = found.text.strip() if found else None
+        file_elem = element.select_one('.recording-file-link')
+        if file_elem:
+            item['file'] = file_elem.text.strip()
+            item['href'] = file_elem.get('href')
+        item['tags'] = [tag.text.strip() for tag in element.select('.recording-tag')]
+        items.append(item)
+    return items
+
+def time_parser(parse, pages, repeat):
+    """Best per-page time (ms) over repeat passes, and the items of the last pass"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(html) for html in pages]
+        elapsed = (time.perf_counter() - start) / len(pages) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-page parse time of the scraper's HTML parsers")
+    parser.add_argument("pages", nargs="*", help="Saved .html pages or directories of them")
+    parser.add_argument("--cache", help="Also use the pages in this response cache (adidam_scraper_cache.db)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes per parser; the best is reported")
+    args = parser.parse_args()
+
+    pages = load_fixture_pages(args.pages, args.cache)
+    if not pages:
+        pages = [synthetic_page(page_number) for page_number in range(1, 18)]
+        print("No pages given; using 17 synthetic listing pages")
+    size = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KB on average")
+
+    parsers = []
+    if BeautifulSoup is not None:
+        parsers.append(('bs4 html.parser (before)', parse_with_soup))
+    else:
+        print("  bs4 isn't installed; skipping the previous parser")
+    parsers.extend((f"page_parser {name}", parse) for name, parse in BACKENDS.items())
+
+    baseline = None
+    baseline_time = None
+    for name, parse in parsers:
+        per_page, results = time_parser(parse, pages, args.repeat)
+        items = sum(len(page_items) for page_items in results)
+        line = f"  {name:28s} {per_page:8.2f} ms/page  ({items} items)"
+        if baseline is None:
+            baseline, baseline_time = results, per_page
+        else:
+            line += f"  {baseline_time / per_page:5.1f}x"
+            if results != baseline:
+                line += "  (different results!)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import time
+
+from db_migrations import essay_sort_key
+from search_index import drop_search_triggers, recreate_search_triggers, reindex_essays, search_index_exists
+
+# Rows queued before they are written with executemany
+BATCH_SIZE = 5000
+
+# Connection settings while a bulk import runs; a crash mid-import can leave
+# the database inconsistent, so they only last until the first checkpoint
+BULK_PRAGMAS = {
+    'synchronous': 'OFF',
+    'journal_mode': 'MEMORY',
+}
+
+def next_row_id(cursor, table):
+    """The id the next row inserted into table would get
+
+    Continues after the highest id handed out so far, including deleted ones
+    if the table uses AUTOINCREMENT.
+    """
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    next_id = cursor.fetchone()[0] + 1
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'")
+    if cursor.fetchone():
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+        row = cursor.fetchone()
+        if row:
+            next_id = max(next_id, row[0] + 1)
+    return next_id
+
+# Values looked up per query in "IN (...)" lookups
+LOOKUP_BATCH = 500
+
+def lookup_ids(cursor, table, column, values, where=''):
+    """{value: lowest id} for the rows of table whose column is one of values"""
+    values = list(values)
+    ids = {}
+    for i in range(0, len(values), LOOKUP_BATCH):
+        batch = values[i:i + LOOKUP_BATCH]
+        placeholders = ', '.join('?' * len(batch))
+        cursor.execute(
+            f"SELECT {column}, MIN(id) FROM {table} WHERE {column} IN ({placeholders}) {where} GROUP BY {column}",
+            batch
+        )
+        ids.update(cursor.fetchall())
+    return ids
+
+def resolve_names(cursor, table, names, known):
+    """Add the ids of names (speakers, categories, ...) to the known {name: id} dict
+
+    Names not in known are looked up, and inserted with INSERT OR IGNORE if
+    they don't exist yet, all in batches.
+    """
+    missing = [name for name in dict.fromkeys(names) if name not in known]
+    if not missing:
+        return known
+
+    known.update(lookup_ids(cursor, table, 'name', missing))
+    new_names = [name for name in missing if name not in known]
+    if new_names:
+        cursor.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in new_names])
+        known.update(lookup_ids(cursor, table, 'name', new_names))
+    return known
+
+class BulkLoader:
+    """Batched inserts of books, essays and placeholder recordings for the importers
+
+    Existing books and essays are read into dicts keyed by their natural keys
+    (book title; book id, essay title and essay number) up front, so the
+    importers don't query the database per row. New essays get their ids
+    assigned here and are written with executemany.
+
+    The search index triggers are dropped for the duration of the import and
+    only the new, changed and deleted essays are re-indexed when it is
+    committed.
+    """
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+
+        self.books = {}
+        self.essays = {}
+        self.pending_essays = []
+        self.pending_recordings = []
+        self.new_essay_ids = []
+        self.changed_essay_ids = []
+        self.next_essay_id = None
+
+        self.saved_pragmas = {}
+        self.has_search_index = False
+        self.rows_written = 0
+        self.checkpoints = 0
+        self.start_time = None
+
+    def begin(self):
+        """Switch to the bulk settings, load the lookup maps and start the transaction"""
+        self.start_time = time.perf_counter()
+
+        # journal_mode can't change inside a transaction, so set it first
+        for name, value in BULK_PRAGMAS.items():
+            self.saved_pragmas[name] = self.cursor.execute(f"PRAGMA {name}").fetchone()[0]
+            self.cursor.execute(f"PRAGMA {name} = {value}").fetchall()
+
+        self.conn.execute('BEGIN TRANSACTION')
+
+        self.cursor.execute("SELECT title, id FROM books")
+        self.books = dict(self.cursor.fetchall())
+
+        self.cursor.execute("SELECT book_id, title, essay_number, id FROM essays")
+        self.essays = {(book_id, title, number): essay_id
+                       for book_id, title, number, essay_id in self.cursor.fetchall()}
+
+        self.next_essay_id = next_row_id(self.cursor, 'essays')
+
+        self.has_search_index = search_index_exists(self.cursor)
+        if self.has_search_index:
+            drop_search_triggers(self.cursor)
+
+    def book_id(self, title, display_order=0):
+        """Return (book id, True if the book was added) for a book title"""
+        if title in self.books:
+            return self.books[title], False
+
+        # Books are few; insert straight away to get the id
+        self.cursor.execute(
+            "INSERT INTO books (title, display_order) VALUES (?, ?)",
+            (title, display_order)
+        )
+        self.books[title] = self.cursor.lastrowid
+        self.rows_written += 1
+        return self.books[title], True
+
+    def essay_id(self, book_id, title, essay_number, display_order=0):
+        """Return (essay id, True if the essay was added) for an essay's natural key"""
+        key = (book_id, title, essay_number)
+        if key in self.essays:
+            return self.essays[key], False
+
+        essay_id = self.next_essay_id
+        self.next_essay_id += 1
+        self.essays[key] = essay_id
+        self.new_essay_ids.append(essay_id)
+
+        # Insert new essay with its precomputed sort keys
+        sort_num, sort_suffix = essay_sort_key(essay_number)
+        self.pending_essays.append((essay_id, title, book_id, essay_number, sort_num, sort_suffix, display_order))
+        self._flush_if_full()
+        return essay_id, True
+
+    def update_essay_title(self, essay_id, title):
+        """Change the title of an existing essay (False if it no longer exists)"""
+        self.cursor.execute("SELECT book_id, title, essay_number FROM essays WHERE id = ?", (essay_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return False
+
+        book_id, old_title, essay_number = row
+        self.essays.pop((book_id, old_title, essay_number), None)
+        self.essays[(book_id, title, essay_number)] = essay_id
+
+        self.cursor.execute("UPDATE essays SET title = ? WHERE id = ?", (title, essay_id))
+        self.changed_essay_ids.append(essay_id)
+        self.rows_written += 1
+        return True
+
+    def delete_essay(self, essay_id):
+        """Delete an essay and its placeholder recordings
+
+        Essays with real recordings (a file_path) are kept. Returns True if
+        the essay was deleted.
+        """
+        self.cursor.execute("SELECT 1 FROM recordings WHERE essay_id = ? AND file_path IS NOT NULL LIMIT 1",
+                            (essay_id,))
+        if self.cursor.fetchone():
+            return False
+
+        self.cursor.execute("SELECT book_id, title, essay_number FROM essays WHERE id = ?", (essay_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return True  # already gone
+        self.essays.pop(row, None)
+
+        self.cursor.execute("DELETE FROM recordings WHERE essay_id = ?", (essay_id,))
+        self.rows_written += self.cursor.rowcount
+        self.cursor.execute("DELETE FROM essays WHERE id = ?", (essay_id,))
+        self.rows_written += self.cursor.rowcount
+        self.changed_essay_ids.append(essay_id)
+        return True
+
+    def add_recording(self, essay_id, title, date_added):
+        """Queue a (placeholder) recording for an essay"""
+        self.pending_recordings.append((essay_id, title, date_added))
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self.pending_essays) + len(self.pending_recordings) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the queued rows"""
+        if self.pending_essays:
+            self.cursor.executemany(
+                """
+                INSERT INTO essays
+                (id, title, book_id, essay_number, essay_sort_num, essay_sort_suffix, display_order)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                self.pending_essays
+            )
+            self.rows_written += len(self.pending_essays)
+            self.pending_essays = []
+
+        # Essays first, so the recordings' essay ids exist
+        if self.pending_recordings:
+            self.cursor.executemany(
+                """
+                INSERT INTO recordings
+                (essay_id, title, date_added)
+                VALUES (?, ?, ?)
+                """,
+                self.pending_recordings
+            )
+            self.rows_written += len(self.pending_recordings)
+            self.pending_recordings = []
+
+    def checkpoint(self):
+        """Commit what has been written so far and carry on in a new transaction
+
+        The essays written so far are re-indexed and the search triggers put
+        back for the commit, and the connection's own settings replace the
+        bulk ones, so an import killed after a checkpoint leaves a consistent
+        database to resume into. The triggers are dropped again afterwards.
+        """
+        self.flush()
+        if self.has_search_index:
+            reindex_essays(self.cursor, self.new_essay_ids + self.changed_essay_ids)
+            recreate_search_triggers(self.cursor)
+        self.new_essay_ids = []
+        self.changed_essay_ids = []
+        self.conn.commit()
+        self._restore_pragmas()
+        self.checkpoints += 1
+        self.conn.execute('BEGIN TRANSACTION')
+        if self.has_search_index:
+            drop_search_triggers(self.cursor)
+
+    def commit(self):
+        """Write what's left, bring the search index up to date and commit
+
+        If this raises, call rollback() to abandon the import.
+        """
+        self.flush()
+        if self.has_search_index:
+            reindex_essays(self.cursor, self.new_essay_ids + self.changed_essay_ids)
+            recreate_search_triggers(self.cursor)
+        self.conn.commit()
+        self._restore_pragmas()
+
+    def rollback(self):
+        """Abandon the import (since the last checkpoint) and put the connection settings back"""
+        try:
+            self.conn.rollback()
+        finally:
+            self._restore_pragmas()
+
+    def _restore_pragmas(self):
+        for name, value in self.saved_pragmas.items():
+            self.cursor.execute(f"PRAGMA {name} = {value}").fetchall()
+        self.saved_pragmas = {}
+
+    def report(self):
+        """One-line summary of rows written and the import rate"""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0
+        rate = self.rows_written / elapsed if elapsed > 0 else 0
+        return f"Wrote {self.rows_written} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
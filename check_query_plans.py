@@ -0,0 +1,79 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from db_migrations import migrate
+from essay_queries import ESSAYS_WITH_RECORDINGS_SQL, RECORDINGS_FOR_ESSAY_SQL
+from search_index import SEARCH_SQL
+
+# Hot-path queries of the search apps with representative parameters
+QUERIES = [
+    ("load_books", "SELECT id, title FROM books ORDER BY display_order, title", ()),
+    ("load_essays", ESSAYS_WITH_RECORDINGS_SQL, (1,)),
+    ("perform_search", SEARCH_SQL, ('"divine"*', 1000)),
+    ("perform_search recordings", RECORDINGS_FOR_ESSAY_SQL, (1,)),
+]
+
+# Queries allowed to read a whole (small) table
+SCAN_ALLOWED = {"load_books"}
+
+# Queries that must come back in index order, without a sort step
+# (ranked search necessarily sorts by bm25)
+SORT_FORBIDDEN = {"load_essays", "perform_search recordings"}
+
+def query_plan(conn, sql, params):
+    """Return the detail lines of EXPLAIN QUERY PLAN for a query"""
+    return [detail for _, _, _, detail in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def full_scans(plan):
+    """Plan steps that read a whole table"""
+    return [detail for detail in plan
+            if detail.startswith("SCAN ") and "VIRTUAL TABLE INDEX" not in detail]
+
+def temp_sorts(plan):
+    """Plan steps that sort rows in a temporary B-tree"""
+    return [detail for detail in plan if detail.startswith("USE TEMP B-TREE")]
+
+def check_query_plans(db_path):
+    """Migrate a copy of db_path and check the hot-path queries use their indexes"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_path = os.path.join(tmp_dir, os.path.basename(db_path))
+        shutil.copyfile(db_path, copy_path)
+
+        conn = sqlite3.connect(copy_path)
+        try:
+            migrate(conn)
+
+            ok = True
+            for name, sql, params in QUERIES:
+                try:
+                    plan = query_plan(conn, sql, params)
+                except sqlite3.OperationalError as e:
+                    # e.g. the original schema.sql recordings table has no reciter column
+                    ok = False
+                    print(f"FAIL {name}: {e}")
+                    continue
+
+                problems = []
+                if name not in SCAN_ALLOWED:
+                    problems.extend(full_scans(plan))
+                if name in SORT_FORBIDDEN:
+                    problems.extend(temp_sorts(plan))
+
+                if problems:
+                    ok = False
+                    print(f"FAIL {name}: {'; '.join(problems)}")
+                else:
+                    print(f"ok   {name}")
+            return ok
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'adidam_recordings_demo.db'
+    if not os.path.exists(db_path):
+        print(f"Error: Database file '{db_path}' not found.")
+        sys.exit(2)
+    sys.exit(0 if check_query_plans(db_path) else 1)
@@ -1,5 +1,176 @@
+import csv
 import sqlite3
 import os
+import time
+from datetime import datetime
+
+from bulk_import import BATCH_SIZE, next_row_id, resolve_names
+from db_migrations import migrate
+
+# Map CSV fields to database fields
+# Adjust the mappings based on your actual CSV structure
+FIELD_MAPPINGS = {
+    'Title': 'title',
+    'Description': 'description',
+    'Date': 'date_recorded',
+    'Duration': 'duration',
+    'File': 'file_path',
+    'Speaker': 'speaker',
+    'Categories': 'categories'
+    # Add more mappings as needed
+}
+
+# Rows committed together by import_csv_resumable
+CHUNK_ROWS = 10000
+
+def recording_data_from_row(row):
+    """Extract main recording data from a CSV row dict, keyed by database field"""
+    recording_data = {}
+    for csv_field, db_field in FIELD_MAPPINGS.items():
+        if csv_field in row:
+            recording_data[db_field] = row[csv_field]
+    return recording_data
+
+def read_csv_records(csv_file, fieldnames_callback=None):
+    """Yield the recording data of each CSV row, keyed by database field"""
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        csv_reader = csv.DictReader(f)
+        if fieldnames_callback:
+            fieldnames_callback(csv_reader.fieldnames)
+        
+        for row in csv_reader:
+            yield recording_data_from_row(row)
+
+class OffsetLines:
+    """Lines of a file opened in binary mode, for csv.reader
+
+    offset is the byte position after the last line handed out. csv.reader
+    only asks for the lines of the record it is reading, so after each
+    record offset is where the next one starts.
+    """
+
+    def __init__(self, f, encoding='utf-8'):
+        self.f = f
+        self.encoding = encoding
+        self.offset = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.offset = offset
+
+# Name tables the CSV links recordings to: (table, link table, link column)
+NAME_TABLES = [
+    ('speakers', 'recording_speakers', 'speaker_id'),
+    ('categories', 'recording_categories', 'category_id'),
+]
+
+class RecordingWriter:
+    """Batched inserts of CSV recordings with their speakers and categories
+
+    Speaker and category names are resolved through name -> id dicts seeded
+    from the tables, so rows don't query the database. Recordings get their
+    ids assigned here; they, the names not seen before and the recording
+    links are written with executemany every batch_size recordings.
+    """
+
+    def __init__(self, cursor, batch_size=BATCH_SIZE):
+        self.cursor = cursor
+        self.batch_size = batch_size
+
+        self.names = {}
+        for table, link_table, link_column in NAME_TABLES:
+            cursor.execute(f"SELECT name, MIN(id) FROM {table} GROUP BY name")
+            self.names[table] = dict(cursor.fetchall())
+
+        self.next_recording_id = next_row_id(cursor, 'recordings')
+        self.pending_recordings = []
+        self.pending_links = {table: [] for table, link_table, link_column in NAME_TABLES}  # (recording id, name)
+        self.recordings_written = 0
+
+    def add(self, recording_data):
+        """Queue a recording with its speaker and categories; returns its id"""
+        recording_id = self.next_recording_id
+        self.next_recording_id += 1
+
+        self.pending_recordings.append((
+            recording_id,
+            recording_data.get('title', 'Unknown Title'),
+            recording_data.get('description', ''),
+            recording_data.get('date_recorded', None),
+            recording_data.get('duration', None),
+            recording_data.get('file_path', None)
+        ))
+
+        # Process speaker
+        if recording_data.get('speaker'):
+            self.pending_links['speakers'].append((recording_id, recording_data['speaker']))
+
+        # Process categories
+        if recording_data.get('categories'):
+            for category_name in recording_data['categories'].split(','):
+                category_name = category_name.strip()
+                if category_name:
+                    self.pending_links['categories'].append((recording_id, category_name))
+
+        if len(self.pending_recordings) >= self.batch_size:
+            self.flush()
+        return recording_id
+
+    def flush(self):
+        """Write the queued recordings, new names and links"""
+        if self.pending_recordings:
+            self.cursor.executemany(
+                """
+                INSERT INTO recordings 
+                (id, title, description, date_recorded, duration, file_path, date_added)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_DATE)
+                """,
+                self.pending_recordings
+            )
+            self.recordings_written += len(self.pending_recordings)
+            self.pending_recordings = []
+
+        for table, link_table, link_column in NAME_TABLES:
+            links = self.pending_links[table]
+            if not links:
+                continue
+
+            names = resolve_names(self.cursor, table, (name for recording_id, name in links), self.names[table])
+
+            self.cursor.executemany(
+                f"INSERT OR IGNORE INTO {link_table} (recording_id, {link_column}) VALUES (?, ?)",
+                [(recording_id, names[name]) for recording_id, name in links]
+            )
+            links.clear()
+
+def initialize_database(database_file):
+    """Create database_file from schema.sql if it doesn't exist yet"""
+    if os.path.exists(database_file):
+        return True
+    
+    if not os.path.exists('schema.sql'):
+        print("Error: schema.sql file not found.")
+        return False
+    
+    print(f"Creating new database '{database_file}'...")
+    conn = sqlite3.connect(database_file)
+    with open('schema.sql', 'r') as f:
+        sql_script = f.read()
+        conn.executescript(sql_script)
+    conn.commit()
+    conn.close()
+    print("Database initialized.")
+    return True
 
 def import_from_csv(csv_file, database_file='adidam_recordings.db'):
     """Import recordings data from a CSV file into the SQLite database"""
@@ -9,128 +180,216 @@ def import_from_csv(csv_file, database_file='adidam_recordings.db'):
         return False
     
     # Check if database exists, if not, initialize it
-    db_exists = os.path.exists(database_file)
-    if not db_exists:
-        if not os.path.exists('schema.sql'):
-            print("Error: schema.sql file not found.")
-            return False
+    if not initialize_database(database_file):
+        return False
+    
+    # Connect to database
+    conn = sqlite3.connect(database_file)
+    cursor = conn.cursor()
+    
+    try:
+        # Bring the schema up to date (adds the unique speaker and category names)
+        migrate(conn)
+        
+        # Read CSV file
+        def show_fields(fieldnames):
+            print(f"Found fields in CSV: {', '.join(fieldnames)}")
+        
+        # Process each row
+        writer = RecordingWriter(cursor)
+        records_processed = 0
+        for recording_data in read_csv_records(csv_file, show_fields):
+            writer.add(recording_data)
+            records_processed += 1
+        writer.flush()
         
-        print(f"Creating new database '{database_file}'...")
-        conn = sqlite3.connect(database_file)
-        with open('schema.sql', 'r') as f:
-            sql_script = f.read()
-            conn.executescript(sql_script)
         conn.commit()
+        print(f"Successfully imported {records_processed} recordings.")
+        return True
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"Error importing data: {str(e)}")
+        return False
+    finally:
         conn.close()
-        print("Database initialized.")
+
+def import_csv_resumable(csv_file, database_file='adidam_recordings.db', chunk_size=CHUNK_ROWS,
+                         rejects_file=None, restart=False):
+    """Import a CSV in chunks of chunk_size rows, each committed with a checkpoint
+    
+    The byte offset and row number after each committed chunk are stored in
+    csv_import_checkpoints, so an interrupted import continues from there
+    when it is run again (restart=True starts over). Rows that can't be read
+    or written are appended to rejects_file (default: <csv name>.rejects.csv)
+    with their row number and the error, instead of aborting the import.
+    Returns True if the whole file has been processed.
+    """
+    if not os.path.exists(csv_file):
+        print(f"Error: CSV file '{csv_file}' not found.")
+        return False
+    
+    if not initialize_database(database_file):
+        return False
+    
+    source = os.path.abspath(csv_file)
+    file_size = os.path.getsize(csv_file)
+    file_mtime = os.path.getmtime(csv_file)
+    if rejects_file is None:
+        rejects_file = os.path.splitext(csv_file)[0] + '.rejects.csv'
     
-    # Connect to database
     conn = sqlite3.connect(database_file)
     cursor = conn.cursor()
     
     try:
-        # Read CSV file
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            csv_reader = csv.DictReader(f)
-            fieldnames = csv_reader.fieldnames
-            
+        # Bring the schema up to date (adds the checkpoint table)
+        migrate(conn)
+        
+        if restart:
+            cursor.execute("DELETE FROM csv_import_checkpoints WHERE source = ?", (source,))
+            conn.commit()
+        
+        cursor.execute(
+            """
+            SELECT file_size, file_mtime, byte_offset, row_number, rows_imported, rows_rejected, completed
+            FROM csv_import_checkpoints WHERE source = ?
+            """,
+            (source,)
+        )
+        checkpoint = cursor.fetchone()
+        if checkpoint:
+            if checkpoint[:2] != (file_size, file_mtime):
+                print(f"Error: '{csv_file}' has changed since its import was started. "
+                      "Import it again with restart=True to start over.")
+                return False
+            if checkpoint[6]:
+                print(f"'{csv_file}' has already been imported ({checkpoint[4]} recordings).")
+                return True
+            byte_offset, row_number, rows_imported, rows_rejected = checkpoint[2:6]
+            print(f"Resuming after row {row_number} ({rows_imported} imported, {rows_rejected} rejected so far)")
+        else:
+            byte_offset = row_number = rows_imported = rows_rejected = 0
+        
+        start_time = time.perf_counter()
+        with open(csv_file, 'rb') as f:
+            lines = OffsetLines(f)
+            csv_reader = csv.reader(lines)
+            fieldnames = next(csv_reader, None)
+            if not fieldnames:
+                print(f"Error: '{csv_file}' is empty.")
+                return False
             print(f"Found fields in CSV: {', '.join(fieldnames)}")
+            if byte_offset > lines.offset:
+                lines.seek(byte_offset)
             
-            # Map CSV fields to database fields
-            # Adjust the mappings based on your actual CSV structure
-            field_mappings = {
-                'Title': 'title',
-                'Description': 'description',
-                'Date': 'date_recorded',
-                'Duration': 'duration',
-                'File': 'file_path',
-                'Speaker': 'speaker',
-                'Categories': 'categories'
-                # Add more mappings as needed
-            }
+            # A fresh import starts a fresh rejects file
+            if not checkpoint or not os.path.exists(rejects_file):
+                with open(rejects_file, 'w', newline='', encoding='utf-8') as rejects:
+                    csv.writer(rejects).writerow(['row_number', 'error'] + fieldnames)
             
-            # Process each row
-            records_processed = 0
-            for row in csv_reader:
-                # Extract main recording data
-                recording_data = {}
-                for csv_field, db_field in field_mappings.items():
-                    if csv_field in row:
-                        recording_data[db_field] = row[csv_field]
+            writer = RecordingWriter(cursor)
+            finished = False
+            while not finished:
+                # Read a chunk: (row number, values, recording data or error)
+                chunk = []
+                while len(chunk) < chunk_size:
+                    try:
+                        values = next(csv_reader)
+                    except StopIteration:
+                        finished = True
+                        break
+                    except (csv.Error, UnicodeDecodeError) as e:
+                        row_number += 1
+                        chunk.append((row_number, [], f"unreadable row: {e}"))
+                        continue
+                    
+                    if not values:
+                        continue  # blank line
+                    row_number += 1
+                    if len(values) != len(fieldnames):
+                        chunk.append((row_number, values, f"expected {len(fieldnames)} fields, found {len(values)}"))
+                    else:
+                        chunk.append((row_number, values, recording_data_from_row(dict(zip(fieldnames, values)))))
                 
-                # Insert recording
+                conn.execute("BEGIN")
+                writer, rejected = _write_chunk(cursor, writer, chunk)
+                rows_imported += len(chunk) - len(rejected)
+                rows_rejected += len(rejected)
                 cursor.execute(
                     """
-                    INSERT INTO recordings 
-                    (title, description, date_recorded, duration, file_path, date_added)
-                    VALUES (?, ?, ?, ?, ?, CURRENT_DATE)
+                    INSERT OR REPLACE INTO csv_import_checkpoints
+                    (source, file_size, file_mtime, byte_offset, row_number, rows_imported, rows_rejected,
+                     completed, date_updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """,
-                    (
-                        recording_data.get('title', 'Unknown Title'),
-                        recording_data.get('description', ''),
-                        recording_data.get('date_recorded', None),
-                        recording_data.get('duration', None),
-                        recording_data.get('file_path', None)
-                    )
+                    (source, file_size, file_mtime, lines.offset, row_number, rows_imported, rows_rejected,
+                     int(finished), datetime.now().isoformat())
                 )
+                conn.commit()
                 
-                recording_id = cursor.lastrowid
+                # Only rows of committed chunks are written to the rejects file
+                if rejected:
+                    with open(rejects_file, 'a', newline='', encoding='utf-8') as rejects:
+                        csv.writer(rejects).writerows([row_number, error] + values
+                                                      for row_number, values, error in rejected)
                 
-                # Process speaker
-                if 'speaker' in recording_data and recording_data['speaker']:
-                    speaker_name = recording_data['speaker']
-                    # Check if speaker exists
-                    cursor.execute("SELECT id FROM speakers WHERE name = ?", (speaker_name,))
-                    speaker = cursor.fetchone()
-                    
-                    if not speaker:
-                        # Create new speaker
-                        cursor.execute("INSERT INTO speakers (name) VALUES (?)", (speaker_name,))
-                        speaker_id = cursor.lastrowid
-                    else:
-                        speaker_id = speaker[0]
-                    
-                    # Link recording to speaker
-                    cursor.execute(
-                        "INSERT INTO recording_speakers (recording_id, speaker_id) VALUES (?, ?)",
-                        (recording_id, speaker_id)
-                    )
-                
-                # Process categories
-                if 'categories' in recording_data and recording_data['categories']:
-                    categories = [cat.strip() for cat in recording_data['categories'].split(',')]
-                    for category_name in categories:
-                        if category_name:
-                            # Check if category exists
-                            cursor.execute("SELECT id FROM categories WHERE name = ?", (category_name,))
-                            category = cursor.fetchone()
-                            
-                            if not category:
-                                # Create new category
-                                cursor.execute("INSERT INTO categories (name) VALUES (?)", (category_name,))
-                                category_id = cursor.lastrowid
-                            else:
-                                category_id = category[0]
-                            
-                            # Link recording to category
-                            cursor.execute(
-                                "INSERT INTO recording_categories (recording_id, category_id) VALUES (?, ?)",
-                                (recording_id, category_id)
-                            )
-                
-                records_processed += 1
-            
-            conn.commit()
-            print(f"Successfully imported {records_processed} recordings.")
-            return True
-            
-    except Exception as e:
+                if chunk:
+                    print(f"Committed through row {row_number} ({rows_imported} imported, {rows_rejected} rejected)")
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"Successfully imported {rows_imported} recordings in {elapsed:.2f}s.")
+        if rows_rejected:
+            print(f"{rows_rejected} rows were rejected; see {rejects_file}")
+        return True
+        
+    except (Exception, KeyboardInterrupt) as e:
         conn.rollback()
-        print(f"Error importing data: {str(e)}")
+        if isinstance(e, KeyboardInterrupt):
+            print(f"Import interrupted after row {row_number}; run it again to resume from the last commit.")
+        else:
+            print(f"Error importing data: {str(e)}")
         return False
     finally:
         conn.close()
 
+def _write_chunk(cursor, writer, chunk):
+    """Write a chunk of rows read by import_csv_resumable inside the open transaction
+    
+    Returns the writer to use for the next chunk and the rejected rows as
+    (row number, values, error). The chunk is first written in one go; if
+    that fails it is written again row by row, rejecting the rows that fail.
+    """
+    rejected = [(row_number, values, data) for row_number, values, data in chunk if isinstance(data, str)]
+    rows = [row for row in chunk if not isinstance(row[2], str)]
+    
+    cursor.execute("SAVEPOINT csv_chunk")
+    try:
+        for row_number, values, recording_data in rows:
+            writer.add(recording_data)
+        writer.flush()
+        cursor.execute("RELEASE csv_chunk")
+        return writer, rejected
+    except sqlite3.DatabaseError:
+        cursor.execute("ROLLBACK TO csv_chunk")
+        cursor.execute("RELEASE csv_chunk")
+    
+    # The writer's name cache may hold names that were rolled back
+    writer = RecordingWriter(cursor)
+    for row_number, values, recording_data in rows:
+        cursor.execute("SAVEPOINT csv_row")
+        try:
+            writer.add(recording_data)
+            writer.flush()
+            cursor.execute("RELEASE csv_row")
+        except sqlite3.DatabaseError as e:
+            cursor.execute("ROLLBACK TO csv_row")
+            cursor.execute("RELEASE csv_row")
+            rejected.append((row_number, values, str(e)))
+            writer = RecordingWriter(cursor)
+    
+    rejected.sort(key=lambda row: row[0])
+    return writer, rejected
+
 if __name__ == "__main__":
     csv_file = input("Enter CSV file path: ")
-    import_from_csv(csv_file)
\ No newline at end of file
+    import_csv_resumable(csv_file)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# Prepared statements kept per connection (sqlite3 defaults to 128)
+CACHED_STATEMENTS = 512
+
+# Read-side tuning applied to every connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",  # Map up to 256 MB of the file
+    "PRAGMA cache_size = -65536",    # 64 MB page cache
+    "PRAGMA temp_store = MEMORY",
+)
+
+class AdidamDatabase:
+    """Shared access to the recordings database for the search apps
+
+    Each thread gets one long-lived connection, opened on first use and kept
+    until close(), so opening the database and re-preparing statements does
+    not happen on every click.
+
+    The schema is left as it is; the importers and tools that write migrate
+    it, and the queries fall back to LIKE search and the old essay sort on
+    a database they haven't. With read_only the file is opened read-only.
+    """
+
+    def __init__(self, db_path='adidam_recordings.db', read_only=False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return this thread's connection, opening it if needed"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def cursor(self, row_factory=None):
+        """Return a new cursor on this thread's connection"""
+        cursor = self.connection().cursor()
+        if row_factory is not None:
+            cursor.row_factory = row_factory
+        return cursor
+
+    def close(self):
+        """Close every connection opened through this object"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def _open(self):
+        # sqlite3 would create an empty database instead
+        if not os.path.exists(self.db_path):
+            raise sqlite3.OperationalError(f"database not found: {self.db_path}")
+        # Only the owning thread uses a connection; the flag just lets close()
+        # tidy up connections opened by worker threads
+        if self.read_only:
+            # The browser never writes, so let SQLite enforce it
+            uri = Path(os.path.abspath(self.db_path)).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, cached_statements=CACHED_STATEMENTS,
+                                   check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
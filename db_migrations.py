@@ -0,0 +1,399 @@
+import re
+import sqlite3
+
+from search_index import create_search_index, recreate_search_triggers, search_index_exists, table_columns
+
+# Sort position of essay numbers with no leading digits (matches the old
+# CASE ... ELSE 999999 ordering, which put them after numbered essays)
+NON_NUMERIC_SORT = 999999
+
+ROMAN_NUMERAL_PATTERN = re.compile(r'^M{0,4}(CM|CD|D?C{0,3})(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})$', re.IGNORECASE)
+ROMAN_VALUES = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100, 'd': 500, 'm': 1000}
+
+def roman_to_int(text):
+    """Convert a Roman numeral to an int (None if text isn't one)"""
+    if not text or not ROMAN_NUMERAL_PATTERN.match(text):
+        return None
+    values = [ROMAN_VALUES[c] for c in text.lower()]
+    return sum(-v if i + 1 < len(values) and v < values[i + 1] else v
+               for i, v in enumerate(values))
+
+def int_to_roman(value):
+    """Roman numeral of 1-4999 in the form roman_to_int accepts ("XIV")"""
+    numerals = []
+    for numeral, amount in (('M', 1000), ('CM', 900), ('D', 500), ('CD', 400), ('C', 100), ('XC', 90),
+                            ('L', 50), ('XL', 40), ('X', 10), ('IX', 9), ('V', 5), ('IV', 4), ('I', 1)):
+        count, value = divmod(value, amount)
+        numerals.append(numeral * count)
+    return ''.join(numerals)
+
+def essay_sort_key(essay_number):
+    """Split an essay number into (sort_num, sort_suffix) for the essays table
+
+    "12" -> (12, ''), "12a" -> (12, 'a'). Numbers without leading digits sort
+    after numbered essays; Roman numerals among them keep their numeric order
+    ("III" -> (NON_NUMERIC_SORT, '000003')), anything else sorts as text.
+    """
+    text = ' '.join((essay_number or '').split())
+    match = re.match(r'(\d+)(.*)', text)
+    if match:
+        return int(match.group(1)), match.group(2).strip().lower()
+
+    roman_value = roman_to_int(text)
+    if roman_value is not None:
+        return NON_NUMERIC_SORT, f"{roman_value:06d}"
+
+    return NON_NUMERIC_SORT, text.lower()
+
+def add_browse_indexes(cursor):
+    """Covering indexes for the book browser and search result trees"""
+    essay_cols = table_columns(cursor, 'essays')
+    if {'book_id', 'essay_number', 'display_order', 'title'} <= essay_cols:
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_essays_book_browse
+            ON essays(book_id, essay_number, display_order, title)
+        """)
+
+    # Cover whichever of the listed recording columns this schema has
+    recording_cols = table_columns(cursor, 'recordings')
+    if 'essay_id' in recording_cols:
+        covered = [col for col in ('reciter', 'recorded_date', 'duration', 'title') if col in recording_cols]
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_recordings_essay_browse
+            ON recordings({', '.join(['essay_id'] + covered)})
+        """)
+
+    # Superseded by idx_recordings_essay_browse
+    cursor.execute("DROP INDEX IF EXISTS idx_recordings_essay_id")
+
+def add_essay_sort_keys(cursor):
+    """Precomputed essay_number sort columns, backfilled and indexed for browsing"""
+    essay_cols = table_columns(cursor, 'essays')
+    if not essay_cols:
+        return
+
+    if 'essay_sort_num' not in essay_cols:
+        cursor.execute("ALTER TABLE essays ADD COLUMN essay_sort_num INTEGER")
+    if 'essay_sort_suffix' not in essay_cols:
+        cursor.execute("ALTER TABLE essays ADD COLUMN essay_sort_suffix TEXT")
+
+    # Older search triggers re-index an essay on any update; swap them for
+    # ones that ignore the sort columns before backfilling
+    if search_index_exists(cursor):
+        recreate_search_triggers(cursor)
+
+    cursor.execute("SELECT id, essay_number FROM essays")
+    cursor.executemany(
+        "UPDATE essays SET essay_sort_num = ?, essay_sort_suffix = ? WHERE id = ?",
+        [essay_sort_key(essay_number) + (essay_id,) for essay_id, essay_number in cursor.fetchall()]
+    )
+
+    # Serves WHERE book_id = ? ORDER BY the sort keys straight from the index
+    cursor.execute("DROP INDEX IF EXISTS idx_essays_book_browse")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_essays_book_sort
+        ON essays(book_id, essay_sort_num, essay_sort_suffix, display_order, title, essay_number)
+    """)
+
+def add_search_index(cursor):
+    """Full-text search table and triggers (see search_index.py)"""
+    if not search_index_exists(cursor):
+        create_search_index(cursor)
+
+def add_import_manifest(cursor):
+    """Tables remembering what the DOCX importers last imported (see import_manifest.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            source TEXT NOT NULL,
+            section TEXT NOT NULL,
+            section_hash TEXT NOT NULL,
+            date_imported TEXT,
+            PRIMARY KEY (source, section)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS import_manifest_rows (
+            source TEXT NOT NULL,
+            section TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            row_hash TEXT NOT NULL,
+            essay_id INTEGER,
+            PRIMARY KEY (source, section, row_key)
+        )
+    """)
+
+def add_unique_names(cursor):
+    """Unique speaker and category names, so the CSV importer can upsert them
+
+    Duplicates are merged into the lowest id first, with their recording
+    links moved over.
+    """
+    for table, link_table, link_column in (('speakers', 'recording_speakers', 'speaker_id'),
+                                           ('categories', 'recording_categories', 'category_id')):
+        if 'name' not in table_columns(cursor, table):
+            continue
+
+        if table_columns(cursor, link_table):
+            cursor.execute(f"""
+                UPDATE OR IGNORE {link_table}
+                SET {link_column} = (SELECT MIN(first.id) FROM {table} first
+                                     JOIN {table} dup ON dup.name = first.name
+                                     WHERE dup.id = {link_table}.{link_column})
+                WHERE {link_column} IN (SELECT id FROM {table})
+            """)
+            # Links that would have become duplicates
+            cursor.execute(f"""
+                DELETE FROM {link_table}
+                WHERE {link_column} IN (SELECT id FROM {table})
+                AND {link_column} NOT IN (SELECT MIN(id) FROM {table} GROUP BY name)
+            """)
+        cursor.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY name)")
+
+        cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_name")
+        cursor.execute(f"CREATE UNIQUE INDEX idx_{table}_name ON {table}(name)")
+
+def add_csv_checkpoints(cursor):
+    """Progress of chunked CSV imports, so they can resume (see csv_importer.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS csv_import_checkpoints (
+            source TEXT PRIMARY KEY,
+            file_size INTEGER,
+            file_mtime REAL,
+            byte_offset INTEGER NOT NULL DEFAULT 0,
+            row_number INTEGER NOT NULL DEFAULT 0,
+            rows_imported INTEGER NOT NULL DEFAULT 0,
+            rows_rejected INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            date_updated TEXT
+        )
+    """)
+
+def add_recording_lookup_indexes(cursor):
+    """Indexes the scraper finds recordings by: file path, then title
+
+    The file path index is unique where the paths already are, so the
+    scraper can upsert on it; databases that share one file between
+    recordings (like the demo database) get a plain index.
+    """
+    recording_cols = table_columns(cursor, 'recordings')
+    if 'title' in recording_cols:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_recordings_title ON recordings(title)")
+    if 'file_path' not in recording_cols:
+        return
+
+    cursor.execute("""
+        SELECT 1 FROM recordings WHERE file_path IS NOT NULL
+        GROUP BY file_path HAVING COUNT(*) > 1 LIMIT 1
+    """)
+    unique = 'UNIQUE ' if cursor.fetchone() is None else ''
+    cursor.execute(f"""
+        CREATE {unique}INDEX IF NOT EXISTS idx_recordings_file_path
+        ON recordings(file_path) WHERE file_path IS NOT NULL
+    """)
+
+def add_scrape_state(cursor):
+    """Per-page progress of the scraper, so a crawl can resume (see scrape_state.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_state (
+            url TEXT PRIMARY KEY,
+            page_number INTEGER,
+            status TEXT NOT NULL,
+            content_hash TEXT,
+            item_count INTEGER,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            date_fetched TEXT,
+            date_updated TEXT
+        )
+    """)
+
+def add_download_columns(cursor):
+    """Where a downloaded recording came from and its checksum (see audio_downloader.py)
+
+    The downloader points file_path at the local copy and keeps the URL in
+    remote_url, which the scraper matches recordings by as well.
+    """
+    recording_cols = table_columns(cursor, 'recordings')
+    if 'file_path' not in recording_cols:
+        return
+
+    for column, column_type in (('remote_url', 'TEXT'), ('file_size', 'INTEGER'), ('file_sha256', 'TEXT')):
+        if column not in recording_cols:
+            cursor.execute(f"ALTER TABLE recordings ADD COLUMN {column} {column_type}")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordings_remote_url
+        ON recordings(remote_url) WHERE remote_url IS NOT NULL
+    """)
+
+def add_audio_metadata_columns(cursor):
+    """Codec details read from the audio files (see audio_metadata.py)"""
+    recording_cols = table_columns(cursor, 'recordings')
+    if 'file_path' not in recording_cols:
+        return
+
+    for column, column_type in (('duration', 'TEXT'), ('audio_format', 'VARCHAR(50)'),
+                                ('bitrate', 'INTEGER'), ('sample_rate', 'INTEGER')):
+        if column not in recording_cols:
+            cursor.execute(f"ALTER TABLE recordings ADD COLUMN {column} {column_type}")
+
+def add_file_index(cursor):
+    """Stat signatures and fingerprints of the recordings' files (see file_index.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_index (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            fingerprint TEXT,
+            error TEXT,
+            missing INTEGER NOT NULL DEFAULT 0,
+            date_scanned TEXT,
+            date_missing TEXT
+        )
+    """)
+
+def add_waveforms(cursor):
+    """Precomputed waveform peak files of the recordings' audio (see waveform_peaks.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS waveforms (
+            file_path TEXT PRIMARY KEY,
+            peaks_path TEXT NOT NULL,
+            size INTEGER,
+            mtime_ns INTEGER,
+            duration REAL,
+            date_computed TEXT
+        )
+    """)
+
+def add_waveform_errors(cursor):
+    """Why a recording's waveform couldn't be computed, so it isn't retried until the file changes"""
+    if 'error' not in table_columns(cursor, 'waveforms'):
+        cursor.execute("ALTER TABLE waveforms ADD COLUMN error TEXT")
+
+# essay_sort_key() in SQL, for the triggers; {number} is the essay_number
+# expression. Only differs in not collapsing whitespace inside a suffix.
+SORT_TEXT_SQL = "trim(COALESCE({number}, ''), ' ' || char(9, 10, 13))"
+SORT_NUM_SQL = f"""
+    CASE WHEN {SORT_TEXT_SQL} GLOB '[0-9]*' THEN CAST({SORT_TEXT_SQL} AS INTEGER)
+    ELSE {NON_NUMERIC_SORT} END
+"""
+SORT_SUFFIX_SQL = f"""
+    CASE WHEN {SORT_TEXT_SQL} GLOB '[0-9]*'
+    THEN lower(trim(ltrim({SORT_TEXT_SQL}, '0123456789'), ' ' || char(9, 10, 13)))
+    ELSE COALESCE((SELECT printf('%06d', value) FROM roman_numerals WHERE numeral = upper({SORT_TEXT_SQL})),
+                  lower({SORT_TEXT_SQL}))
+    END
+"""
+
+def add_essay_sort_key_triggers(cursor):
+    """Triggers filling in the essay sort keys, so essays added or renumbered
+    by code that doesn't set them (setup.py's importer, create_sample_db.py,
+    hand edits) still sort in place
+    """
+    if 'essay_sort_num' not in table_columns(cursor, 'essays'):
+        return
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS roman_numerals (numeral TEXT PRIMARY KEY, value INTEGER) WITHOUT ROWID")
+    cursor.executemany("INSERT OR IGNORE INTO roman_numerals VALUES (?, ?)",
+                       [(int_to_roman(value), value) for value in range(1, 5000)])
+
+    new_keys = (f"essay_sort_num = {SORT_NUM_SQL.format(number='NEW.essay_number')}, "
+                f"essay_sort_suffix = {SORT_SUFFIX_SQL.format(number='NEW.essay_number')}")
+    # The importers set the keys themselves; only fill in missing ones
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS essays_sort_key_ai AFTER INSERT ON essays
+        WHEN NEW.essay_sort_num IS NULL OR NEW.essay_sort_suffix IS NULL
+        BEGIN UPDATE essays SET {new_keys} WHERE id = NEW.id; END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS essays_sort_key_au AFTER UPDATE OF essay_number ON essays
+        BEGIN UPDATE essays SET {new_keys} WHERE id = NEW.id; END
+    """)
+
+    # Essays added without keys since they were introduced
+    cursor.execute("SELECT id, essay_number FROM essays WHERE essay_sort_num IS NULL OR essay_sort_suffix IS NULL")
+    cursor.executemany(
+        "UPDATE essays SET essay_sort_num = ?, essay_sort_suffix = ? WHERE id = ?",
+        [essay_sort_key(essay_number) + (essay_id,) for essay_id, essay_number in cursor.fetchall()]
+    )
+
+def key_import_manifests_by_importer(cursor):
+    """Index manifest rows by essay, and drop manifests keyed by bare file name
+
+    Those predate keying by importer and path (see import_manifest.py); the
+    next import of each document re-applies it once, matching the existing
+    essays instead of adding them again.
+    """
+    if not table_columns(cursor, 'import_manifest_rows'):
+        return
+    cursor.execute("DELETE FROM import_manifest WHERE instr(source, ':') = 0")
+    cursor.execute("DELETE FROM import_manifest_rows WHERE instr(source, ':') = 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_import_manifest_rows_essay ON import_manifest_rows(essay_id)")
+
+# (version, description, step) - versions are stored in PRAGMA user_version
+MIGRATIONS = [
+    (1, "browse covering indexes", add_browse_indexes),
+    (2, "full-text search index", add_search_index),
+    (3, "essay number sort keys", add_essay_sort_keys),
+    (4, "import manifest", add_import_manifest),
+    (5, "unique speaker and category names", add_unique_names),
+    (6, "CSV import checkpoints", add_csv_checkpoints),
+    (7, "recording lookup indexes", add_recording_lookup_indexes),
+    (8, "scrape state", add_scrape_state),
+    (9, "recording download columns", add_download_columns),
+    (10, "audio metadata columns", add_audio_metadata_columns),
+    (11, "file index", add_file_index),
+    (12, "waveform peaks", add_waveforms),
+    (13, "waveform errors", add_waveform_errors),
+    (14, "essay sort key triggers", add_essay_sort_key_triggers),
+    (15, "import manifests per importer", key_import_manifests_by_importer),
+]
+
+def schema_version(conn):
+    """Return the migration version the database is at"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, verbose=False):
+    """Apply any pending migrations, each in its own transaction
+
+    Refreshes the planner statistics with ANALYZE when anything changed.
+    Returns the number of migrations applied.
+    """
+    current = schema_version(conn)
+    applied = 0
+
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+
+        if verbose:
+            print(f"Applying migration {version}: {description}")
+
+        cursor = conn.cursor()
+        conn.execute("BEGIN")
+        try:
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied += 1
+
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return applied
+
+def main():
+    db_path = input("Database path (default adidam_recordings.db): ").strip('"\'') or 'adidam_recordings.db'
+    conn = sqlite3.connect(db_path)
+    try:
+        applied = migrate(conn, verbose=True)
+        print(f"Applied {applied} migration(s); database is at version {schema_version(conn)}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,25 @@
 import os
 import sqlite3
 import re
-from datetime import datetime
 
-try:
-    from docx import Document
-    print("Successfully imported python-docx")
-except ImportError:
-    print("Error importing docx. Please make sure python-docx is installed.")
-    print("Run: pip install python-docx")
-    exit(1)
+from bulk_import import BulkLoader
+from db_migrations import migrate
+from import_manifest import IncrementalImport
+from ooxml_reader import iter_document_lines
+
+# Book titles - "*[The Aletheon]*"
+BOOK_PATTERN = re.compile(r'\*\[([^]]+)\]\*')
+
+# Essay entries - "**349** Acausal Adidam"
+ESSAY_PATTERN = re.compile(r'\*\*([^*]+)\*\*\s+(.*)')
+
+# Formatting left in essay titles
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\.[\w]+')
+STYLE_PATTERN = re.compile(r'\{\.[\w]+\}')
 
 class EohIndexImporter:
     def __init__(self, db_path='adidam_recordings.db'):
         self.db_path = db_path
-        self.current_book_id = None
         self.current_book_title = None
         
     def import_from_docx(self, docx_path):
@@ -28,36 +33,24 @@ class EohIndexImporter:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Open the Word document
-            print(f"Opening document: {docx_path}")
-            doc = Document(docx_path)
-            
-            print(f"Document opened successfully")
-            print(f"Document contains {len(doc.paragraphs)} paragraphs and {len(doc.tables)} tables")
-            
-            # Extract all text from the document
-            full_text = ""
-            for para in doc.paragraphs:
-                full_text += para.text + "\n"
-                
-            # For tables - these might contain our data
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        full_text += cell.text + "\n"
+            # Bring the schema up to date (adds the essay sort key columns)
+            migrate(conn)
             
-            print(f"Extracted {len(full_text)} characters of text")
+            print(f"Reading document: {docx_path}")
             
             # Begin transaction
-            conn.execute('BEGIN TRANSACTION')
+            loader = BulkLoader(conn)
+            loader.begin()
+            sync = IncrementalImport(loader, docx_path, 'docx_importer')
             
-            # Process the text line by line
-            lines = full_text.split('\n')
+            # Stream the text line by line in document order, paragraphs and
+            # table cells alike, straight from the document XML (see
+            # ooxml_reader.py), writing entries as they are found
             line_count = 0
             book_count = 0
             essay_count = 0
             
-            for line in lines:
+            for kind, line in iter_document_lines(docx_path):
                 line = line.strip()
                 if not line:
                     continue
@@ -65,30 +58,35 @@ class EohIndexImporter:
                 line_count += 1
                 
                 # Look for book titles - "The Aletheon" or similar
-                book_match = re.search(r'\*\[([^]]+)\]\*', line)
+                book_match = BOOK_PATTERN.search(line)
                 if book_match:
                     book_title = book_match.group(1).strip()
-                    self.process_book_title(book_title, cursor)
+                    self.process_book_title(book_title, sync)
                     book_count += 1
                     continue
                 
                 # Look for essay entries - "**349** Acausal Adidam"
-                essay_match = re.search(r'\*\*([^*]+)\*\*\s+(.*)', line)
-                if essay_match and self.current_book_id:
+                essay_match = ESSAY_PATTERN.search(line)
+                if essay_match and self.current_book_title:
                     essay_number = essay_match.group(1).strip()
                     essay_title = essay_match.group(2).strip()
-                    self.process_essay_entry(essay_number, essay_title, cursor)
+                    self.process_essay_entry(essay_number, essay_title, sync)
                     essay_count += 1
             
-            # Commit the transaction
-            conn.commit()
+            # Write the last section and commit the transaction
+            sync.finish()
+            loader.commit()
+            print(loader.report())
+            print(sync.summary())
             
             print(f"Processed {line_count} lines")
             print(f"Imported {book_count} books and {essay_count} essays")
             return True
             
         except Exception as e:
-            if 'conn' in locals():
+            if 'loader' in locals():
+                loader.rollback()
+            elif 'conn' in locals():
                 conn.rollback()
             print(f"Error during import: {str(e)}")
             return False
@@ -96,34 +94,20 @@ class EohIndexImporter:
             if 'conn' in locals():
                 conn.close()
     
-    def process_book_title(self, book_title, cursor):
+    def process_book_title(self, book_title, sync):
         """Process a book title"""
         # Clean up any remaining formatting
         book_title = book_title.replace("{.smallcaps}", "").strip()
         
-        # Check if this book already exists
-        cursor.execute("SELECT id FROM books WHERE title = ?", (book_title,))
-        existing_book = cursor.fetchone()
-        
-        if existing_book:
-            self.current_book_id = existing_book[0]
-            self.current_book_title = book_title
-            print(f"Found existing book: {book_title} (ID: {self.current_book_id})")
-        else:
-            # Insert new book
-            cursor.execute(
-                "INSERT INTO books (title, display_order) VALUES (?, ?)",
-                (book_title, 0)  # We'll update display order later
-            )
-            self.current_book_id = cursor.lastrowid
-            self.current_book_title = book_title
-            print(f"Added new book: {book_title} (ID: {self.current_book_id})")
+        # Start the book's section; it is written once all its essays are read
+        self.current_book_title = book_title
+        sync.start_section(book_title, 0)  # We'll update display order later
     
-    def process_essay_entry(self, essay_number, essay_title, cursor):
+    def process_essay_entry(self, essay_number, essay_title, sync):
         """Process an essay entry"""
         # Clean up title (remove formatting)
-        essay_title = re.sub(r'\[([^\]]+)\]\.[\w]+', r'\1', essay_title)
-        essay_title = re.sub(r'\{\.[\w]+\}', '', essay_title)
+        essay_title = LINK_PATTERN.sub(r'\1', essay_title)
+        essay_title = STYLE_PATTERN.sub('', essay_title)
         essay_title = essay_title.replace("[", "").replace("]", "")
         essay_title = essay_title.replace("{.underline}", "").strip()
         
@@ -131,38 +115,8 @@ class EohIndexImporter:
         essay_numbers = [num.strip() for num in essay_number.split(',')]
         
         for num in essay_numbers:
-            # Check if this essay already exists
-            cursor.execute(
-                "SELECT id FROM essays WHERE title = ? AND book_id = ? AND essay_number = ?", 
-                (essay_title, self.current_book_id, num)
-            )
-            existing_essay = cursor.fetchone()
-            
-            if existing_essay:
-                essay_id = existing_essay[0]
-                print(f"  Found existing essay: {essay_title} (ID: {essay_id}, Number: {num})")
-            else:
-                # Insert new essay
-                cursor.execute(
-                    """
-                    INSERT INTO essays 
-                    (title, book_id, essay_number, display_order) 
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (essay_title, self.current_book_id, num, 0)
-                )
-                essay_id = cursor.lastrowid
-                print(f"  Added new essay: {essay_title} (ID: {essay_id}, Number: {num})")
-                
-                # For each essay, create a placeholder recording
-                cursor.execute(
-                    """
-                    INSERT INTO recordings 
-                    (essay_id, title, date_added) 
-                    VALUES (?, ?, ?)
-                    """,
-                    (essay_id, f"Recording of {essay_title}", datetime.now().isoformat())
-                )
+            # Queue the essay in the book's section
+            sync.add_essay(num, essay_title, 0)
 
 def main():
     print("Adidam EOH Index Importer")
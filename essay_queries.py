@@ -0,0 +1,79 @@
+import sqlite3
+
+# Essays of one book joined to their recordings, in display order. The sort
+# keys are maintained by the importers (see db_migrations.essay_sort_key) and
+# indexed together with book_id, so no sort step is needed for the essays.
+ESSAYS_WITH_RECORDINGS_SQL = """
+    SELECT e.id, e.essay_number, e.title,
+           r.id, r.title, r.reciter, r.recorded_date, r.duration
+    FROM essays e
+    LEFT JOIN recordings r ON r.essay_id = e.id
+    WHERE e.book_id = ?
+    ORDER BY
+        e.essay_sort_num,
+        e.essay_sort_suffix,
+        e.display_order,
+        e.title,
+        e.essay_number,
+        e.id,
+        r.reciter,
+        r.recorded_date
+"""
+
+# Same query for databases that haven't been migrated to sort keys yet
+LEGACY_ESSAYS_WITH_RECORDINGS_SQL = """
+    SELECT e.id, e.essay_number, e.title,
+           r.id, r.title, r.reciter, r.recorded_date, r.duration
+    FROM essays e
+    LEFT JOIN recordings r ON r.essay_id = e.id
+    WHERE e.book_id = ?
+    ORDER BY
+        CASE
+            WHEN e.essay_number GLOB '[0-9]*' THEN CAST(e.essay_number AS INTEGER)
+            ELSE 999999
+        END,
+        e.display_order,
+        e.title,
+        e.id,
+        r.reciter,
+        r.recorded_date
+"""
+
+# Recordings of one essay, as listed under it in the trees
+RECORDINGS_FOR_ESSAY_SQL = """
+    SELECT r.id, r.title, r.reciter, r.recorded_date, r.duration
+    FROM recordings r
+    WHERE r.essay_id = ?
+    ORDER BY r.reciter, r.recorded_date
+"""
+
+def fetch_essays_with_recordings(cursor, book_id):
+    """Fetch a book's essays and their recordings in a single ordered query
+
+    Returns a list of (essay_id, essay_number, title, recordings) tuples where
+    recordings is a list of (rec_id, rec_title, reciter, rec_date, duration).
+    """
+    try:
+        cursor.execute(ESSAYS_WITH_RECORDINGS_SQL, (book_id,))
+    except sqlite3.OperationalError as e:
+        # Read-only databases may not have been migrated
+        if 'essay_sort_num' not in str(e):
+            raise
+        cursor.execute(LEGACY_ESSAYS_WITH_RECORDINGS_SQL, (book_id,))
+
+    # Rows for the same essay arrive together, so group them as we go
+    essays = []
+    current_essay_id = None
+    recordings = None
+
+    for essay_id, essay_number, title, rec_id, rec_title, reciter, rec_date, duration in cursor:
+        if essay_id != current_essay_id:
+            current_essay_id = essay_id
+            recordings = []
+            essays.append((essay_id, essay_number, title, recordings))
+
+        # LEFT JOIN gives a single NULL row for essays without recordings
+        if rec_id is not None:
+            recordings.append((rec_id, rec_title, reciter, rec_date, duration))
+
+    return essays
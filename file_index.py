@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from audio_metadata import BATCH_SIZE, WORKER_CHUNK, format_duration, read_audio_metadata, stat_signature
+from db_migrations import migrate
+
+# Incremental rescan of the recordings' audio files. The file_index table
+# keeps each file's stat signature (size, mtime, inode) and a content
+# fingerprint; a rescan walks the library roots with os.scandir, compares
+# the signatures with the index in one pass, and only reads files that are
+# new or changed, so a nightly run costs about as much as the churn:
+#
+#   python file_index.py --db adidam_recordings.db D:\Recordings E:\Archive
+#
+# Recordings pointing at files that have disappeared are flagged missing
+# in the index. Files that couldn't be read are only retried once they
+# change (or with --rescan).
+
+AUDIO_EXTENSIONS = ('.mp3', '.mp2', '.wav', '.flac', '.m4a', '.m4b', '.mp4', '.aac')
+
+# Bytes from each end of a file that go into its fingerprint
+FINGERPRINT_BYTES = 16 * 1024
+
+def walk_audio_files(roots):
+    """{path: (size, mtime_ns, inode)} of the audio files under roots"""
+    found = {}
+    stack = [os.path.abspath(root) for root in roots]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                except OSError:
+                    continue
+    return found
+
+def fingerprint(path, size):
+    """SHA-1 of a file's size and its first and last FINGERPRINT_BYTES"""
+    digest = hashlib.sha1(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > 2 * FINGERPRINT_BYTES:
+            f.seek(-FINGERPRINT_BYTES, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_BYTES))
+        elif size > FINGERPRINT_BYTES:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def index_file(job):
+    """Worker: (path, fingerprint, metadata, error) for a (path, size, previous fingerprint) job
+
+    metadata is None when the fingerprint matches the previous one (the
+    file was only touched or copied back unchanged).
+    """
+    path, size, previous = job
+    try:
+        content = fingerprint(path, size)
+        if content == previous:
+            return path, content, None, None
+        return path, content, read_audio_metadata(path), None
+    except Exception as e:
+        return path, None, None, str(e) or type(e).__name__
+
+class FileIndexWriter:
+    """Batches the index and recording updates of a rescan into transactions"""
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.index_rows = []
+        self.recording_rows = []
+
+    def add(self, path, signature, content, metadata, error):
+        now = datetime.now().isoformat()
+        self.index_rows.append((path,) + tuple(signature) + (content, error, now))
+        if metadata is not None:
+            self.recording_rows.append((metadata['file_size'], metadata['audio_format'], metadata['bitrate'],
+                                        metadata['sample_rate'], format_duration(metadata['duration']), path))
+        if len(self.index_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany(
+            """
+            INSERT INTO file_index (path, size, mtime_ns, inode, fingerprint, error, missing, date_scanned)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+            ON CONFLICT (path) DO UPDATE SET
+            size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,
+            fingerprint = excluded.fingerprint, error = excluded.error,
+            missing = 0, date_scanned = excluded.date_scanned, date_missing = NULL
+            """,
+            self.index_rows
+        )
+        self.conn.executemany(
+            """
+            UPDATE recordings
+            SET file_size = ?, audio_format = ?, bitrate = ?, sample_rate = ?, duration = ?
+            WHERE file_path = ?
+            """,
+            self.recording_rows
+        )
+        self.conn.commit()
+        self.index_rows = []
+        self.recording_rows = []
+
+    def mark_missing(self, paths):
+        now = datetime.now().isoformat()
+        self.conn.executemany(
+            """
+            INSERT INTO file_index (path, missing, date_missing) VALUES (?, 1, ?)
+            ON CONFLICT (path) DO UPDATE SET missing = 1, date_missing = COALESCE(date_missing, excluded.date_missing)
+            """,
+            [(path, now) for path in paths]
+        )
+        self.conn.commit()
+
+def rescan_library(db_path='adidam_recordings.db', roots=(), workers=None, batch_size=BATCH_SIZE, rescan=False):
+    """Bring file_index and the recordings' metadata up to date with the files on disk
+
+    Files under roots are stat'ed with os.scandir; recordings' files
+    outside the roots are stat'ed one by one. With rescan, every file is
+    read again, including unchanged and unreadable ones. Returns a dict of
+    counts.
+    """
+    start_time = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT file_path, MAX(sample_rate IS NULL) FROM recordings
+            WHERE file_path IS NOT NULL AND file_path != ''
+            AND file_path NOT LIKE 'http://%' AND file_path NOT LIKE 'https://%'
+            GROUP BY file_path
+        """)
+        rows = cursor.fetchall()
+        referenced = {os.path.abspath(path): path for path, _ in rows}
+        # Recordings without metadata yet, e.g. new ones pointing at an indexed file
+        unscanned = {path for path, no_metadata in rows if no_metadata}
+
+        on_disk = walk_audio_files(roots) if roots else {}
+        signatures = {}
+        missing = []
+        for path, stored_path in referenced.items():
+            signature = on_disk.get(path)
+            if signature is None:
+                signature = stat_signature(path)
+            if signature is None:
+                missing.append(stored_path)
+            else:
+                signatures[stored_path] = signature
+
+        cursor.execute("SELECT path, size, mtime_ns, inode, fingerprint, missing, error FROM file_index")
+        index = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        jobs = []
+        reappeared = []
+        still_unreadable = 0
+        for path, signature in signatures.items():
+            known = index.get(path)
+            changed = known is None or tuple(known[:3]) != signature
+            if changed or rescan or (path in unscanned and not known[5]):
+                previous = known[3] if known and path not in unscanned and not rescan else None
+                jobs.append((path, signature[0], previous))
+                continue
+            if known[5]:
+                # Failed before and hasn't changed since
+                still_unreadable += 1
+            if known[4]:
+                reappeared.append(path)
+
+        counts = {'files': len(referenced), 'unchanged': len(signatures) - len(jobs), 'read': 0,
+                  'touched': 0, 'unreadable': 0, 'still_unreadable': still_unreadable, 'missing': len(missing),
+                  'unreferenced': len(set(on_disk) - set(referenced))}
+        print(f"{counts['files']} files, {len(jobs)} new or changed, {len(missing)} missing")
+
+        writer = FileIndexWriter(conn, batch_size)
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for path, content, metadata, error in pool.map(index_file, jobs, chunksize=WORKER_CHUNK):
+                    if error is not None:
+                        print(f"  Can't read {path}: {error}")
+                        counts['unreadable'] += 1
+                    elif metadata is None:
+                        counts['touched'] += 1
+                    else:
+                        counts['read'] += 1
+                    writer.add(path, signatures[path], content, metadata, error)
+        writer.flush()
+
+        writer.mark_missing(missing)
+        conn.executemany("UPDATE file_index SET missing = 0, date_missing = NULL WHERE path = ?",
+                         [(path,) for path in reappeared])
+        conn.commit()
+
+        print(f"Read {counts['read']} files ({counts['touched']} only touched, {counts['unreadable']} unreadable, "
+              f"{counts['missing']} missing) in {time.perf_counter() - start_time:.1f}s")
+        if still_unreadable:
+            print(f"Skipped {still_unreadable} unchanged files that couldn't be read before (--rescan to retry)")
+        return counts
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescan the recordings' audio files, reading only new or changed ones")
+    parser.add_argument("roots", nargs="*", help="Library directories to walk (recordings' files elsewhere are stat'ed)")
+    parser.add_argument("--db", default="adidam_recordings.db", help="Recordings database")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--rescan", action="store_true", help="Read every file again, even unchanged or unreadable ones")
+    args = parser.parse_args()
+
+    rescan_library(args.db, args.roots, args.workers, rescan=args.rescan)
+
+if __name__ == "__main__":
+    main()
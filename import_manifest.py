@@ -0,0 +1,166 @@
+import hashlib
+import os
+from datetime import datetime
+
+def manifest_source(importer, docx_path):
+    """import_manifest source of a document read by an importer ("table_importer:/path/EOH Index.docx")"""
+    return f"{importer}:{os.path.abspath(docx_path)}"
+
+def content_hash(*values):
+    """Stable hash of a sequence of strings"""
+    digest = hashlib.sha1()
+    for value in values:
+        digest.update((value or '').encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class IncrementalImport:
+    """Applies an index document to the database one book section at a time
+
+    The importers hand over book titles and essay entries in document order
+    instead of writing them directly. When a section (a book title and the
+    essays under it) is complete, its hash is compared with the one stored in
+    import_manifest for this document: unchanged sections are skipped without
+    touching the database. For changed sections each row is matched by essay
+    number against import_manifest_rows, so only added, retitled and removed
+    essays are written. Sections that disappeared from the document have their
+    essays removed.
+
+    Removing an essay also removes its placeholder recordings; essays with real
+    recordings (a file_path) are kept, and so are essays another manifest row
+    still points at (a repeated essay number maps to the same essay).
+
+    Manifests are kept per importer and document path, so importers reading
+    the same file their own way don't overwrite each other's.
+    """
+
+    def __init__(self, loader, docx_path, importer):
+        self.loader = loader
+        self.cursor = loader.cursor
+        self.source = manifest_source(importer, docx_path)
+
+        self.cursor.execute("SELECT section, section_hash FROM import_manifest WHERE source = ?", (self.source,))
+        self.section_hashes = dict(self.cursor.fetchall())
+
+        self.manifest_rows = {}  # section -> {row_key: (row_hash, essay_id)}
+        self.cursor.execute(
+            "SELECT section, row_key, row_hash, essay_id FROM import_manifest_rows WHERE source = ?",
+            (self.source,)
+        )
+        for section, row_key, row_hash, essay_id in self.cursor.fetchall():
+            self.manifest_rows.setdefault(section, {})[row_key] = (row_hash, essay_id)
+
+        self.section = None  # (book title, display order, [(essay number, title, display order)])
+        self.seen_sections = set()
+        self.counts = dict.fromkeys(
+            ('unchanged', 'changed', 'new', 'removed', 'added', 'updated', 'deleted', 'kept'), 0)
+
+    def start_section(self, book_title, display_order=0):
+        """Begin the section for a book (applies the previous one)"""
+        self._apply_section()
+        self.section = (book_title, display_order, [])
+
+    def add_essay(self, essay_number, essay_title, display_order=0):
+        """Add an essay entry to the current section"""
+        if self.section is not None:
+            self.section[2].append((essay_number, essay_title, display_order))
+
+    def finish(self):
+        """Apply the last section and remove sections no longer in the document"""
+        self._apply_section()
+        self.section = None
+
+        removed_ids = set()
+        for section in set(self.section_hashes) - self.seen_sections:
+            self.counts['removed'] += 1
+            removed_ids.update(essay_id for row_hash, essay_id in self.manifest_rows.get(section, {}).values())
+            self.cursor.execute("DELETE FROM import_manifest WHERE source = ? AND section = ?",
+                                (self.source, section))
+            self.cursor.execute("DELETE FROM import_manifest_rows WHERE source = ? AND section = ?",
+                                (self.source, section))
+        for essay_id in removed_ids:
+            self._delete_essay(essay_id)
+
+    def _apply_section(self):
+        if self.section is None:
+            return
+
+        book_title, book_order, entries = self.section
+
+        # A book listed more than once in the document gets numbered sections
+        section = book_title
+        repeat = 1
+        while section in self.seen_sections:
+            repeat += 1
+            section = f"{book_title}#{repeat}"
+        self.seen_sections.add(section)
+
+        section_hash = content_hash(book_title, *(f"{number}\x1e{title}" for number, title, _ in entries))
+        if self.section_hashes.get(section) == section_hash:
+            self.counts['unchanged'] += 1
+            return
+        self.counts['changed' if section in self.section_hashes else 'new'] += 1
+
+        book_id, is_new = self.loader.book_id(book_title, book_order)
+        if is_new:
+            print(f"Added new book: {book_title} (ID: {book_id})")
+
+        old_rows = self.manifest_rows.get(section, {})
+        new_rows = {}
+        for essay_number, essay_title, essay_order in entries:
+            # Key rows by essay number, numbering repeats within the section
+            row_key = essay_number
+            repeat = 1
+            while row_key in new_rows:
+                repeat += 1
+                row_key = f"{essay_number}#{repeat}"
+
+            row_hash = content_hash(essay_number, essay_title)
+            old = old_rows.get(row_key)
+            if old and old[0] == row_hash:
+                new_rows[row_key] = old
+            elif old and self.loader.update_essay_title(old[1], essay_title):
+                self.counts['updated'] += 1
+                new_rows[row_key] = (row_hash, old[1])
+            else:
+                essay_id, is_new = self.loader.essay_id(book_id, essay_title, essay_number, essay_order)
+                if is_new:
+                    self.counts['added'] += 1
+                    # For each essay, create a placeholder recording
+                    self.loader.add_recording(essay_id, f"Recording of {essay_title}", datetime.now().isoformat())
+                new_rows[row_key] = (row_hash, essay_id)
+
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO import_manifest (source, section, section_hash, date_imported) VALUES (?, ?, ?, ?)",
+            (self.source, section, section_hash, datetime.now().isoformat())
+        )
+        self.cursor.execute("DELETE FROM import_manifest_rows WHERE source = ? AND section = ?",
+                            (self.source, section))
+        self.cursor.executemany(
+            "INSERT INTO import_manifest_rows (source, section, row_key, row_hash, essay_id) VALUES (?, ?, ?, ?, ?)",
+            [(self.source, section, row_key, row_hash, essay_id)
+             for row_key, (row_hash, essay_id) in new_rows.items()]
+        )
+
+        # After the section's rows are replaced, so those still in it count
+        for essay_id in {old_rows[row_key][1] for row_key in set(old_rows) - set(new_rows)}:
+            self._delete_essay(essay_id)
+
+    def _delete_essay(self, essay_id):
+        """Delete an essay that has left the index, unless a manifest row still refers to it"""
+        self.cursor.execute("SELECT 1 FROM import_manifest_rows WHERE essay_id = ? LIMIT 1", (essay_id,))
+        if self.cursor.fetchone():
+            return
+        if self.loader.delete_essay(essay_id):
+            self.counts['deleted'] += 1
+        else:
+            self.counts['kept'] += 1
+
+    def summary(self):
+        """Diff summary of the import"""
+        c = self.counts
+        text = (f"Sections: {c['unchanged']} unchanged, {c['changed']} changed, {c['new']} new, {c['removed']} removed\n"
+                f"Essays: {c['added']} added, {c['updated']} updated, {c['deleted']} deleted")
+        if c['kept']:
+            text += f" ({c['kept']} no longer in the index kept because they have recordings)"
+        return text
@@ -2,11 +2,15 @@ import docx
 import sqlite3
 import re
 import os
-from datetime import datetime
+
+from bulk_import import BulkLoader
+from db_migrations import migrate
+from import_manifest import IncrementalImport
 
 class EohIndexImporter:
     def __init__(self, db_path='adidam_recordings.db'):
         self.db_path = db_path
+        self.current_book_title = None
         
     def import_from_docx(self, docx_path):
         """Import data from the EOH Index Word document"""
@@ -19,6 +23,9 @@ class EohIndexImporter:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # Bring the schema up to date (adds the essay sort key columns)
+            migrate(conn)
+            
             # Open the Word document
             doc = docx.Document(docx_path)
             
@@ -26,7 +33,9 @@ class EohIndexImporter:
             print(f"Total paragraphs: {len(doc.paragraphs)}")
             
             # Start a transaction
-            conn.execute('BEGIN TRANSACTION')
+            loader = BulkLoader(conn)
+            loader.begin()
+            sync = IncrementalImport(loader, docx_path, 'importer')
             
             current_book = None
             book_id = None
@@ -42,15 +51,20 @@ class EohIndexImporter:
                     print(f"Processing paragraph {i}...")
                 
                 # Parse the paragraph
-                self.process_paragraph(text, cursor)
+                self.process_paragraph(text, sync)
             
-            # Commit the transaction
-            conn.commit()
+            # Write the last section and commit the transaction
+            sync.finish()
+            loader.commit()
+            print(loader.report())
+            print(sync.summary())
             print("Import completed successfully")
             return True
             
         except Exception as e:
-            if conn:
+            if 'loader' in locals():
+                loader.rollback()
+            elif conn:
                 conn.rollback()
             print(f"Error during import: {str(e)}")
             return False
@@ -58,42 +72,28 @@ class EohIndexImporter:
             if conn:
                 conn.close()
     
-    def process_paragraph(self, text, cursor):
+    def process_paragraph(self, text, sync):
         """Process a paragraph from the document"""
         # Check if it's a book title (starts with *[ and ends with ]*)
         if text.startswith("*[") and text.endswith("]*"):
-            self.process_book_title(text, cursor)
+            self.process_book_title(text, sync)
         
         # Check if it's an essay entry (contains ** followed by numbers)
         elif "**" in text:
-            self.process_essay_entry(text, cursor)
+            self.process_essay_entry(text, sync)
     
-    def process_book_title(self, text, cursor):
+    def process_book_title(self, text, sync):
         """Process a book title paragraph"""
         # Extract book title, removing formatting markers
         book_title = text.replace("*[", "").replace("]*", "").replace("{.smallcaps}", "").strip()
         
-        # Check if this book already exists
-        cursor.execute("SELECT id FROM books WHERE title = ?", (book_title,))
-        existing_book = cursor.fetchone()
-        
-        if existing_book:
-            self.current_book_id = existing_book[0]
-            self.current_book_title = book_title
-            print(f"Found existing book: {book_title} (ID: {self.current_book_id})")
-        else:
-            # Insert new book
-            cursor.execute(
-                "INSERT INTO books (title, display_order) VALUES (?, ?)",
-                (book_title, len(book_title))  # Use title length as simple display order
-            )
-            self.current_book_id = cursor.lastrowid
-            self.current_book_title = book_title
-            print(f"Added new book: {book_title} (ID: {self.current_book_id})")
+        # Start the book's section; it is written once all its essays are read
+        self.current_book_title = book_title
+        sync.start_section(book_title, len(book_title))  # Use title length as simple display order
     
-    def process_essay_entry(self, text, cursor):
+    def process_essay_entry(self, text, sync):
         """Process an essay entry paragraph"""
-        if not hasattr(self, 'current_book_id'):
+        if not self.current_book_title:
             print("Warning: Essay entry found before book title. Skipping.")
             return
         
@@ -113,38 +113,8 @@ class EohIndexImporter:
             essay_numbers = [num.strip() for num in essay_number.split(',')]
             
             for num in essay_numbers:
-                # Check if this essay already exists
-                cursor.execute(
-                    "SELECT id FROM essays WHERE title = ? AND book_id = ? AND essay_number = ?", 
-                    (essay_title, self.current_book_id, num)
-                )
-                existing_essay = cursor.fetchone()
-                
-                if existing_essay:
-                    essay_id = existing_essay[0]
-                    print(f"  Found existing essay: {essay_title} (ID: {essay_id}, Number: {num})")
-                else:
-                    # Insert new essay
-                    cursor.execute(
-                        """
-                        INSERT INTO essays 
-                        (title, book_id, essay_number, display_order) 
-                        VALUES (?, ?, ?, ?)
-                        """,
-                        (essay_title, self.current_book_id, num, int(num) if num.isdigit() else 0)
-                    )
-                    essay_id = cursor.lastrowid
-                    print(f"  Added new essay: {essay_title} (ID: {essay_id}, Number: {num})")
-                    
-                    # For each essay, create a placeholder recording
-                    cursor.execute(
-                        """
-                        INSERT INTO recordings 
-                        (essay_id, title, date_added) 
-                        VALUES (?, ?, ?)
-                        """,
-                        (essay_id, f"Recording of {essay_title}", datetime.now().isoformat())
-                    )
+                # Queue the essay in the book's section
+                sync.add_essay(num, essay_title, int(num) if num.isdigit() else 0)
 
 def main():
     print("Adidam EOH Index Importer")
@@ -1,12 +1,14 @@
 import sqlite3
 import re
 import os
-from datetime import datetime
+
+from bulk_import import BulkLoader
+from db_migrations import migrate
+from import_manifest import IncrementalImport
 
 class EohIndexImporter:
     def __init__(self, db_path='adidam_recordings.db'):
         self.db_path = db_path
-        self.current_book_id = None
         self.current_book_title = None
         
     def import_from_docx(self, docx_path):
@@ -20,6 +22,9 @@ class EohIndexImporter:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # Bring the schema up to date (adds the essay sort key columns)
+            migrate(conn)
+            
             # Open the Word document
             doc = docx.Document(docx_path)
             
@@ -39,7 +44,9 @@ class EohIndexImporter:
             print(f"Extracted {len(full_text)} characters of text")
             
             # Begin transaction
-            conn.execute('BEGIN TRANSACTION')
+            loader = BulkLoader(conn)
+            loader.begin()
+            sync = IncrementalImport(loader, docx_path, 'improved_importer')
             
             # Process the text line by line
             lines = full_text.split('\n')
@@ -58,27 +65,32 @@ class EohIndexImporter:
                 book_match = re.search(r'\*\[([^]]+)\]\*', line)
                 if book_match:
                     book_title = book_match.group(1).strip()
-                    self.process_book_title(book_title, cursor)
+                    self.process_book_title(book_title, sync)
                     book_count += 1
                     continue
                 
                 # Look for essay entries - "**349** Acausal Adidam"
                 essay_match = re.search(r'\*\*([^*]+)\*\*\s+(.*)', line)
-                if essay_match and self.current_book_id:
+                if essay_match and self.current_book_title:
                     essay_number = essay_match.group(1).strip()
                     essay_title = essay_match.group(2).strip()
-                    self.process_essay_entry(essay_number, essay_title, cursor)
+                    self.process_essay_entry(essay_number, essay_title, sync)
                     essay_count += 1
             
-            # Commit the transaction
-            conn.commit()
+            # Write the last section and commit the transaction
+            sync.finish()
+            loader.commit()
+            print(loader.report())
+            print(sync.summary())
             
             print(f"Processed {line_count} lines")
             print(f"Imported {book_count} books and {essay_count} essays")
             return True
             
         except Exception as e:
-            if 'conn' in locals():
+            if 'loader' in locals():
+                loader.rollback()
+            elif 'conn' in locals():
                 conn.rollback()
             print(f"Error during import: {str(e)}")
             return False
@@ -86,30 +98,16 @@ class EohIndexImporter:
             if 'conn' in locals():
                 conn.close()
     
-    def process_book_title(self, book_title, cursor):
+    def process_book_title(self, book_title, sync):
         """Process a book title"""
         # Clean up any remaining formatting
         book_title = book_title.replace("{.smallcaps}", "").strip()
         
-        # Check if this book already exists
-        cursor.execute("SELECT id FROM books WHERE title = ?", (book_title,))
-        existing_book = cursor.fetchone()
-        
-        if existing_book:
-            self.current_book_id = existing_book[0]
-            self.current_book_title = book_title
-            print(f"Found existing book: {book_title} (ID: {self.current_book_id})")
-        else:
-            # Insert new book
-            cursor.execute(
-                "INSERT INTO books (title, display_order) VALUES (?, ?)",
-                (book_title, 0)  # We'll update display order later
-            )
-            self.current_book_id = cursor.lastrowid
-            self.current_book_title = book_title
-            print(f"Added new book: {book_title} (ID: {self.current_book_id})")
+        # Start the book's section; it is written once all its essays are read
+        self.current_book_title = book_title
+        sync.start_section(book_title, 0)  # We'll update display order later
     
-    def process_essay_entry(self, essay_number, essay_title, cursor):
+    def process_essay_entry(self, essay_number, essay_title, sync):
         """Process an essay entry"""
         # Clean up title (remove formatting)
         essay_title = re.sub(r'\[([^\]]+)\]\.[\w]+', r'\1', essay_title)
@@ -121,38 +119,8 @@ class EohIndexImporter:
         essay_numbers = [num.strip() for num in essay_number.split(',')]
         
         for num in essay_numbers:
-            # Check if this essay already exists
-            cursor.execute(
-                "SELECT id FROM essays WHERE title = ? AND book_id = ? AND essay_number = ?", 
-                (essay_title, self.current_book_id, num)
-            )
-            existing_essay = cursor.fetchone()
-            
-            if existing_essay:
-                essay_id = existing_essay[0]
-                print(f"  Found existing essay: {essay_title} (ID: {essay_id}, Number: {num})")
-            else:
-                # Insert new essay
-                cursor.execute(
-                    """
-                    INSERT INTO essays 
-                    (title, book_id, essay_number, display_order) 
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (essay_title, self.current_book_id, num, 0)
-                )
-                essay_id = cursor.lastrowid
-                print(f"  Added new essay: {essay_title} (ID: {essay_id}, Number: {num})")
-                
-                # For each essay, create a placeholder recording
-                cursor.execute(
-                    """
-                    INSERT INTO recordings 
-                    (essay_id, title, date_added) 
-                    VALUES (?, ?, ?)
-                    """,
-                    (essay_id, f"Recording of {essay_title}", datetime.now().isoformat())
-                )
+            # Queue the essay in the book's section
+            sync.add_essay(num, essay_title, 0)
 
 def main():
     print("Adidam EOH Index Importer")
@@ -1,4 +1,11 @@
-from docx import Document
+import sys
+
+from ooxml_reader import iter_table_rows
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None  # inspect_document_fast() doesn't need python-docx
 
 def inspect_document(docx_path):
     print(f"Examining document: {docx_path}")
@@ -24,5 +31,32 @@ def inspect_document(docx_path):
                 row_text.append(cell_text)
             print(f"Row {i+1}: {row_text}")
 
+def inspect_document_fast(docx_path):
+    """Same report as inspect_document() using the direct OOXML reader"""
+    print(f"Examining document: {docx_path}")
+    
+    rows = 0
+    cols = 0
+    print("\nSample rows:")
+    for cells in iter_table_rows(docx_path):
+        if rows == 0:
+            cols = len(cells)
+        
+        # Show first few rows as sample
+        if rows < 5:
+            row_text = []
+            for cell_text in cells:
+                cell_text = cell_text.strip()
+                if len(cell_text) > 30:
+                    cell_text = cell_text[:30] + "..."
+                row_text.append(cell_text)
+            print(f"Row {rows+1}: {row_text}")
+        rows += 1
+    
+    print(f"First table has {rows} rows and {cols} columns")
+
 if __name__ == "__main__":
-    inspect_document("EOH Index.docx")
\ No newline at end of file
+    if "--fast" in sys.argv or Document is None:
+        inspect_document_fast("EOH Index.docx")
+    else:
+        inspect_document("EOH Index.docx")
\ No newline at end of file
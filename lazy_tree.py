@@ -0,0 +1,91 @@
+# Top-level rows inserted per page as the user scrolls towards the end
+PAGE_SIZE = 200
+
+# Scroll position (fraction of the list) at which the next page is appended
+PREFETCH_AT = 0.9
+
+class LazyTreeLoader:
+    """Creates ttk.Treeview items only when they are about to be seen
+
+    Top-level rows are appended a page at a time as the view scrolls near the
+    end of what has been inserted. Each row gets a single dummy child so Tk
+    shows an expand arrow; its real children are created by load_children(key)
+    the first time the row is opened.
+    """
+
+    def __init__(self, tree, scrollbar, load_children, page_size=PAGE_SIZE):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.load_children = load_children
+        self.page_size = page_size
+
+        self.rows = []
+        self.next_row = 0
+        self.unloaded = {}  # item id -> key of rows whose children aren't created yet
+        self.view_end = 1.0  # last visible fraction reported by the tree
+
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self.tree.bind("<<TreeviewOpen>>", self.on_open, add="+")
+
+    def set_rows(self, rows):
+        """Replace the tree contents with rows of (key, values)"""
+        self.clear()
+        self.add_rows(rows)
+
+    def add_rows(self, rows):
+        """Append rows of (key, values), e.g. as a background query delivers them"""
+        self.rows.extend(rows)
+        # Fill the first page, or keep going if the view is already at the end
+        if self.next_row < self.page_size or self.view_end >= PREFETCH_AT:
+            self.insert_page()
+
+    def clear(self):
+        """Remove every item and forget any pending rows"""
+        self.tree.delete(*self.tree.get_children())
+        self.rows = []
+        self.next_row = 0
+        self.unloaded.clear()
+        self.view_end = 1.0
+
+    def has_more(self):
+        """True while some top-level rows have not been inserted yet"""
+        return self.next_row < len(self.rows)
+
+    def insert_page(self):
+        """Insert the next page of top-level rows"""
+        end = min(self.next_row + self.page_size, len(self.rows))
+        for key, values in self.rows[self.next_row:end]:
+            item = self.tree.insert("", "end", text="", values=values, open=False)
+            # Dummy child so the row can be expanded
+            self.tree.insert(item, "end", text="", values=(), tags=())
+            self.unloaded[item] = key
+        self.next_row = end
+
+    def on_scroll(self, first, last):
+        """yscrollcommand: update the scrollbar and top up rows near the end"""
+        self.scrollbar.set(first, last)
+        self.view_end = float(last)
+        if self.has_more() and float(last) >= PREFETCH_AT:
+            self.insert_page()
+
+    def on_open(self, event):
+        """Create the children of the row being opened"""
+        self.expand(self.tree.focus())
+
+    def expand(self, item):
+        """Replace the dummy child of item with its real children"""
+        key = self.unloaded.pop(item, None)
+        if key is None:
+            return
+
+        self.tree.delete(*self.tree.get_children(item))
+        for values, tags in self.load_children(key):
+            self.tree.insert(item, "end", text="", values=values, tags=tags)
+
+    def toggle(self, item):
+        """Open or close item, loading its children first if needed"""
+        if self.tree.item(item, 'open'):
+            self.tree.item(item, open=False)
+        else:
+            self.expand(item)
+            self.tree.item(item, open=True)
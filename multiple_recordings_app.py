@@ -2,13 +2,38 @@ import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import subprocess  # For cross-platform file opening
 import sys
 
+from db_access import AdidamDatabase
+from essay_queries import RECORDINGS_FOR_ESSAY_SQL, fetch_essays_with_recordings
+from lazy_tree import LazyTreeLoader
+from audio_metadata import format_duration
+from playback_engine import PLAYING, AudioPlayer, default_sink, open_with_system_player
+from query_worker import QueryWorker
+from search_cache import SearchCache, cached_search
+
+# Pause in typing before the search tab searches on its own
+SEARCH_DEBOUNCE_MS = 250
+
+# How often the player bar shows the position
+PLAYER_UPDATE_MS = 250
+
 class AdidamSearchApp:
     def __init__(self, root, db_path='adidam_recordings.db'):
         self.root = root
         self.db_path = db_path
+        self.db = AdidamDatabase(db_path, read_only=True)
+        
+        # Slow queries run here so the window stays responsive
+        self.worker = QueryWorker(root, self.db)
+        # Embedded player, created on the first play
+        self.player = None
+        self.player_job = None
+        self.dragging_position = False
+        # Why the last file went to the system's player, shown once
+        self.fallback_notice = None
+        self.search_cache = SearchCache()
+        self.pending_search = None
         
         # Check if database exists
         if not os.path.exists(db_path):
@@ -29,6 +54,9 @@ class AdidamSearchApp:
         main_frame = ttk.Frame(self.root, padding=10)
         main_frame.pack(fill="both", expand=True)
         
+        # Player controls along the bottom
+        self.setup_player_bar(main_frame)
+        
         # Create notebook for tabs
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill="both", expand=True)
@@ -46,6 +74,26 @@ class AdidamSearchApp:
         # Setup Search tab
         self.setup_search_tab()
     
+    def setup_player_bar(self, parent):
+        """Pause/stop buttons, position slider and time for the embedded player"""
+        bar = ttk.Frame(parent, padding=(0, 5, 0, 0))
+        bar.pack(side="bottom", fill="x")
+        
+        self.pause_button = ttk.Button(bar, text="Pause", width=8, command=self.toggle_pause, state="disabled")
+        self.pause_button.pack(side="left", padx=5)
+        self.stop_button = ttk.Button(bar, text="Stop", width=8, command=self.stop_playback, state="disabled")
+        self.stop_button.pack(side="left", padx=5)
+        
+        # Seek when the slider is let go, not on every step of a drag
+        self.position_var = tk.DoubleVar()
+        self.position_scale = ttk.Scale(bar, variable=self.position_var, from_=0, to=1, orient="horizontal")
+        self.position_scale.pack(side="left", fill="x", expand=True, padx=5)
+        self.position_scale.bind("<ButtonPress-1>", self.on_position_press)
+        self.position_scale.bind("<ButtonRelease-1>", self.on_position_release)
+        
+        self.time_var = tk.StringVar()
+        ttk.Label(bar, textvariable=self.time_var, width=18, anchor="e").pack(side="left", padx=5)
+    
     def setup_books_tab(self):
         # Left frame for books list
         left_frame = ttk.Frame(self.books_tab)
@@ -88,7 +136,10 @@ class AdidamSearchApp:
         
         # Add a scrollbar
         scrollbar = ttk.Scrollbar(right_frame, orient="vertical", command=self.essays_tree.yview)
-        self.essays_tree.configure(yscrollcommand=scrollbar.set)
+        
+        # Essay rows are added as they scroll into view, recordings on expand
+        self.essays_loader = LazyTreeLoader(self.essays_tree, scrollbar, self.load_essay_recordings)
+        self.essay_recordings = {}
         
         # Pack the tree and scrollbar
         self.essays_tree.pack(side="left", fill="both", expand=True)
@@ -109,6 +160,9 @@ class AdidamSearchApp:
         search_entry.pack(side="left", padx=5)
         search_entry.bind("<Return>", lambda e: self.perform_search())
         
+        # Search as the user types
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        
         # Search button
         search_button = ttk.Button(search_frame, text="Search", command=self.perform_search)
         search_button.pack(side="left", padx=5)
@@ -119,8 +173,10 @@ class AdidamSearchApp:
         self.search_titles_var = tk.BooleanVar(value=True)
         self.search_numbers_var = tk.BooleanVar(value=True)
         
-        ttk.Checkbutton(search_frame, text="Titles", variable=self.search_titles_var).pack(side="left")
-        ttk.Checkbutton(search_frame, text="Numbers", variable=self.search_numbers_var).pack(side="left")
+        ttk.Checkbutton(search_frame, text="Titles", variable=self.search_titles_var,
+                        command=self.schedule_search).pack(side="left")
+        ttk.Checkbutton(search_frame, text="Numbers", variable=self.search_numbers_var,
+                        command=self.schedule_search).pack(side="left")
         
         # Results frame
         results_frame = ttk.Frame(self.search_tab)
@@ -145,7 +201,9 @@ class AdidamSearchApp:
         
         # Add a scrollbar
         scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.results_tree.yview)
-        self.results_tree.configure(yscrollcommand=scrollbar.set)
+        
+        # Result rows are added as they scroll into view, recordings on expand
+        self.results_loader = LazyTreeLoader(self.results_tree, scrollbar, self.load_result_recordings)
         
         # Pack the tree and scrollbar
         self.results_tree.pack(side="left", fill="both", expand=True)
@@ -157,8 +215,7 @@ class AdidamSearchApp:
     def load_books(self):
         """Load all books into the books listbox"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.cursor()
             
             cursor.execute("SELECT id, title FROM books ORDER BY display_order, title")
             books = cursor.fetchall()
@@ -169,8 +226,6 @@ class AdidamSearchApp:
             for book_id, title in books:
                 self.books_listbox.insert(tk.END, title)
                 self.books_data[title] = book_id
-                
-            conn.close()
             
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to load books: {str(e)}")
@@ -194,80 +249,46 @@ class AdidamSearchApp:
     
     def load_essays(self, book_id):
         """Load essays for the selected book with multiple recordings"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Clear existing items
-            for item in self.essays_tree.get_children():
-                self.essays_tree.delete(item)
-            
-            # Get essays for this book
-            cursor.execute("""
-                SELECT e.id, e.essay_number, e.title
-                FROM essays e
-                WHERE e.book_id = ?
-                ORDER BY 
-                    CASE 
-                        WHEN e.essay_number GLOB '[0-9]*' THEN CAST(e.essay_number AS INTEGER)
-                        ELSE 999999
-                    END,
-                    e.display_order, 
-                    e.title
-            """, (book_id,))
-            
-            essays = cursor.fetchall()
-            
-            # Add each essay as a parent node
-            for essay_id, essay_number, title in essays:
-                # Clean up title
-                clean_title = ' '.join(title.strip().replace('\n', ' ').split())
-                
-                # Create essay parent item
-                essay_item = self.essays_tree.insert("", "end", 
-                                                   text="",
-                                                   values=(essay_number, clean_title, ""),
-                                                   open=False)  # Collapsed by default
-                
-                # Get recordings for this essay
-                cursor.execute("""
-                    SELECT r.id, r.title, r.reciter, r.recorded_date, r.duration 
-                    FROM recordings r
-                    WHERE r.essay_id = ?
-                    ORDER BY r.reciter, r.recorded_date
-                """, (essay_id,))
-                
-                recordings = cursor.fetchall()
-                
-                # Add recordings as child items
-                for rec_id, rec_title, reciter, rec_date, duration in recordings:
-                    if not duration:
-                        duration = "--:--"
-                    
-                    rec_display_title = rec_title or clean_title
-                    rec_date_str = rec_date if rec_date else ""
-                    
-                    # Display recording info
-                    recording_text = f"{reciter or 'Unknown'}"
-                    if rec_date_str:
-                        recording_text += f" ({rec_date_str})"
-                    
-                    self.essays_tree.insert(essay_item, "end", 
-                                          text="",
-                                          values=("", recording_text, duration),
-                                          tags=(str(rec_id),))
-                
-                # If no recordings exist, add a placeholder
-                if not recordings:
-                    self.essays_tree.insert(essay_item, "end", 
-                                          text="",
-                                          values=("", "No recordings available", ""),
-                                          tags=())
+        # Clear the tree now; rows are added as the background query delivers them
+        self.essays_loader.clear()
+        self.essay_recordings = {}
+        
+        # Get essays for this book together with their recordings
+        self.worker.submit("essays",
+                           lambda cursor: fetch_essays_with_recordings(cursor, book_id),
+                           self.show_essays,
+                           on_error=lambda e: messagebox.showerror("Database Error", f"Failed to load essays: {str(e)}"))
+    
+    def show_essays(self, essays):
+        """Add a chunk of essays delivered by load_essays to the books tab"""
+        # Keep the recordings in memory; their tree items are only
+        # created when an essay is expanded
+        rows = []
+        for essay_id, essay_number, title, recordings in essays:
+            # Clean up title
+            clean_title = ' '.join(title.strip().replace('\n', ' ').split())
             
-            conn.close()
+            self.essay_recordings[essay_id] = recordings
+            rows.append((essay_id, (essay_number, clean_title, "")))
+        
+        self.essays_loader.add_rows(rows)
+    
+    def load_essay_recordings(self, essay_id):
+        """Child rows (values, tags) for an essay being expanded in the books tab"""
+        children = []
+        for rec_id, rec_title, reciter, rec_date, duration in self.essay_recordings.get(essay_id, []):
+            # Display recording info
+            recording_text = f"{reciter or 'Unknown'}"
+            if rec_date:
+                recording_text += f" ({rec_date})"
             
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Failed to load essays: {str(e)}")
+            children.append((("", recording_text, duration or "--:--"), (str(rec_id),)))
+        
+        # If no recordings exist, add a placeholder
+        if not children:
+            children.append((("", "No recordings available", ""), ()))
+        
+        return children
     
     def on_essay_double_click(self, event):
         """Handle double-click on essays tree item"""
@@ -287,10 +308,7 @@ class AdidamSearchApp:
             self.play_recording(recording_id)
         else:
             # It's an essay or placeholder, toggle expand/collapse
-            if self.essays_tree.item(item_id, 'open'):
-                self.essays_tree.item(item_id, open=False)
-            else:
-                self.essays_tree.item(item_id, open=True)
+            self.essays_loader.toggle(item_id)
     
     def on_result_double_click(self, event):
         """Handle double-click on search results item"""
@@ -310,16 +328,12 @@ class AdidamSearchApp:
             self.play_recording(recording_id)
         else:
             # It's an essay or placeholder, toggle expand/collapse
-            if self.results_tree.item(item_id, 'open'):
-                self.results_tree.item(item_id, open=False)
-            else:
-                self.results_tree.item(item_id, open=True)
+            self.results_loader.toggle(item_id)
     
     def play_recording(self, recording_id):
         """Play a recording"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.cursor()
             
             # Get recording details
             cursor.execute("""
@@ -346,116 +360,195 @@ class AdidamSearchApp:
                 messagebox.showerror("Play Error", f"File not found: {file_path}")
                 return
                 
-            # Use system default player to play the audio file in a cross-platform way
-            if os.name == 'nt':  # Windows
-                os.startfile(file_path)
-            elif os.name == 'posix':  # macOS and Linux
-                if os.path.exists('/usr/bin/open'):  # macOS
-                    subprocess.call(('open', file_path))
-                else:  # Linux
-                    subprocess.call(('xdg-open', file_path))
+            # Play it here, or with the system's player if there is no audio
+            # output or the file can't be decoded
+            if not self.play_in_app(file_path):
+                open_with_system_player(file_path)
             
             # Update window title with what's playing
             self.root.title(f"Playing: {book_title} - {essay_number} - {essay_title} - {reciter}")
             
-            conn.close()
-            
         except Exception as e:
             messagebox.showerror("Play Error", f"Failed to play recording: {str(e)}")
     
-    def perform_search(self):
-        """Perform search based on criteria with support for multiple recordings"""
+    def play_in_app(self, file_path):
+        """Play a file with the embedded player (see playback_engine.py); returns False if it can't"""
+        if self.player is None:
+            sink = default_sink()
+            if sink is None:
+                self.notify_fallback("There is no audio output for the built-in player "
+                                     "(pygame isn't installed or no sound device was found).")
+                return False
+            self.player = AudioPlayer(sink)
+        try:
+            self.player.open(file_path)
+        except Exception as e:
+            # Undecodable here; don't keep playing the previous file alongside
+            self.player.stop()
+            self.notify_fallback(f"The built-in player can't play this file: {e}")
+            return False
+        self.player.play()
+        
+        self.pause_button.config(state="normal")
+        self.stop_button.config(state="normal")
+        if self.player_job is None:
+            self.update_player_bar()
+        return True
+    
+    def notify_fallback(self, reason):
+        """Say why recordings open in the system's player (once per reason)"""
+        if reason == self.fallback_notice:
+            return
+        self.fallback_notice = reason
+        messagebox.showinfo("Playing in the System Player",
+                            f"{reason}\n\nOpening it in the system's player instead.")
+    
+    def toggle_pause(self):
+        if self.player is None:
+            return
+        if self.player.state == PLAYING:
+            self.player.pause()
+        else:
+            self.player.play()
+        self.update_player_bar()
+    
+    def stop_playback(self):
+        if self.player is not None:
+            self.player.stop()
+            self.update_player_bar()
+    
+    def on_position_press(self, event):
+        self.dragging_position = True
+    
+    def on_position_release(self, event):
+        self.dragging_position = False
+        if self.player is not None and self.player.duration:
+            self.player.seek(self.position_var.get() * self.player.duration)
+    
+    def update_player_bar(self):
+        """Show the player's state and position, every PLAYER_UPDATE_MS from the first play on"""
+        if self.player_job is not None:
+            self.root.after_cancel(self.player_job)
+        player = self.player
+        duration = player.duration
+        self.pause_button.config(text="Pause" if player.state == PLAYING else "Play")
+        if not self.dragging_position:
+            self.position_var.set(player.position / duration if duration else 0)
+        total = format_duration(duration) if duration else "--:--"
+        self.time_var.set(f"{format_duration(player.position)} / {total}")
+        self.player_job = self.root.after(PLAYER_UPDATE_MS, self.update_player_bar)
+    
+    def schedule_search(self):
+        """Run a live search once typing pauses for SEARCH_DEBOUNCE_MS"""
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+        self.pending_search = self.root.after(SEARCH_DEBOUNCE_MS, lambda: self.perform_search(live=True))
+    
+    def perform_search(self, live=False):
+        """Perform search based on criteria with support for multiple recordings
+        
+        Live searches (while typing) don't pop up messages for empty input or
+        empty results.
+        """
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+            self.pending_search = None
+        
         search_text = self.search_var.get().strip()
         if not search_text:
-            messagebox.showinfo("Search", "Please enter search text")
+            if live:
+                self.worker.cancel("search")
+                self.results_loader.clear()
+                self.root.title("Adidam Audio Database")
+            else:
+                messagebox.showinfo("Search", "Please enter search text")
             return
         
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # This helps with column names
-            cursor = conn.cursor()
-            
-            # Clear existing results
-            for item in self.results_tree.get_children():
-                self.results_tree.delete(item)
-                
-            # Reset title
-            self.root.title("Adidam Audio Database")
-            
-            # Get essays matching the search criteria
-            query = """
-                SELECT 
-                    b.title as book_title, 
-                    e.id as essay_id,
-                    e.essay_number, 
-                    e.title as essay_title
-                FROM essays e
-                JOIN books b ON e.book_id = b.id
-                WHERE 
-            """
-            
-            conditions = []
-            params = []
+        # Reset title and clear existing results
+        self.root.title("Adidam Audio Database - Searching...")
+        self.results_loader.clear()
+        
+        # Get essays matching the search criteria, best matches first. A new
+        # search cancels one that is still running.
+        search_titles = self.search_titles_var.get()
+        search_numbers = self.search_numbers_var.get()
+        self.worker.submit("search",
+                           lambda cursor: cached_search(self.search_cache, cursor, search_text,
+                                                        search_titles, search_numbers),
+                           self.show_search_results,
+                           on_done=lambda count: self.search_finished(search_text, count, live),
+                           on_error=lambda e: messagebox.showerror("Search Error", f"Error during search: {str(e)}"),
+                           row_factory=sqlite3.Row)  # This helps with column names
+    
+    def show_search_results(self, essays):
+        """Add a chunk of search results to the results tree"""
+        # Display results as a tree; recordings are fetched on expand
+        rows = []
+        for essay in essays:
+            book_title = essay['book_title']
             
-            # Add title search if enabled
-            if self.search_titles_var.get():
-                conditions.append("LOWER(e.title) LIKE LOWER(?)")
-                params.append(f"%{search_text}%")
-                
-            # Add number search if enabled
-            if self.search_numbers_var.get():
-                conditions.append("e.essay_number LIKE ?")
-                params.append(f"%{search_text}%")
+            # Clean up title
+            clean_title = ' '.join(essay['essay_title'].strip().replace('\n', ' ').split())
             
-            if not conditions:
-                conditions.append("1 = 0")  # No conditions means no results
-                
-            query += "(" + " OR ".join(conditions) + ")"
-            query += " ORDER BY b.title, CAST(CASE WHEN e.essay_number GLOB '*[0-9]*' THEN e.essay_number ELSE '999999' END AS INTEGER)"
-            
-            cursor.execute(query, params)
-            essays = cursor.fetchall()
+            rows.append(((essay['essay_id'], book_title),
+                         (book_title, essay['essay_number'], clean_title, "")))
+        
+        self.results_loader.add_rows(rows)
+    
+    def search_finished(self, search_text, count, live=False):
+        """Called once every result of a search has been delivered"""
+        # Show count in title
+        self.root.title(f"Adidam Audio Database - {count} results for '{search_text}'")
+        
+        # Show message if no results
+        if count == 0 and not live:
+            messagebox.showinfo("Search Results", "No results found for your search")
+    
+    def load_result_recordings(self, key):
+        """Child rows (values, tags) for a search result being expanded"""
+        essay_id, book_title = key
+        children = []
+        
+        try:
+            cursor = self.db.cursor(sqlite3.Row)
+            cursor.execute(RECORDINGS_FOR_ESSAY_SQL, (essay_id,))
             
-            # Display results as a tree
-            for essay in essays:
-                book_title = essay['book_title']
-                essay_id = essay['essay_id']
-                essay_number = essay['essay_number']
-                essay_title = essay['essay_title']
-                
-                # Clean up title
-                clean_title = ' '.join(essay_title.strip().replace('\n', ' ').split())
-                
-                # Add essay as parent node
-                essay_item = self.results_tree.insert("", "end", 
-                                                    text="",
-                                                    values=(book_title, essay_number, clean_title, ""),
-                                                    open=False)
-                
-                # Get recordings for this essay
-                cursor.execute("""
-                    SELECT r.id, r.title, r.reciter, r.recorded_date, r.duration 
-                    FROM recordings r
-                    WHERE r.essay_id = ?
-                    ORDER BY r.reciter, r.recorded_date
-                """, (essay_id,))
+            for rec in cursor.fetchall():
+                rec_info = rec['reciter'] or "Unknown"
+                if rec['recorded_date']:
+                    rec_info += f" ({rec['recorded_date']})"
                 
-                recordings = cursor.fetchall()
+                children.append(((book_title, "", rec_info, rec['duration'] or "--:--"), (str(rec['id']),)))
                 
-                # Add recordings as child items
-                for rec in recordings:
-                    rec_id = rec['id']
-                    reciter = rec['reciter'] or "Unknown"
-                    duration = rec['duration'] or "--:--"
-                    rec_date = rec['recorded_date']
-                    
-                    rec_info = reciter
-                    if rec_date:
-                        rec_info += f" ({rec_date})"
-                    
-                    self.results_tree.insert(essay_item, "end", 
-                                           text="",
-                                           values=(book_title, "", rec_info, duration),
-                                           tags=(str(rec_id),))
-                
-                # If no recordings exist, add a placeholder
\ No newline at end of file
+        except Exception as e:
+            messagebox.showerror("Database Error", f"Failed to load recordings: {str(e)}")
+        
+        # If no recordings exist, add a placeholder
+        if not children:
+            children.append(((book_title, "", "No recordings available", ""), ()))
+        
+        return children
+
+# Main execution block
+if __name__ == "__main__":
+    root = tk.Tk()
+    
+    # Set app icon if available
+    try:
+        if os.path.exists("adidam_icon.ico"):
+            root.iconbitmap("adidam_icon.ico")
+    except:
+        pass  # Ignore if icon setting fails
+        
+    # Create main application
+    app = AdidamSearchApp(root)
+    
+    # Configure window minimum size
+    root.minsize(800, 600)
+    
+    # Start the main loop
+    root.mainloop()
+    if app.player is not None:
+        app.player.close()
+    app.worker.close()
+    app.db.close()
\ No newline at end of file
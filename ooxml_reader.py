@@ -0,0 +1,179 @@
+import zipfile
+from collections import namedtuple
+from xml.etree.ElementTree import iterparse
+
+# Reads word/document.xml straight out of a .docx with iterparse, without
+# python-docx. Only what the EOH importers need is understood: body
+# paragraphs, table rows/cells and direct run formatting (styles are ignored).
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+BODY = W_NS + 'body'
+PARAGRAPH = W_NS + 'p'
+TABLE = W_NS + 'tbl'
+ROW = W_NS + 'tr'
+CELL = W_NS + 'tc'
+RUN = W_NS + 'r'
+RUN_PROPS = W_NS + 'rPr'
+CELL_PROPS = W_NS + 'tcPr'
+GRID_SPAN = W_NS + 'gridSpan'
+VAL = W_NS + 'val'
+
+# Paragraph children whose runs count as paragraph text
+RUN_CONTAINERS = {W_NS + 'hyperlink', W_NS + 'ins', W_NS + 'smartTag', W_NS + 'fldSimple'}
+
+# Run content -> text (w:t is handled separately)
+RUN_CONTENT = {W_NS + 'tab': '\t', W_NS + 'br': '\n', W_NS + 'cr': '\n', W_NS + 'noBreakHyphen': '-'}
+
+OFF_VALUES = {'0', 'false', 'off', 'none'}
+
+Run = namedtuple('Run', 'text bold italic underline smallcaps')
+
+def _is_on(props, tag):
+    """True if a toggle property (w:b, w:u, ...) is set in a run's w:rPr"""
+    if props is None:
+        return False
+    element = props.find(W_NS + tag)
+    return element is not None and element.get(VAL, 'on').lower() not in OFF_VALUES
+
+def _run(element):
+    """Build a Run from a w:r element"""
+    parts = []
+    for child in element:
+        if child.tag == W_NS + 't':
+            parts.append(child.text or '')
+        elif child.tag in RUN_CONTENT:
+            parts.append(RUN_CONTENT[child.tag])
+
+    props = element.find(RUN_PROPS)
+    return Run(''.join(parts),
+               _is_on(props, 'b'),
+               _is_on(props, 'i'),
+               _is_on(props, 'u'),
+               _is_on(props, 'smallCaps'))
+
+def _paragraph(element):
+    """Runs of a w:p element, including those inside hyperlinks and tracked insertions"""
+    runs = []
+    for child in element:
+        if child.tag == RUN:
+            runs.append(_run(child))
+        elif child.tag in RUN_CONTAINERS:
+            runs.extend(_run(run) for run in child.iter(RUN))
+    return runs
+
+def _cells(row):
+    """Cells of a w:tr as lists of paragraphs, repeated across the grid columns they span
+
+    That matches python-docx's row.cells for horizontally merged cells.
+    """
+    cells = []
+    for cell in row.findall(CELL):
+        paragraphs = [_paragraph(p) for p in cell.findall(PARAGRAPH)]
+        span = 1
+        props = cell.find(CELL_PROPS)
+        if props is not None:
+            grid_span = props.find(GRID_SPAN)
+            if grid_span is not None:
+                span = int(grid_span.get(VAL, '1'))
+        cells.extend([paragraphs] * span)
+    return cells
+
+def iter_docx_blocks(docx_path):
+    """Yield ('paragraph', runs), ('table', None) and ('row', cells) in document order
+
+    runs is a list of Run; cells is a list of cells, each a list of
+    paragraphs (lists of Run). ('table', None) comes before each table's
+    rows. Only body-level paragraphs and rows of body-level tables are
+    reported; processed elements are removed from the tree as soon as they
+    have been read, so memory stays flat.
+    """
+    with zipfile.ZipFile(docx_path) as archive:
+        with archive.open('word/document.xml') as xml_file:
+            stack = []
+            for event, element in iterparse(xml_file, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == TABLE and stack and stack[-1].tag == BODY:
+                        yield 'table', None
+                    stack.append(element)
+                    continue
+
+                stack.pop()
+                parent = stack[-1] if stack else None
+                grandparent = stack[-2] if len(stack) > 1 else None
+
+                if parent is not None and parent.tag == BODY:
+                    if element.tag == PARAGRAPH:
+                        yield 'paragraph', _paragraph(element)
+                    # Tables were reported row by row; drop whatever is done
+                    parent.remove(element)
+                elif (element.tag == ROW and parent.tag == TABLE
+                      and grandparent is not None and grandparent.tag == BODY):
+                    yield 'row', _cells(element)
+                    parent.remove(element)
+
+def runs_text(runs):
+    """Plain text of a paragraph (like python-docx's paragraph.text)"""
+    return ''.join(run.text for run in runs)
+
+def cell_text(paragraphs):
+    """Plain text of a table cell (like python-docx's cell.text)"""
+    return '\n'.join(runs_text(runs) for runs in paragraphs)
+
+def marked_text(runs):
+    """Paragraph text with formatting written as the markers the importers look for
+
+    Bold becomes **text**, italic *text*, small caps [text]{.smallcaps} and
+    underline [text]{.underline}, as in a Markdown export of the index.
+    """
+    parts = []
+    # Merge neighbouring runs with the same formatting first
+    merged = []
+    for run in runs:
+        if merged and merged[-1][1:] == run[1:]:
+            merged[-1] = merged[-1]._replace(text=merged[-1].text + run.text)
+        else:
+            merged.append(run)
+
+    for run in merged:
+        text = run.text
+        if not text.strip():
+            parts.append(text)
+            continue
+        if run.smallcaps:
+            text = f"[{text}]{{.smallcaps}}"
+        if run.underline:
+            text = f"[{text}]{{.underline}}"
+        if run.italic:
+            text = f"*{text}*"
+        if run.bold:
+            text = f"**{text}**"
+        parts.append(text)
+    return ''.join(parts)
+
+def iter_document_lines(docx_path):
+    """Yield ('paragraph', line) and ('cell', line) events in document order
+
+    Paragraphs and the cells of body-level tables come out interleaved as
+    they appear in the document; text with line breaks is split into one
+    event per line.
+    """
+    for kind, value in iter_docx_blocks(docx_path):
+        if kind == 'paragraph':
+            for line in runs_text(value).split('\n'):
+                yield 'paragraph', line
+        elif kind == 'row':
+            for paragraphs in value:
+                for line in cell_text(paragraphs).split('\n'):
+                    yield 'cell', line
+
+def iter_table_rows(docx_path, table_index=0):
+    """Yield the cell texts of each row of one body-level table"""
+    table = -1
+    for kind, value in iter_docx_blocks(docx_path):
+        if kind == 'table':
+            table += 1
+            if table > table_index:
+                return
+        elif kind == 'row' and table == table_index:
+            yield [cell_text(paragraphs) for paragraphs in value]
@@ -0,0 +1,161 @@
+from html.parser import HTMLParser
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Extracts the .recording-item entries of an Ear of the Heart listing page.
+# Uses lxml when it is installed; otherwise a streaming html.parser pass
+# that ignores everything outside the recording items. Either way each
+# item's fields are collected in one walk over the item.
+
+ITEM_CLASS = 'recording-item'
+
+# Field classes inside an item -> key in the parsed item. The first element
+# with the class wins, except for tags, which are all collected.
+FIELD_CLASSES = {
+    'recording-title': 'title',
+    'recording-description': 'description',
+    'recording-date': 'date',
+    'recording-duration': 'duration',
+    'recording-file-link': 'file',
+    'recording-tag': 'tags',
+    'recording-speaker': 'speaker',
+}
+
+# Elements that never have an end tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'param', 'source', 'track', 'wbr'}
+
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'html.parser'
+
+def empty_item():
+    """A parsed item: stripped texts (None if missing), the file link's href and the tag texts"""
+    return {'title': None, 'description': None, 'date': None, 'duration': None,
+            'file': None, 'href': None, 'tags': [], 'speaker': None}
+
+class RecordingItemParser(HTMLParser):
+    """Streaming parser keeping only the text of the fields inside .recording-item elements"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self.item = None
+        self.stack = []  # open tags inside the current item, the item itself first
+        self.captures = []  # (stack depth, field, text parts) being collected
+
+    def handle_starttag(self, tag, attrs):
+        classes = None
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes = value.split()
+                break
+
+        if self.item is None:
+            if classes and ITEM_CLASS in classes and tag not in VOID_ELEMENTS:
+                self.item = empty_item()
+                self.stack = [tag]
+            return
+
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+        if not classes:
+            return
+
+        for cls in classes:
+            field = FIELD_CLASSES.get(cls)
+            if field is None:
+                continue
+            if field != 'tags' and (self.item[field] is not None
+                                    or any(capture[1] == field for capture in self.captures)):
+                continue
+            if field == 'file':
+                self.item['href'] = dict(attrs).get('href')
+            parts = []
+            if tag in VOID_ELEMENTS:
+                self._finish_capture(field, parts)
+            else:
+                self.captures.append((len(self.stack), field, parts))
+
+    def handle_startendtag(self, tag, attrs):
+        # <x/>: nothing inside it, so it closes straight away
+        self.handle_starttag(tag, attrs)
+        if self.item is not None and tag not in VOID_ELEMENTS and self.stack and self.stack[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.item is None or tag not in self.stack:
+            return  # outside an item, or a stray end tag
+
+        # Close everything up to the matching start tag (implied end tags)
+        while self.stack:
+            depth = len(self.stack)
+            while self.captures and self.captures[-1][0] == depth:
+                depth, field, parts = self.captures.pop()
+                self._finish_capture(field, parts)
+            if self.stack.pop() == tag:
+                break
+
+        if not self.stack:
+            self.items.append(self.item)
+            self.item = None
+
+    def handle_data(self, data):
+        for depth, field, parts in self.captures:
+            parts.append(data)
+
+    def _finish_capture(self, field, parts):
+        text = ''.join(parts).strip()
+        if field == 'tags':
+            self.item['tags'].append(text)
+        else:
+            self.item[field] = text
+
+    def close(self):
+        super().close()
+        # An item left open at the end of the page
+        if self.item is not None:
+            self.handle_endtag(self.stack[0])
+
+def _parse_with_html_parser(html):
+    parser = RecordingItemParser()
+    parser.feed(html)
+    parser.close()
+    return parser.items
+
+ITEM_XPATH = f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {ITEM_CLASS} ')]"
+
+def _parse_with_lxml(html):
+    if not html.strip():
+        return []
+    root = lxml.html.document_fromstring(html)
+    items = []
+    for element in root.xpath(ITEM_XPATH):
+        item = empty_item()
+        for child in element.iterdescendants():
+            classes = child.get('class') if isinstance(child.tag, str) else None
+            if not classes:
+                continue
+            for cls in classes.split():
+                field = FIELD_CLASSES.get(cls)
+                if field is None:
+                    continue
+                if field == 'tags':
+                    item['tags'].append(child.text_content().strip())
+                elif item[field] is None:
+                    item[field] = child.text_content().strip()
+                    if field == 'file':
+                        item['href'] = child.get('href')
+        items.append(item)
+    return items
+
+BACKENDS = {
+    'html.parser': _parse_with_html_parser,
+}
+if lxml is not None:
+    BACKENDS['lxml'] = _parse_with_lxml
+
+def parse_recording_items(html, backend=None):
+    """Parse the .recording-item elements of a page (see empty_item for the fields)"""
+    return BACKENDS[backend or DEFAULT_BACKEND](html)
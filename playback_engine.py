@@ -0,0 +1,544 @@
+import os
+import re
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import wave
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+from audio_metadata import read_audio_metadata
+
+# In-process audio playback for the apps, instead of handing every file to
+# the system's player:
+#
+#   player = AudioPlayer(default_sink())
+#   player.open(path); player.play(); player.seek(90.0); player.pause()
+#
+# A decoder thread fills a fixed-size ring buffer with PCM (WAV files are
+# read directly, anything else is decoded by ffmpeg) and a playback thread
+# feeds it to the sink in small periods, so memory use doesn't depend on
+# the recording's length. Playback starts as soon as PREFILL_SECONDS are
+# buffered; a seek lands on an exact sample frame. NullSink stands in for
+# the sound card when running headless.
+#
+# Everything reaches the sink as 16-bit signed PCM: WavSource converts 8-,
+# 24- and 32-bit WAVs and ffmpeg decodes to s16 (ffmpeg has to be on the
+# PATH for anything but WAV).
+#
+# A sink's write() may block until the sound card has room; it is given a
+# cancelled() check and must return once that is true (after a stop, seek
+# or close).
+
+BUFFER_SECONDS = 2.0
+PREFILL_SECONDS = 0.25
+PERIOD_SECONDS = 0.05
+
+# Frames decoded at a time
+DECODE_FRAMES = 8192
+
+# PCM ffmpeg decodes other formats to
+FFMPEG = 'ffmpeg'
+FFMPEG_RATE = 44100
+FFMPEG_CHANNELS = 2
+
+STOPPED = 'stopped'
+PLAYING = 'playing'
+PAUSED = 'paused'
+
+class RingBuffer:
+    """Fixed-size byte FIFO between one writer and one reader thread
+
+    write() blocks while the buffer is full and read() while it is empty,
+    unless the writer has finished. reset() empties it and bumps epoch, so
+    a writer blocked on stale data gives up; close() releases everyone.
+    """
+
+    def __init__(self, capacity):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.epoch = 0
+        self.finished = False
+        self.closed = False
+        self.condition = threading.Condition()
+
+    @property
+    def available(self):
+        with self.condition:
+            return self.size
+
+    def write(self, data, epoch=None):
+        """Append data; returns False if a reset (or one since epoch) or close cut it short"""
+        view = memoryview(data)
+        with self.condition:
+            if epoch is None:
+                epoch = self.epoch
+            while view:
+                while self.size == self.capacity and self.epoch == epoch and not self.closed:
+                    self.condition.wait()
+                if self.epoch != epoch or self.closed:
+                    return False
+                end = (self.start + self.size) % self.capacity
+                count = min(len(view), self.capacity - self.size, self.capacity - end)
+                self.buffer[end:end + count] = view[:count]
+                self.size += count
+                view = view[count:]
+                self.condition.notify_all()
+        return True
+
+    def read(self, count, timeout=None, epoch=None):
+        """(epoch, up to count bytes); empty once the writer has finished and everything was read
+
+        Given an epoch, nothing is taken if there has been a reset since.
+        """
+        with self.condition:
+            if not self.size and not self.finished and not self.closed:
+                self.condition.wait(timeout)
+            if epoch is not None and epoch != self.epoch:
+                return self.epoch, b''
+            count = min(count, self.size, self.capacity - self.start)
+            data = bytes(self.buffer[self.start:self.start + count])
+            self.start = (self.start + count) % self.capacity
+            self.size -= count
+            self.condition.notify_all()
+            return self.epoch, data
+
+    def wait_for(self, count, timeout=None):
+        """Wait until count bytes are buffered (or the writer finished); returns whether they are"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.size >= count or self.finished or self.closed, timeout)
+            return self.size >= count or self.finished
+
+    def finish(self):
+        """The writer has nothing more to write"""
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def reset(self):
+        with self.condition:
+            self.start = self.size = 0
+            self.epoch += 1
+            self.finished = False
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+# 8-bit WAV samples are unsigned; flipping the top bit makes them signed
+UNSIGNED_TO_SIGNED = bytes(value ^ 0x80 for value in range(256))
+
+def to_s16(data, sample_width):
+    """Little-endian PCM samples of a WAV (8-bit unsigned, 16/24/32-bit signed) as 16-bit signed"""
+    if sample_width == 2:
+        return data
+    samples = len(data) // sample_width
+    converted = bytearray(samples * 2)
+    if sample_width == 1:
+        converted[1::2] = data.translate(UNSIGNED_TO_SIGNED)
+    else:
+        # Keep the two most significant bytes of each sample
+        converted[0::2] = data[sample_width - 2::sample_width]
+        converted[1::2] = data[sample_width - 1::sample_width]
+    return bytes(converted)
+
+class WavSource:
+    """PCM frames of a WAV file, as 16-bit signed samples whatever the file's width"""
+
+    sample_width = 2
+
+    def __init__(self, path):
+        self.wav = wave.open(path, 'rb')
+        self.sample_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self.file_width = self.wav.getsampwidth()
+        if self.file_width not in (1, 2, 3, 4):
+            self.wav.close()
+            raise wave.Error(f"unsupported sample width {self.file_width}")
+        self.frames = self.wav.getnframes()
+
+    def read(self, frames):
+        return to_s16(self.wav.readframes(frames), self.file_width)
+
+    def seek(self, frame):
+        self.wav.setpos(min(frame, self.frames))
+
+    def close(self):
+        self.wav.close()
+
+def ffmpeg_duration(path):
+    """Length of a file in seconds as ffmpeg reports it (None if it doesn't know)
+
+    Raises ValueError if ffmpeg can't read the file at all.
+    """
+    result = subprocess.run([FFMPEG, '-nostdin', '-hide_banner', '-i', path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if b'Input #0' not in result.stderr or b'Audio:' not in result.stderr:
+        lines = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise ValueError(lines[-1] if lines else "ffmpeg can't read the file")
+    match = re.search(rb'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+class FfmpegSource:
+    """16-bit stereo frames of any file ffmpeg can decode; a seek restarts ffmpeg at that frame
+
+    frames is None when neither ffmpeg nor audio_metadata can tell the length.
+    """
+
+    sample_rate = FFMPEG_RATE
+    channels = FFMPEG_CHANNELS
+    sample_width = 2
+
+    def __init__(self, path):
+        if shutil.which(FFMPEG) is None:
+            raise ValueError("ffmpeg is needed to play anything but WAV (install it from ffmpeg.org)")
+        self.path = path
+        duration = ffmpeg_duration(path)
+        if not duration:
+            try:
+                duration = read_audio_metadata(path)['duration']
+            except (OSError, ValueError, struct.error, IndexError, ZeroDivisionError):
+                duration = None
+        self.frames = int(round(duration * self.sample_rate)) if duration else None
+        self.process = None
+        self.seek(0)
+
+    def seek(self, frame):
+        self.close()
+        # -ss before -i seeks to the nearest key frame and then decodes up
+        # to the exact time, so the first frame out is the one asked for
+        command = [FFMPEG, '-v', 'error', '-nostdin']
+        if frame:
+            command += ['-ss', f"{frame / self.sample_rate:.6f}"]
+        command += ['-i', self.path, '-f', 's16le', '-ac', str(self.channels), '-ar', str(self.sample_rate), '-']
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, frames):
+        return self.process.stdout.read(frames * self.channels * self.sample_width)
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.stdout.close()
+            self.process.wait()
+            self.process = None
+
+def open_source(path):
+    """A decoder for an audio file (ValueError if it can't be played)"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        try:
+            return WavSource(path)
+        except wave.Error:
+            pass  # e.g. a compressed WAV; let ffmpeg have it
+    return FfmpegSource(path)
+
+class NullSink:
+    """Sound output that discards the audio, for running the player headless
+
+    With realtime, write() takes as long as playing the audio would;
+    capture keeps everything written in data (for tests, not long files).
+    """
+
+    def __init__(self, realtime=False, capture=False):
+        self.realtime = realtime
+        self.capture = capture
+        self.data = bytearray()
+        self.frames_written = 0
+        self.frame_size = 1
+        self.sample_rate = 1
+
+    def open(self, sample_rate, channels, sample_width):
+        self.sample_rate = sample_rate
+        self.frame_size = channels * sample_width
+
+    def write(self, data, cancelled=None):
+        frames = len(data) // self.frame_size
+        self.frames_written += frames
+        if self.capture:
+            self.data += data
+        if self.realtime:
+            time.sleep(frames / self.sample_rate)
+
+    def set_volume(self, volume):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class PygameSink:
+    """Sound output through pygame.mixer, keeping one period queued behind the one playing"""
+
+    def __init__(self):
+        self.channel = None
+        self.volume = 1.0
+
+    def open(self, sample_rate, channels, sample_width):
+        pygame.mixer.quit()
+        pygame.mixer.init(frequency=sample_rate, size=-8 * sample_width, channels=channels)
+        self.channel = pygame.mixer.Channel(0)
+        self.channel.set_volume(self.volume)
+
+    def set_volume(self, volume):
+        """Volume from 0 to 1"""
+        self.volume = volume
+        if self.channel is not None:
+            self.channel.set_volume(volume)
+
+    def write(self, data, cancelled=None):
+        sound = pygame.mixer.Sound(buffer=data)
+        # The queue doesn't drain while the channel is paused
+        while self.channel.get_queue() is not None:
+            if cancelled is not None and cancelled():
+                return
+            time.sleep(0.005)
+        if cancelled is not None and cancelled():
+            return
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+
+    def pause(self):
+        self.channel.pause()
+
+    def resume(self):
+        self.channel.unpause()
+
+    def flush(self):
+        if self.channel is not None:
+            self.channel.stop()
+
+    def close(self):
+        self.channel = None
+        pygame.mixer.quit()
+
+def default_sink():
+    """The sound card's sink (None if pygame isn't installed or there is no audio device)"""
+    if pygame is None:
+        return None
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        return None
+    return PygameSink()
+
+class AudioPlayer:
+    """Plays one audio file at a time through a sink, decoding ahead on a background thread
+
+    position and duration are in seconds (duration is 0 while the length
+    of a file isn't known); on_end is called (from the playback thread) when
+    a file plays to the end.
+    """
+
+    def __init__(self, sink=None, buffer_seconds=BUFFER_SECONDS, prefill_seconds=PREFILL_SECONDS,
+                 on_end=None):
+        self.sink = sink if sink is not None else NullSink()
+        self.buffer_seconds = buffer_seconds
+        self.prefill_seconds = prefill_seconds
+        self.on_end = on_end
+        self.source = None
+        self.buffer = None
+        self.state = STOPPED
+        self.frame = 0  # next frame to reach the sink
+        self.seek_to = None
+        self.closed = False
+        self.lock = threading.Condition()
+        self.threads = []
+
+    def open(self, path):
+        """Load a file (stopping the current one); call play() to start it"""
+        source = open_source(path)
+        self.stop_threads()
+        if self.source is not None:
+            self.source.close()
+
+        self.source = source
+        self.frame_size = source.channels * source.sample_width
+        frames = int(source.sample_rate * self.buffer_seconds)
+        self.buffer = RingBuffer(max(1, frames) * self.frame_size)
+        self.period = max(1, int(source.sample_rate * PERIOD_SECONDS)) * self.frame_size
+        self.prefill = min(self.buffer.capacity, max(1, int(source.sample_rate * self.prefill_seconds)) * self.frame_size)
+        self.sink.open(source.sample_rate, source.channels, source.sample_width)
+
+        self.state = STOPPED
+        self.frame = 0
+        self.seek_to = None
+        self.closed = False
+        self.threads = [threading.Thread(target=self._decode, daemon=True),
+                        threading.Thread(target=self._play, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    @property
+    def duration(self):
+        if self.source is None or self.source.frames is None:
+            return 0.0
+        return self.source.frames / self.source.sample_rate
+
+    @property
+    def position(self):
+        with self.lock:
+            frame = self.seek_to if self.seek_to is not None else self.frame
+        return frame / self.source.sample_rate if self.source else 0.0
+
+    def play(self):
+        with self.lock:
+            if self.source is None:
+                return
+            if self.state == PAUSED:
+                self.sink.resume()
+            elif (self.source.frames is not None and self.frame >= self.source.frames
+                  and self.seek_to is None):
+                self._seek_frame(0)  # played to the end: start over
+            self.state = PLAYING
+            self.lock.notify_all()
+
+    def pause(self):
+        with self.lock:
+            if self.state == PLAYING:
+                self.state = PAUSED
+                self.sink.pause()
+
+    def stop(self):
+        with self.lock:
+            if self.source is None:
+                return
+            self.state = STOPPED
+            self.sink.flush()
+            self._seek_frame(0)
+
+    def seek(self, seconds):
+        """Continue from a time, rounded to the nearest frame"""
+        self.seek_frame(int(round(seconds * self.source.sample_rate)))
+
+    def seek_frame(self, frame):
+        """Continue from exactly this frame"""
+        with self.lock:
+            self.sink.flush()
+            self._seek_frame(frame)
+
+    def _seek_frame(self, frame):
+        if self.source.frames is not None:
+            frame = min(frame, self.source.frames)
+        self.seek_to = max(0, frame)
+        # Drops what was decoded and wakes a decoder blocked on a full buffer
+        self.buffer.reset()
+        self.lock.notify_all()
+
+    def _decode(self):
+        source, buffer = self.source, self.buffer
+        while True:
+            with self.lock:
+                while buffer.finished and self.seek_to is None and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                if self.seek_to is not None:
+                    # _seek_frame has already emptied the buffer
+                    source.seek(self.seek_to)
+                    self.frame = self.seek_to
+                    self.seek_to = None
+                epoch = buffer.epoch
+            try:
+                data = source.read(DECODE_FRAMES)
+            except (OSError, ValueError):
+                data = b''
+            if not data:
+                with self.lock:
+                    if buffer.epoch == epoch and self.seek_to is None:
+                        buffer.finish()
+            else:
+                # Dropped if there was a seek while decoding
+                buffer.write(data[:len(data) // self.frame_size * self.frame_size], epoch)
+
+    def _play(self):
+        buffer = self.buffer
+        primed = None  # epoch playback has started in
+        while True:
+            with self.lock:
+                while self.state != PLAYING and not self.closed:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                epoch = buffer.epoch
+
+            # Start (and restart after a seek or an underrun) once enough is buffered
+            if primed != epoch:
+                if not buffer.wait_for(self.prefill, timeout=0.1):
+                    continue
+                primed = epoch
+
+            read_epoch, data = buffer.read(self.period, timeout=0.1, epoch=epoch)
+            if read_epoch != epoch:
+                continue  # seeked; prefill again
+            if not data:
+                with self.lock:
+                    ended = buffer.finished and buffer.epoch == epoch and self.seek_to is None
+                    if ended:
+                        self.state = STOPPED
+                        if self.source.frames is None:
+                            self.source.frames = self.frame  # now we know
+                if ended:
+                    if self.on_end is not None:
+                        self.on_end()
+                else:
+                    primed = None  # underrun
+                continue
+
+            self.sink.write(data, lambda: self.closed or self.state == STOPPED or buffer.epoch != epoch)
+            with self.lock:
+                if buffer.epoch == epoch and self.seek_to is None:
+                    self.frame += len(data) // self.frame_size
+
+    def stop_threads(self):
+        with self.lock:
+            self.closed = True
+            self.state = STOPPED
+            self.lock.notify_all()
+        if self.buffer is not None:
+            self.buffer.close()
+        # Lets a playback thread waiting on a paused sink go
+        if self.threads:
+            self.sink.flush()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def close(self):
+        self.stop_threads()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+        self.sink.close()
+
+def open_with_system_player(path):
+    """Hand a file to the system's default player (the fallback when it can't be played here)"""
+    if os.name == 'nt':  # Windows
+        os.startfile(path)
+    elif os.path.exists('/usr/bin/open'):  # macOS
+        subprocess.Popen(('open', path))
+    else:  # Linux
+        subprocess.Popen(('xdg-open', path))
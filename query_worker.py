@@ -0,0 +1,153 @@
+import queue
+import sqlite3
+import threading
+
+# Rows handed to the UI per callback, so large results are shown incrementally
+CHUNK_SIZE = 200
+
+# How often the Tk side checks for finished chunks
+POLL_INTERVAL_MS = 20
+
+# Callbacks run per poll, so a burst of chunks can't stall the mainloop
+MAX_CALLBACKS_PER_POLL = 5
+
+class QueryWorker:
+    """Runs database queries on a background thread and feeds results back to Tk
+
+    Jobs are submitted on a named channel (e.g. "search"). Submitting a new job
+    on a channel cancels the one before it: a query still running is stopped
+    with Connection.interrupt() and any chunks it already produced are dropped.
+    Results travel through a queue that the Tk mainloop polls with root.after,
+    so the callbacks always run on the UI thread.
+    """
+
+    def __init__(self, root, db, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.db = db
+        self.chunk_size = chunk_size
+
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+
+        self.lock = threading.Lock()
+        self.latest = {}  # channel -> id of the newest job submitted on it
+        self.running = None  # (channel, job id) of the job on the worker thread
+        self.conn = None  # the worker thread's connection
+        self.next_id = 0
+
+        self.thread = threading.Thread(target=self._run, name="query-worker", daemon=True)
+        self.thread.start()
+        self.poll_id = self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, channel, query, on_chunk, on_done=None, on_error=None, row_factory=None):
+        """Run query(cursor) on the worker thread
+
+        query returns an iterable of rows. They are passed to on_chunk(rows)
+        a chunk at a time, then on_done(total_rows) is called. If the query
+        fails, on_error(exception) is called instead. All callbacks run on the
+        Tk thread, and none of them run once the job has been superseded.
+        """
+        with self.lock:
+            self.next_id += 1
+            job_id = self.next_id
+            self.latest[channel] = job_id
+            self._interrupt(channel)
+
+        self.jobs.put((channel, job_id, query, on_chunk, on_done, on_error, row_factory))
+        return job_id
+
+    def cancel(self, channel):
+        """Drop the current job on channel, stopping its query if it's running"""
+        with self.lock:
+            self.next_id += 1
+            self.latest[channel] = self.next_id
+            self._interrupt(channel)
+
+    def _interrupt(self, channel):
+        """Stop the running query if it belongs to channel (caller holds the lock)"""
+        if self.running and self.running[0] == channel and self.conn is not None:
+            self.conn.interrupt()
+
+    def _is_stale(self, channel, job_id):
+        with self.lock:
+            return self.latest.get(channel) != job_id
+
+    def _post(self, channel, job_id, callback, *args):
+        """Queue a callback for the Tk thread"""
+        if callback is not None:
+            self.results.put((channel, job_id, callback, args))
+
+    def _run(self):
+        """Worker thread: run jobs one at a time on this thread's own connection"""
+        conn = self.db.connection()
+        with self.lock:
+            self.conn = conn
+
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            channel, job_id, query, on_chunk, on_done, on_error, row_factory = job
+            with self.lock:
+                if self.latest.get(channel) != job_id:
+                    continue
+                self.running = (channel, job_id)
+
+            try:
+                self._run_job(channel, job_id, query, on_chunk, on_done, row_factory)
+            except Exception as e:
+                # An interrupted query raises OperationalError; that's expected
+                # when the job was superseded, so only report real failures
+                if not self._is_stale(channel, job_id):
+                    self._post(channel, job_id, on_error, e)
+            finally:
+                with self.lock:
+                    self.running = None
+
+    def _run_job(self, channel, job_id, query, on_chunk, on_done, row_factory):
+        cursor = self.db.cursor(row_factory)
+        chunk = []
+        total = 0
+
+        for row in query(cursor):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                if self._is_stale(channel, job_id):
+                    return
+                self._post(channel, job_id, on_chunk, chunk)
+                total += len(chunk)
+                chunk = []
+
+        if chunk:
+            self._post(channel, job_id, on_chunk, chunk)
+            total += len(chunk)
+        self._post(channel, job_id, on_done, total)
+
+    def _poll(self):
+        """Tk side: run the callbacks of finished chunks"""
+        for _ in range(MAX_CALLBACKS_PER_POLL):
+            try:
+                channel, job_id, callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if not self._is_stale(channel, job_id):
+                callback(*args)
+
+        self.poll_id = self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def close(self):
+        """Stop the worker thread and the polling loop"""
+        with self.lock:
+            if self.conn is not None:
+                try:
+                    self.conn.interrupt()
+                except sqlite3.ProgrammingError:
+                    pass  # already closed
+        self.jobs.put(None)
+        self.thread.join(timeout=1)
+
+        try:
+            self.root.after_cancel(self.poll_id)
+        except Exception:
+            pass  # the window is already gone
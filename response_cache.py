@@ -0,0 +1,87 @@
+import sqlite3
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+CachedResponse = namedtuple('CachedResponse', 'url etag last_modified body date_fetched')
+
+class ResponseCache:
+    """Scraped pages kept on disk with their ETag/Last-Modified validators
+
+    Keyed by URL; bodies are stored zlib-compressed. The scraper sends the
+    validators back as If-None-Match/If-Modified-Since, and a 304 means the
+    cached body is still current.
+    """
+
+    def __init__(self, path='adidam_scraper_cache.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB,
+                date_fetched TEXT,
+                date_checked TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url):
+        """The cached response for url (None if there isn't one)"""
+        row = self.conn.execute(
+            "SELECT url, etag, last_modified, body, date_fetched FROM http_cache WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        body = zlib.decompress(row[3]).decode('utf-8') if row[3] is not None else None
+        return CachedResponse(row[0], row[1], row[2], body, row[4])
+
+    def conditional_headers(self, url):
+        """If-None-Match/If-Modified-Since headers for a request of url"""
+        row = self.conn.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def store(self, url, response):
+        """Remember a 200 response's body and validators"""
+        now = datetime.now().isoformat()
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, date_fetched, date_checked)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                url,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                zlib.compress(response.text.encode('utf-8')),
+                now,
+                now
+            )
+        )
+        self.conn.commit()
+
+    def mark_unchanged(self, url, response=None):
+        """Record a 304 for url, taking any updated validators from it"""
+        params = [datetime.now().isoformat()]
+        updates = ["date_checked = ?"]
+        if response is not None:
+            for header, column in (('ETag', 'etag'), ('Last-Modified', 'last_modified')):
+                if response.headers.get(header):
+                    updates.append(f"{column} = ?")
+                    params.append(response.headers.get(header))
+        self.conn.execute(f"UPDATE http_cache SET {', '.join(updates)} WHERE url = ?", params + [url])
+        self.conn.commit()
+
+    def clear(self):
+        self.conn.execute("DELETE FROM http_cache")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -27,6 +27,12 @@ CREATE TABLE IF NOT EXISTS essays (
 );
 
 -- Categories/tags for the recordings
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT
+);
+
 CREATE TABLE IF NOT EXISTS recordings (
     id INTEGER PRIMARY KEY,
     essay_id INTEGER REFERENCES essays(id),
@@ -145,8 +151,8 @@ CREATE TABLE adidam_metadata (
 -- Indexes for faster searches
 CREATE INDEX idx_recordings_title ON recordings(title);
 CREATE INDEX idx_recordings_date ON recordings(date_recorded);
-CREATE INDEX idx_categories_name ON categories(name);
-CREATE INDEX idx_speakers_name ON speakers(name);
+CREATE UNIQUE INDEX idx_categories_name ON categories(name);
+CREATE UNIQUE INDEX idx_speakers_name ON speakers(name);
 CREATE INDEX idx_keywords_keyword ON keywords(keyword);
 CREATE INDEX idx_transcripts_recording ON transcripts(recording_id);
--- SQLite doesn't support FULLTEXT INDEX
\ No newline at end of file
+-- Full-text search uses an FTS5 table created by search_index.ensure_search_index()
\ No newline at end of file
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import random
+import time
+
+# Responses worth retrying: rate limited or a temporary server problem
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Rate limiter allowing rate requests per second, in bursts of up to capacity"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Hold back all requests for about seconds (e.g. after a 429 with Retry-After)"""
+        self._refill()
+        # Several responses asking for the same pause don't add up
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with full jitter: a random delay up to base * 2**attempt, capped"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def retry_after(response):
+    """Seconds from a response's Retry-After header (None if missing or a date)"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+class AsyncFetcher:
+    """Concurrent GETs through a blocking get function (e.g. a requests.Session's)
+
+    Each request runs in a worker thread, so the session keeps its cookies
+    and connection pool. At most concurrency requests are in flight, they
+    are spaced by a token bucket (rate per second, bursts of burst), and
+    429/5xx responses and connection errors are retried with jittered
+    exponential backoff, waiting at least as long as Retry-After asks.
+    """
+
+    def __init__(self, get, concurrency=4, rate=1.0, burst=1, max_retries=5,
+                 backoff_base=1.0, backoff_cap=30.0):
+        self.get = get
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests_sent = 0
+        self.retries = 0
+
+    async def fetch(self, url, **kwargs):
+        """GET url, retrying as needed; returns the last response
+
+        Raises the last exception if no attempt got a response at all.
+        """
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire()
+                self.requests_sent += 1
+                try:
+                    response = await asyncio.to_thread(self.get, url, **kwargs)
+                    error = None
+                except Exception as e:
+                    response, error = None, e
+
+                if response is not None and response.status_code not in RETRY_STATUSES:
+                    return response
+                if attempt == self.max_retries:
+                    break
+
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                wait = retry_after(response)
+                if wait is not None:
+                    self.bucket.pause(wait)
+                    delay = max(delay, wait)
+                reason = error if error is not None else f"status {response.status_code}"
+                logging.warning(f"Retrying {url} in {delay:.1f}s ({reason})")
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+            if response is None:
+                raise error
+            return response
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import re
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from db_migrations import migrate
+
+PageState = namedtuple('PageState', 'url page_number status content_hash item_count error attempts '
+                                    'date_fetched date_updated')
+
+# Page statuses: being fetched (left behind if a run dies), saved, or failed
+FETCHING = 'fetching'
+DONE = 'done'
+FAILED = 'failed'
+
+AGE_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+def parse_age(text):
+    """A freshness window like '30m', '12h', '2d' or '1w' as a timedelta"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', text.lower())
+    if not match:
+        raise ValueError(f"Not an age: {text!r} (use e.g. 30m, 12h, 2d)")
+    return timedelta(**{AGE_UNITS[match.group(2) or 'h']: float(match.group(1))})
+
+def recordings_hash(recordings):
+    """Hash of a page's parsed recordings
+
+    Hashing what was parsed rather than the HTML means markup that changes
+    on every fetch (tokens, timestamps) doesn't make a page look changed.
+    """
+    data = json.dumps(recordings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class ScrapeState:
+    """Per-page progress of the scraper, in the scrape_state table of the recordings database
+
+    A page is marked fetching when its request starts and done only once
+    its recordings are saved, so a page a crashed run was working on shows
+    up as fetching (or failed) and is scraped again by the next run.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        migrate(self.conn)
+
+    def get(self, url):
+        """The state of a page (None if it has never been scraped)"""
+        row = self.conn.execute(
+            """
+            SELECT url, page_number, status, content_hash, item_count, error, attempts,
+                   date_fetched, date_updated
+            FROM scrape_state WHERE url = ?
+            """,
+            (url,)
+        ).fetchone()
+        return PageState(*row) if row else None
+
+    def is_done(self, url, since=None):
+        """Whether a page was saved (within the freshness window since, a timedelta)"""
+        state = self.get(url)
+        if state is None or state.status != DONE:
+            return False
+        if since is None:
+            return True
+        return state.date_fetched is not None and \
+            state.date_fetched >= (datetime.now() - since).isoformat()
+
+    def start(self, url, page_number):
+        self.conn.execute(
+            """
+            INSERT INTO scrape_state (url, page_number, status, attempts, date_updated)
+            VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (url) DO UPDATE SET
+            page_number = excluded.page_number,
+            status = excluded.status,
+            attempts = attempts + 1,
+            date_updated = excluded.date_updated
+            """,
+            (url, page_number, FETCHING, datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def finish(self, url, content_hash=None, item_count=None):
+        """Mark a page saved; without a hash (a 304) the stored hash and count are kept"""
+        now = datetime.now().isoformat()
+        self.conn.execute(
+            """
+            UPDATE scrape_state
+            SET status = ?, content_hash = COALESCE(?, content_hash), item_count = COALESCE(?, item_count),
+                error = NULL, attempts = 0, date_fetched = ?, date_updated = ?
+            WHERE url = ?
+            """,
+            (DONE, content_hash, item_count, now, now, url)
+        )
+        self.conn.commit()
+
+    def fail(self, url, error):
+        self.conn.execute(
+            "UPDATE scrape_state SET status = ?, error = ?, date_updated = ? WHERE url = ?",
+            (FAILED, str(error), datetime.now().isoformat(), url)
+        )
+        self.conn.commit()
+
+    def counts(self):
+        """Number of pages in each status"""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM scrape_state GROUP BY status"))
+
+    def clear(self):
+        self.conn.execute("DELETE FROM scrape_state")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -1,7 +1,8 @@
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import csv
-import time
 import re
 import sqlite3
 import os
@@ -9,6 +10,14 @@ from datetime import datetime
 from getpass import getpass
 import logging
 
+from audio_downloader import AudioDownloader
+from bulk_import import lookup_ids, next_row_id, resolve_names
+from db_migrations import migrate
+from page_parser import parse_recording_items
+from response_cache import ResponseCache
+from scrape_engine import AsyncFetcher
+from scrape_state import ScrapeState, parse_age, recordings_hash
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -16,17 +25,40 @@ logging.basicConfig(
     filename='adidam_scraper.log'
 )
 
+# Pages fetched at once and requests per second (with bursts of up to
+# REQUEST_BURST) when scraping
+CONCURRENCY = 4
+REQUEST_RATE = 1.0
+REQUEST_BURST = 2
+
+# Updates a scraped recording whose file path is already in the database
+UPSERT_ON_FILE_PATH = """
+    ON CONFLICT (file_path) WHERE file_path IS NOT NULL DO UPDATE SET
+    description = excluded.description,
+    date_recorded = excluded.date_recorded,
+    duration = excluded.duration
+"""
+
 class AdidamScraper:
-    def __init__(self, db_path='adidam_recordings.db'):
-        self.base_url = 'https://secure.adidam.org'
+    def __init__(self, db_path='adidam_recordings.db', base_url='https://secure.adidam.org',
+                 concurrency=CONCURRENCY, rate=REQUEST_RATE, cache_path='adidam_scraper_cache.db'):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.rate = rate
+        # Pages from earlier runs, for conditional requests (None to always refetch)
+        self.cache = ResponseCache(cache_path) if cache_path else None
+        # 200 responses waiting for their page's rows to be saved (see cache_page)
+        self.uncached = {}
         self.login_url = f'{self.base_url}/Account/LogOn'
         self.ear_of_heart_base = f'{self.base_url}/academy/ear-of-heart'
         self.session = requests.Session()
         self.db_path = db_path
         self.init_db_if_needed()
+        # Which pages have been saved, so an interrupted crawl can resume
+        self.state = ScrapeState(db_path)
         
     def init_db_if_needed(self):
-        """Initialize the database if it doesn't exist"""
+        """Initialize the database if it doesn't exist and bring its schema up to date"""
         if not os.path.exists(self.db_path):
             logging.info("Creating new database...")
             conn = sqlite3.connect(self.db_path)
@@ -40,6 +72,13 @@ class AdidamScraper:
             conn.commit()
             conn.close()
             logging.info("Database initialized successfully")
+        
+        # Adds the indexes save_to_database looks recordings up with
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
     
     def login(self, username, password):
         """Log in to the Adidam website"""
@@ -77,77 +116,145 @@ class AdidamScraper:
             logging.error(f"Login error: {str(e)}")
             return False
     
-    def scrape_page(self, page_number):
-        """Scrape a single page of audio recordings"""
-        url = f"{self.ear_of_heart_base}/{page_number}"
+    def page_url(self, page_number):
+        return f"{self.ear_of_heart_base}/{page_number}"
+    
+    def conditional_headers(self, url):
+        """Headers asking the server to answer 304 if the cached copy of url is current"""
+        return self.cache.conditional_headers(url) if self.cache else {}
+    
+    def page_html(self, url, page_number, response, reparse_unchanged=False):
+        """The HTML to parse from a page response
+        
+        Returns None for a 304, when the page hasn't changed since it was
+        last scraped and can be skipped (or its cached HTML, with
+        reparse_unchanged), and '' for a failed request.
+        """
+        if response.status_code == 304 and self.cache:
+            self.cache.mark_unchanged(url, response)
+            logging.info(f"Page {page_number} unchanged since the last run")
+            if reparse_unchanged:
+                cached = self.cache.get(url)
+                return cached.body if cached else ''
+            return None
+        
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch page {page_number}: Status code {response.status_code}")
+            return ''
+        
+        if self.cache:
+            self.uncached[url] = response
+        return response.text
+    
+    def cache_page(self, url, saved=True):
+        """Cache a fetched page once its rows are committed, or forget it if saving failed
+        
+        Caching it any earlier would let the next run take a 304 for a page
+        whose rows never made it into the database.
+        """
+        response = self.uncached.pop(url, None)
+        if response is not None and saved:
+            self.cache.store(url, response)
+    
+    def scrape_page(self, page_number, reparse_unchanged=False):
+        """Scrape a single page of audio recordings (None if it is unchanged since the last run)
+        
+        Call cache_page() with the page's URL once the recordings are saved.
+        """
+        url = self.page_url(page_number)
         logging.info(f"Scraping page {page_number}: {url}")
         
         try:
-            response = self.session.get(url)
-            if response.status_code != 200:
-                logging.error(f"Failed to fetch page {page_number}: Status code {response.status_code}")
-                return []
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            recordings = []
+            response = self.session.get(url, headers=self.conditional_headers(url))
+            html = self.page_html(url, page_number, response, reparse_unchanged)
+            if not html:
+                return None if html is None else []
             
-            # Find all recording entries on the page
-            # This selector will need to be adjusted based on the actual HTML structure
-            recording_elements = soup.select('.recording-item')  # Adjust selector based on actual page structure
+            return self.parse_page(html, page_number)
             
-            for element in recording_elements:
-                recording = {}
-                
-                # Extract title
-                title_elem = element.select_one('.recording-title')
-                recording['title'] = title_elem.text.strip() if title_elem else 'Unknown Title'
-                
-                # Extract description
-                desc_elem = element.select_one('.recording-description')
-                recording['description'] = desc_elem.text.strip() if desc_elem else ''
-                
-                # Extract date
-                date_elem = element.select_one('.recording-date')
-                if date_elem:
-                    date_text = date_elem.text.strip()
-                    # Try to parse the date
-                    try:
-                        recording['date_recorded'] = self.parse_date(date_text)
-                    except:
-                        recording['date_recorded'] = None
-                else:
-                    recording['date_recorded'] = None
-                
-                # Extract duration
-                duration_elem = element.select_one('.recording-duration')
-                recording['duration'] = duration_elem.text.strip() if duration_elem else None
-                
-                # Extract file information
-                file_elem = element.select_one('.recording-file-link')
-                if file_elem and 'href' in file_elem.attrs:
-                    recording['file_path'] = file_elem['href']
-                    # If the file path is relative, make it absolute
-                    if recording['file_path'].startswith('/'):
-                        recording['file_path'] = f"{self.base_url}{recording['file_path']}"
-                else:
-                    recording['file_path'] = None
-                
-                # Extract categories/tags
-                tags_elem = element.select('.recording-tag')
-                recording['categories'] = [tag.text.strip() for tag in tags_elem] if tags_elem else []
-                
-                # Extract speaker information
-                speaker_elem = element.select_one('.recording-speaker')
-                recording['speaker'] = speaker_elem.text.strip() if speaker_elem else 'Adi Da Samraj'  # Default speaker
-                
-                recordings.append(recording)
+        except Exception as e:
+            logging.error(f"Error scraping page {page_number}: {str(e)}")
+            return []
+    
+    async def scrape_page_async(self, fetcher, page_number, reparse_unchanged=False):
+        """Scrape a single page through the async fetcher; returns (page number, recordings)
+        
+        recordings is None if the page is unchanged since the last run, or
+        if it failed (recorded in the scrape state).
+        """
+        url = self.page_url(page_number)
+        logging.info(f"Scraping page {page_number}: {url}")
+        
+        # Only a page that was saved may be skipped on a 304; one a crashed
+        # run fetched but never saved has to be fetched in full again
+        saved = self.state.is_done(url)
+        self.state.start(url, page_number)
+        
+        try:
+            response = await fetcher.fetch(url, headers=self.conditional_headers(url) if saved else {})
+            html = self.page_html(url, page_number, response, reparse_unchanged)
+            if html is None:
+                self.state.finish(url)
+                return page_number, None
+            if not html:
+                self.state.fail(url, f"status {response.status_code}")
+                return page_number, None
             
-            logging.info(f"Found {len(recordings)} recordings on page {page_number}")
-            return recordings
+            # Parsing is CPU work; keep it off the event loop
+            return page_number, await asyncio.to_thread(self.parse_page, html, page_number)
             
         except Exception as e:
             logging.error(f"Error scraping page {page_number}: {str(e)}")
-            return []
+            self.state.fail(url, e)
+            self.cache_page(url, saved=False)
+            return page_number, None
+    
+    def parse_page(self, html, page_number):
+        """Extract the recordings from the HTML of a page"""
+        recordings = []
+        
+        # Find all recording entries on the page (see page_parser.py for the selectors)
+        for item in parse_recording_items(html):
+            recording = {}
+            
+            # Extract title
+            recording['title'] = item['title'] if item['title'] is not None else 'Unknown Title'
+            
+            # Extract description
+            recording['description'] = item['description'] or ''
+            
+            # Extract date
+            if item['date'] is not None:
+                # Try to parse the date
+                try:
+                    recording['date_recorded'] = self.parse_date(item['date'])
+                except:
+                    recording['date_recorded'] = None
+            else:
+                recording['date_recorded'] = None
+            
+            # Extract duration
+            recording['duration'] = item['duration']
+            
+            # Extract file information
+            if item['href'] is not None:
+                recording['file_path'] = item['href']
+                # If the file path is relative, make it absolute
+                if recording['file_path'].startswith('/'):
+                    recording['file_path'] = f"{self.base_url}{recording['file_path']}"
+            else:
+                recording['file_path'] = None
+            
+            # Extract categories/tags
+            recording['categories'] = item['tags']
+            
+            # Extract speaker information
+            recording['speaker'] = item['speaker'] if item['speaker'] is not None else 'Adi Da Samraj'  # Default speaker
+            
+            recordings.append(recording)
+        
+        logging.info(f"Found {len(recordings)} recordings on page {page_number}")
+        return recordings
     
     def parse_date(self, date_string):
         """Try to parse date string into a standardized format"""
@@ -177,10 +284,18 @@ class AdidamScraper:
         return None
     
     def save_to_database(self, recordings):
-        """Save scraped recordings to the SQLite database"""
+        """Save scraped recordings to the SQLite database
+        
+        Recordings are matched by file path (or the remote URL of one that
+        has been downloaded), or by title when they have no file path or
+        one that can fill in the path of a recording matched by title.
+        A page's recordings, their categories and speakers are written with
+        a handful of batched statements in one transaction. Returns whether
+        they were saved.
+        """
         if not recordings:
             logging.info("No recordings to save")
-            return
+            return True
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -189,109 +304,131 @@ class AdidamScraper:
             # Begin transaction
             conn.execute('BEGIN TRANSACTION')
             
+            # Upsert on the file path where it is unique (see db_migrations.py)
+            cursor.execute("PRAGMA index_list(recordings)")
+            upsert = any(name == 'idx_recordings_file_path' and unique for _, name, unique, *rest in cursor.fetchall())
+            
+            # Look up the existing recordings by file path, then by title
+            paths = {recording['file_path'] for recording in recordings if recording.get('file_path')}
+            path_ids = lookup_ids(cursor, 'recordings', 'file_path', paths)
+            # Downloaded recordings keep their local file_path
+            remote_ids = lookup_ids(cursor, 'recordings', 'remote_url', paths - path_ids.keys())
+            path_ids.update(remote_ids)
+            titles = {recording.get('title') for recording in recordings
+                      if recording.get('file_path') not in path_ids}
+            title_ids = lookup_ids(cursor, 'recordings', 'title', titles)
+            pathless_title_ids = lookup_ids(cursor, 'recordings', 'title', titles, 'AND file_path IS NULL')
+            
+            first_new_id = next_id = next_row_id(cursor, 'recordings')
+            inserts = []
+            updates = []
+            recording_ids = []
             for recording in recordings:
-                # First check if this recording already exists (by title and file path)
-                cursor.execute(
-                    "SELECT id FROM recordings WHERE title = ? OR file_path = ?",
-                    (recording.get('title'), recording.get('file_path'))
-                )
-                existing = cursor.fetchone()
-                
-                if existing:
-                    recording_id = existing[0]
-                    logging.info(f"Recording '{recording.get('title')}' already exists, updating")
-                    
-                    # Update the existing record
-                    cursor.execute(
-                        """
-                        UPDATE recordings 
-                        SET description = ?, date_recorded = ?, duration = ?
-                        WHERE id = ?
-                        """,
-                        (
-                            recording.get('description', ''),
-                            recording.get('date_recorded'),
-                            recording.get('duration'),
-                            recording_id
-                        )
-                    )
+                path = recording.get('file_path')
+                title = recording.get('title')
+                if path and path in path_ids and (path in remote_ids or not upsert):
+                    recording_id = path_ids[path]
+                    updates.append(recording_id)
+                elif path and path not in path_ids and title in pathless_title_ids:
+                    # Same title, no file path yet: this is where it comes from
+                    recording_id = path_ids[path] = pathless_title_ids.pop(title)
+                    updates.append(recording_id)
+                elif not path and title in title_ids:
+                    recording_id = title_ids[title]
+                    updates.append(recording_id)
                 else:
-                    # Insert new recording
-                    cursor.execute(
-                        """
-                        INSERT INTO recordings 
-                        (title, description, date_recorded, duration, file_path, date_added) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            recording.get('title', 'Unknown Title'),
-                            recording.get('description', ''),
-                            recording.get('date_recorded'),
-                            recording.get('duration'),
-                            recording.get('file_path'),
-                            datetime.now().strftime('%Y-%m-%d')
-                        )
-                    )
-                    recording_id = cursor.lastrowid
-                    logging.info(f"Added new recording: '{recording.get('title')}'")
-                
-                # Process categories/tags
-                if recording.get('categories'):
-                    for category_name in recording['categories']:
-                        # Check if category exists
-                        cursor.execute("SELECT id FROM categories WHERE name = ?", (category_name,))
-                        category = cursor.fetchone()
-                        
-                        if not category:
-                            # Create new category
-                            cursor.execute(
-                                "INSERT INTO categories (name) VALUES (?)",
-                                (category_name,)
-                            )
-                            category_id = cursor.lastrowid
-                        else:
-                            category_id = category[0]
-                        
-                        # Link recording to category
-                        cursor.execute(
-                            """
-                            INSERT OR IGNORE INTO recording_categories 
-                            (recording_id, category_id) VALUES (?, ?)
-                            """,
-                            (recording_id, category_id)
-                        )
-                
-                # Process speaker
-                if recording.get('speaker'):
-                    cursor.execute("SELECT id FROM speakers WHERE name = ?", (recording['speaker'],))
-                    speaker = cursor.fetchone()
-                    
-                    if not speaker:
-                        # Create new speaker
-                        cursor.execute(
-                            "INSERT INTO speakers (name) VALUES (?)",
-                            (recording['speaker'],)
-                        )
-                        speaker_id = cursor.lastrowid
+                    # New, or an existing path the upsert will update
+                    recording_id = next_id
+                    next_id += 1
+                    inserts.append(recording_id)
+                    if path:
+                        path_ids.setdefault(path, recording_id)
                     else:
-                        speaker_id = speaker[0]
-                    
-                    # Link recording to speaker
-                    cursor.execute(
-                        """
-                        INSERT OR IGNORE INTO recording_speakers
-                        (recording_id, speaker_id) VALUES (?, ?)
-                        """,
-                        (recording_id, speaker_id)
+                        title_ids[title] = recording_id
+                recording_ids.append(recording_id)
+            
+            rows = {recording_id: recording for recording_id, recording in zip(recording_ids, recordings)}
+            cursor.executemany(
+                f"""
+                INSERT INTO recordings 
+                (id, title, description, date_recorded, duration, file_path, date_added) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                {UPSERT_ON_FILE_PATH if upsert else ''}
+                """,
+                [
+                    (
+                        recording_id,
+                        rows[recording_id].get('title', 'Unknown Title'),
+                        rows[recording_id].get('description', ''),
+                        rows[recording_id].get('date_recorded'),
+                        rows[recording_id].get('duration'),
+                        rows[recording_id].get('file_path'),
+                        datetime.now().strftime('%Y-%m-%d')
+                    )
+                    for recording_id in inserts
+                ]
+            )
+            cursor.executemany(
+                """
+                UPDATE recordings 
+                SET description = ?, date_recorded = ?, duration = ?, file_path = COALESCE(file_path, ?)
+                WHERE id = ?
+                """,
+                [
+                    (
+                        rows[recording_id].get('description', ''),
+                        rows[recording_id].get('date_recorded'),
+                        rows[recording_id].get('duration'),
+                        rows[recording_id].get('file_path'),
+                        recording_id
                     )
+                    for recording_id in updates
+                ]
+            )
+            
+            # Ids of upserted paths that already existed
+            if upsert and paths:
+                path_ids.update(lookup_ids(cursor, 'recordings', 'file_path', paths))
+            recording_ids = [path_ids[recording['file_path']] if recording.get('file_path') else recording_id
+                             for recording, recording_id in zip(recordings, recording_ids)]
+            
+            # Process categories/tags and speakers
+            categories = resolve_names(cursor, 'categories',
+                                       (name for recording in recordings for name in recording.get('categories') or []), {})
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO recording_categories 
+                (recording_id, category_id) VALUES (?, ?)
+                """,
+                [(recording_id, categories[name])
+                 for recording, recording_id in zip(recordings, recording_ids)
+                 for name in recording.get('categories') or []]
+            )
+            
+            speakers = resolve_names(cursor, 'speakers',
+                                     (recording['speaker'] for recording in recordings if recording.get('speaker')), {})
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO recording_speakers
+                (recording_id, speaker_id) VALUES (?, ?)
+                """,
+                [(recording_id, speakers[recording['speaker']])
+                 for recording, recording_id in zip(recordings, recording_ids) if recording.get('speaker')]
+            )
+            
+            cursor.execute("SELECT COUNT(*) FROM recordings WHERE id >= ?", (first_new_id,))
+            added = cursor.fetchone()[0]
             
             # Commit the transaction
             conn.commit()
-            logging.info(f"Successfully saved {len(recordings)} recordings to database")
+            logging.info(f"Successfully saved {len(recordings)} recordings to database "
+                         f"({added} new, {len(recordings) - added} updated)")
+            return True
             
         except Exception as e:
             conn.rollback()
             logging.error(f"Database error: {str(e)}")
+            return False
         finally:
             conn.close()
     
@@ -345,28 +482,101 @@ class AdidamScraper:
         finally:
             conn.close()
 
-    def run(self, start_page=1, end_page=17):
+    def run(self, start_page=1, end_page=17, reparse_unchanged=False, resume=False, since=None):
         """Run the scraper for a range of pages"""
-        all_recordings = []
+        return asyncio.run(self.run_async(start_page, end_page, reparse_unchanged, resume, since))
+    
+    def pages_to_scrape(self, start_page, end_page, resume=False, since=None):
+        """The pages of a range that still need scraping
+        
+        With resume, pages saved by an earlier run are skipped and only
+        failed, interrupted and new ones are scraped; since (a timedelta)
+        limits the skipping to pages saved within that window, so older
+        ones count as stale and are scraped again.
+        """
+        if not resume and since is None:
+            return list(range(start_page, end_page + 1))
+        return [page_num for page_num in range(start_page, end_page + 1)
+                if not self.state.is_done(self.page_url(page_num), since)]
+    
+    async def run_async(self, start_page=1, end_page=17, reparse_unchanged=False, resume=False, since=None):
+        """Scrape a range of pages concurrently, saving each page as it arrives
         
-        for page_num in range(start_page, end_page + 1):
-            page_recordings = self.scrape_page(page_num)
-            if page_recordings:
-                all_recordings.extend(page_recordings)
-                # Save after each page to avoid losing data if something fails
-                self.save_to_database(page_recordings)
-                # Be nice to the server
-                time.sleep(2)
+        Requests share the logged-in session and are limited by the
+        concurrency and rate settings instead of a fixed sleep. Pages the
+        server reports unchanged since the last run, or whose recordings
+        hash the same as when they were saved, are skipped, unless
+        reparse_unchanged is set. Each page is recorded in the scrape state
+        once it is saved (see pages_to_scrape for resume and since).
+        Returns the recordings of the pages that were scraped.
+        """
+        page_nums = self.pages_to_scrape(start_page, end_page, resume, since)
+        skipped = end_page - start_page + 1 - len(page_nums)
+        if skipped:
+            logging.info(f"Skipping {skipped} pages already scraped")
         
-        logging.info(f"Scraping complete. Found {len(all_recordings)} recordings in total")
+        fetcher = AsyncFetcher(self.session.get, concurrency=self.concurrency,
+                               rate=self.rate, burst=REQUEST_BURST)
+        tasks = [asyncio.create_task(self.scrape_page_async(fetcher, page_num, reparse_unchanged))
+                 for page_num in page_nums]
+        
+        pages = {}
+        unchanged = 0
+        failed = 0
+        for task in asyncio.as_completed(tasks):
+            page_num, page_recordings = await task
+            url = self.page_url(page_num)
+            if page_recordings is None:
+                if self.state.is_done(url):
+                    unchanged += 1
+                else:
+                    failed += 1
+                continue
+            
+            content_hash = recordings_hash(page_recordings)
+            state = self.state.get(url)
+            if not reparse_unchanged and state.content_hash == content_hash and state.date_fetched:
+                logging.info(f"Page {page_num} has the same recordings as when it was last saved")
+                self.state.finish(url)
+                self.cache_page(url)
+                unchanged += 1
+                continue
+            
+            pages[page_num] = page_recordings
+            # Save after each page to avoid losing data if something fails
+            if await asyncio.to_thread(self.save_to_database, page_recordings):
+                self.state.finish(url, content_hash, len(page_recordings))
+                self.cache_page(url)
+            else:
+                self.state.fail(url, "database error")
+                self.cache_page(url, saved=False)
+                failed += 1
+        
+        all_recordings = [recording for page_num in sorted(pages) for recording in pages[page_num]]
+        logging.info(f"Scraping complete. Found {len(all_recordings)} recordings in total, "
+                     f"{unchanged} pages unchanged, {failed} failed, {skipped} skipped "
+                     f"({fetcher.requests_sent} requests, {fetcher.retries} retries)")
         return all_recordings
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the Ear of the Heart recordings")
+    parser.add_argument("--base-url", default="https://secure.adidam.org", help="Site to scrape (e.g. a local stub)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Pages fetched at once")
+    parser.add_argument("--rate", type=float, default=REQUEST_RATE, help="Requests per second")
+    parser.add_argument("--reparse", action="store_true", help="Parse and save unchanged pages from the cache too")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip pages an earlier run saved; only failed, interrupted or new pages are scraped")
+    parser.add_argument("--since", type=parse_age,
+                        help="Skip pages saved within this window (e.g. 12h or 2d); older ones are scraped again")
+    parser.add_argument("--download", metavar="DIR",
+                        help="Download the recordings' audio files into DIR after scraping")
+    args = parser.parse_args()
+    
     print("Adidam Audio Recordings Scraper")
     print("=" * 30)
     
     # Initialize scraper
-    scraper = AdidamScraper()
+    scraper = AdidamScraper(base_url=args.base_url, concurrency=args.concurrency, rate=args.rate)
     
     # Get login credentials
     username = input("Username: ")
@@ -383,7 +593,14 @@ def main():
         
         # Run scraper
         print(f"Scraping pages {start_page} to {end_page}...")
-        recordings = scraper.run(start_page, end_page)
+        recordings = scraper.run(start_page, end_page, reparse_unchanged=args.reparse,
+                                 resume=args.resume, since=args.since)
+        
+        # Fetch the audio with the logged-in session
+        if args.download:
+            print(f"Downloading audio files to {args.download}...")
+            downloaded, failed = AudioDownloader(scraper.session, args.download).run(scraper.db_path)
+            print(f"Downloaded {downloaded} audio files ({failed} failed).")
         
         # Export to CSV
         scraper.export_to_csv()
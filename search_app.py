@@ -3,10 +3,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import os
 
+from db_access import AdidamDatabase
+
 class AdidamSearchApp:
     def __init__(self, root, db_path='adidam_recordings.db'):
         self.root = root
         self.db_path = db_path
+        self.db = AdidamDatabase(db_path, read_only=True)
         
         # Setup UI
         self.setup_ui()
@@ -160,8 +163,7 @@ class AdidamSearchApp:
     def load_books(self):
         """Load all books into the books listbox"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.cursor()
             
             cursor.execute("SELECT id, title FROM books ORDER BY display_order, title")
             books = cursor.fetchall()
@@ -172,8 +174,6 @@ class AdidamSearchApp:
             for book_id, title in books:
                 self.books_listbox.insert(tk.END, title)
                 self.books_data[title] = book_id
-                
-            conn.close()
             
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to load books: {str(e)}")
@@ -198,8 +198,7 @@ class AdidamSearchApp:
     def load_essays(self, book_id):
         """Load essays for the selected book with multiple recordings"""
         try:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.cursor()
         
         # Clear existing items
         for item in self.essays_tree.get_children():
@@ -269,8 +268,6 @@ class AdidamSearchApp:
                                       text="",
                                       values=("", "No recordings available", ""),
                                       tags=())
-        
-        conn.close()
 
         except Exception as e:
         messagebox.showerror("Database Error", f"Failed to load essays: {str(e)}")
@@ -300,8 +297,6 @@ class AdidamSearchApp:
                 self.essays_tree.insert("", "end", values=(essay_number, clean_title, duration),
                                       tags=(str(recording_id),))
             
-            conn.close()
-            
         except Exception as e:
         messagebox.showerror("Database Error", f"Failed to load essays: {str(e)}")
     
@@ -313,9 +308,7 @@ class AdidamSearchApp:
         return
     
     try:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # This helps with column names
-        cursor = conn.cursor()
+        cursor = self.db.cursor(sqlite3.Row)  # This helps with column names
         
         # Clear existing results
         for item in self.results_tree.get_children():
@@ -414,8 +407,6 @@ class AdidamSearchApp:
         else:
             messagebox.showinfo("Search Results", "No results found for your search")
         
-        conn.close()
-        
     except Exception as e:
         messagebox.showerror("Search Error", f"Failed to search: {str(e)}")
     
@@ -454,8 +445,7 @@ class AdidamSearchApp:
     def play_recording(self, recording_id):
         """Play the selected recording"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.cursor()
             
             cursor.execute("""
                 SELECT r.title, r.file_path, b.title as book_title, e.title as essay_title
@@ -466,7 +456,6 @@ class AdidamSearchApp:
             """, (recording_id,))
             
             recording = cursor.fetchone()
-            conn.close()
             
             if not recording:
                 messagebox.showinfo("Play", "Recording not found")
@@ -494,6 +483,7 @@ def main():
     root = tk.Tk()
     app = AdidamSearchApp(root)
     root.mainloop()
+    app.db.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,103 @@
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from search_index import (DEFAULT_LIMIT, fetch_indexed_tokens, search_essays,
+                          search_index_exists, search_tokens, searched_columns)
+
+# Result sets kept for search-as-you-type
+CACHE_SIZE = 32
+
+def has_prefix(words, prefix):
+    """True if some word in the sorted tuple words starts with prefix"""
+    i = bisect_left(words, prefix)
+    return i < len(words) and words[i].startswith(prefix)
+
+def refines(tokens, base_tokens):
+    """True if every essay matching tokens also matches base_tokens
+
+    That holds when the search was only typed further: each earlier word has
+    been extended ("adi" -> "adid") and new words may follow.
+    """
+    return (len(tokens) >= len(base_tokens)
+            and all(token.startswith(base) for token, base in zip(tokens, base_tokens)))
+
+class SearchCache:
+    """LRU cache of search result sets, keyed by (words, title toggle, number toggle)
+
+    Alongside the rows (sqlite3.Row, as returned by search_essays) each entry
+    keeps the indexed words of every essay it holds, so a refined search can
+    be answered by filtering the cached superset in memory. The cache is
+    emptied whenever the database's data_version changes.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()  # key -> (rows, {essay_id: words})
+        self.data_version = None
+        self.lock = threading.Lock()
+
+    def check_version(self, data_version):
+        """Forget every result set if the database changed since they were cached"""
+        with self.lock:
+            if data_version != self.data_version:
+                self.entries.clear()
+                self.data_version = data_version
+
+    def lookup(self, tokens, search_titles, search_numbers):
+        """Return the cached rows for a search, or None on a miss"""
+        key = (tokens, search_titles, search_numbers)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+
+            # Smallest cached superset this search refines
+            best = None
+            for (base_tokens, titles, numbers), entry in self.entries.items():
+                if (titles, numbers) == (search_titles, search_numbers) and refines(tokens, base_tokens):
+                    if best is None or len(entry[0]) < len(best[0]):
+                        best = entry
+            if best is None:
+                return None
+
+            # Keeps the superset's ranking order
+            rows, essay_words = best
+            rows = [row for row in rows
+                    if all(has_prefix(essay_words[row['essay_id']], token) for token in tokens)]
+            self._store(key, rows, essay_words)
+            return rows
+
+    def store(self, tokens, search_titles, search_numbers, rows, essay_words):
+        with self.lock:
+            self._store((tokens, search_titles, search_numbers), rows, essay_words)
+
+    def _store(self, key, rows, essay_words):
+        self.entries[key] = (rows, essay_words)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+def cached_search(cache, cursor, search_text, search_titles=True, search_numbers=True, limit=DEFAULT_LIMIT):
+    """search_essays() answered from cache where possible
+
+    cursor must use sqlite3.Row, and the same connection should be used for
+    every call so its data_version is comparable.
+    """
+    cursor.execute("PRAGMA data_version")
+    cache.check_version(cursor.fetchone()[0])
+
+    tokens = search_tokens(search_text)
+    rows = cache.lookup(tokens, search_titles, search_numbers)
+    if rows is not None:
+        return rows
+
+    rows = search_essays(cursor, search_text, search_titles, search_numbers, limit)
+
+    # Only a complete result set can stand in for refined searches
+    if tokens and len(rows) < limit and search_index_exists(cursor):
+        essay_words = fetch_indexed_tokens(cursor, [row['essay_id'] for row in rows],
+                                           searched_columns(search_titles, search_numbers))
+        cache.store(tokens, search_titles, search_numbers, rows, essay_words)
+
+    return rows
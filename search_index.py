@@ -0,0 +1,288 @@
+import re
+import sqlite3
+import unicodedata
+
+# FTS5 table holding one row per essay (rowid = essays.id)
+SEARCH_TABLE = 'essay_search'
+
+SEARCH_COLUMNS = ('essay_title', 'essay_number', 'book_title', 'recordings', 'transcripts')
+
+# bm25 weights in SEARCH_COLUMNS order - a hit in the essay title counts most
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 0.5)
+
+# Columns searched by the "Titles" and "Numbers" toggles in the apps
+TITLE_COLUMNS = ('essay_title', 'book_title', 'recordings', 'transcripts')
+NUMBER_COLUMNS = ('essay_number',)
+
+# Cap on ranked results handed back to the UI
+DEFAULT_LIMIT = 1000
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Ranked essay search; parameters are the MATCH expression and a row limit
+SEARCH_SQL = f"""
+    SELECT
+        b.title as book_title,
+        e.id as essay_id,
+        e.essay_number,
+        e.title as essay_title
+    FROM {SEARCH_TABLE} s
+    JOIN essays e ON e.id = s.rowid
+    JOIN books b ON e.book_id = b.id
+    WHERE {SEARCH_TABLE} MATCH ?
+    ORDER BY bm25({SEARCH_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})
+    LIMIT ?
+"""
+
+def table_columns(cursor, table):
+    """Return the column names of a table (empty if it doesn't exist)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+def _essay_rows_sql(cursor, essay_filter):
+    """Build the SELECT producing search rows for essays matching essay_filter"""
+    recording_cols = table_columns(cursor, 'recordings')
+    has_recordings = 'essay_id' in recording_cols
+    has_transcripts = has_recordings and 'recording_id' in table_columns(cursor, 'transcripts')
+
+    if has_recordings:
+        parts = [f"COALESCE(r.{col}, '')" for col in ('title', 'reciter') if col in recording_cols]
+        recordings_sql = f"""(SELECT group_concat({" || ' ' || ".join(parts) or "''"}, ' ')
+                 FROM recordings r WHERE r.essay_id = e.id)"""
+    else:
+        recordings_sql = "''"
+
+    if has_transcripts:
+        transcripts_sql = """(SELECT group_concat(t.text, ' ')
+                 FROM transcripts t JOIN recordings r ON t.recording_id = r.id
+                 WHERE r.essay_id = e.id)"""
+    else:
+        transcripts_sql = "''"
+
+    return f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)})
+        SELECT e.id, e.title, e.essay_number, b.title,
+               {recordings_sql},
+               {transcripts_sql}
+        FROM essays e
+        LEFT JOIN books b ON b.id = e.book_id
+        WHERE e.id {essay_filter}"""
+
+def _refresh_sql(cursor, essay_filter):
+    """Statements that re-index the essays matching essay_filter"""
+    return (f"DELETE FROM {SEARCH_TABLE} WHERE rowid {essay_filter};"
+            + _essay_rows_sql(cursor, essay_filter) + ";")
+
+def _trigger_sql(cursor):
+    """CREATE TRIGGER statements that keep the search table in sync"""
+    triggers = {
+        'essays_ai': ("AFTER INSERT ON essays", _refresh_sql(cursor, "= NEW.id")),
+        'essays_au': ("AFTER UPDATE OF title, essay_number, book_id ON essays",
+                      f"DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;" + _refresh_sql(cursor, "= NEW.id")),
+        'essays_ad': ("AFTER DELETE ON essays", f"DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;"),
+        'books_au': ("AFTER UPDATE OF title ON books",
+                     _refresh_sql(cursor, "IN (SELECT id FROM essays WHERE book_id = NEW.id)")),
+    }
+
+    recording_cols = table_columns(cursor, 'recordings')
+    if 'essay_id' in recording_cols:
+        # Only re-index when a searched column changes, not on metadata updates
+        watched = ', '.join(col for col in ('essay_id', 'title', 'reciter') if col in recording_cols)
+        triggers['recordings_ai'] = ("AFTER INSERT ON recordings", _refresh_sql(cursor, "= NEW.essay_id"))
+        triggers['recordings_au'] = (f"AFTER UPDATE OF {watched} ON recordings",
+                                     _refresh_sql(cursor, "= OLD.essay_id") + _refresh_sql(cursor, "= NEW.essay_id"))
+        triggers['recordings_ad'] = ("AFTER DELETE ON recordings", _refresh_sql(cursor, "= OLD.essay_id"))
+
+        if 'recording_id' in table_columns(cursor, 'transcripts'):
+            old_essay = "= (SELECT essay_id FROM recordings WHERE id = OLD.recording_id)"
+            new_essay = "= (SELECT essay_id FROM recordings WHERE id = NEW.recording_id)"
+            triggers['transcripts_ai'] = ("AFTER INSERT ON transcripts", _refresh_sql(cursor, new_essay))
+            triggers['transcripts_au'] = ("AFTER UPDATE OF text, recording_id ON transcripts",
+                                          _refresh_sql(cursor, old_essay) + _refresh_sql(cursor, new_essay))
+            triggers['transcripts_ad'] = ("AFTER DELETE ON transcripts", _refresh_sql(cursor, old_essay))
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{name} {event} BEGIN {body} END"
+        for name, (event, body) in triggers.items()
+    ]
+
+def create_search_index(cursor):
+    """Create and populate the full-text search table and its triggers
+
+    Runs inside the caller's transaction. The triggers look recordings up by
+    essay_id, which the browse indexes from db_migrations.py cover. Returns
+    False if the database has no essays/books to index.
+    """
+    if not table_columns(cursor, 'essays') or not table_columns(cursor, 'books'):
+        return False
+
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+            {', '.join(SEARCH_COLUMNS)},
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+    """)
+
+    for statement in _trigger_sql(cursor):
+        cursor.execute(statement)
+
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    cursor.execute(_essay_rows_sql(cursor, "IS NOT NULL"))
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return True
+
+def search_index_exists(cursor):
+    """Check whether the full-text search table has been created"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,))
+    return cursor.fetchone() is not None
+
+def ensure_search_index(conn):
+    """Create the full-text search table if it doesn't exist yet
+
+    Returns True if the index is available.
+    """
+    cursor = conn.cursor()
+    if search_index_exists(cursor):
+        return True
+
+    with conn:
+        conn.execute("BEGIN")
+        return create_search_index(cursor)
+
+def drop_search_triggers(cursor):
+    """Drop the triggers that keep the search table in sync"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ? ESCAPE '\\'",
+                   (f"{SEARCH_TABLE}\\_%",))
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP TRIGGER {name}")
+
+def recreate_search_triggers(cursor):
+    """Replace the sync triggers with the current definitions, keeping the index"""
+    drop_search_triggers(cursor)
+    for statement in _trigger_sql(cursor):
+        cursor.execute(statement)
+
+def reindex_essays(cursor, essay_ids):
+    """Refresh the search rows of the given essays (e.g. after a bulk load without triggers)"""
+    essay_ids = list(essay_ids)
+    for start in range(0, len(essay_ids), 500):
+        batch = essay_ids[start:start + 500]
+        essay_filter = f"IN ({', '.join('?' * len(batch))})"
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid {essay_filter}", batch)
+        cursor.execute(_essay_rows_sql(cursor, essay_filter), batch)
+
+def rebuild_search_index(conn):
+    """Drop and rebuild the search table and its triggers from scratch"""
+    with conn:
+        conn.execute("BEGIN")
+        cursor = conn.cursor()
+        drop_search_triggers(cursor)
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        return create_search_index(cursor)
+
+def normalize_text(text):
+    """Fold text the way the unicode61 tokenizer does (lower case, no diacritics)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def search_tokens(search_text):
+    """Normalized words of search_text, in the order they were typed"""
+    return tuple(TOKEN_PATTERN.findall(normalize_text(search_text)))
+
+def searched_columns(search_titles=True, search_numbers=True):
+    """Search table columns selected by the title/number toggles"""
+    columns = []
+    if search_titles:
+        columns.extend(TITLE_COLUMNS)
+    if search_numbers:
+        columns.extend(NUMBER_COLUMNS)
+    return columns
+
+def fetch_indexed_tokens(cursor, essay_ids, columns):
+    """Return {essay_id: sorted tuple of the distinct words indexed in columns}"""
+    essay_ids = list(essay_ids)
+    tokens = {}
+
+    # Stay well below SQLite's bound parameter limit
+    for start in range(0, len(essay_ids), 500):
+        batch = essay_ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT rowid, {', '.join(columns)} FROM {SEARCH_TABLE}
+            WHERE rowid IN ({', '.join('?' * len(batch))})
+        """, batch)
+        for row in cursor.fetchall():
+            words = set()
+            for text in row[1:]:
+                if text:
+                    words.update(TOKEN_PATTERN.findall(normalize_text(text)))
+            tokens[row[0]] = tuple(sorted(words))
+
+    return tokens
+
+def build_match_query(search_text, search_titles=True, search_numbers=True):
+    """Turn free text into an FTS5 MATCH expression of prefix terms
+
+    Every word must match (as a prefix), restricted to the columns selected
+    by the title/number toggles. Returns None if nothing can match.
+    """
+    tokens = TOKEN_PATTERN.findall(search_text)
+    if not tokens or not (search_titles or search_numbers):
+        return None
+
+    # Quote each token so FTS5 operators typed by the user are taken literally
+    query = ' '.join(f'"{token}"*' for token in tokens)
+
+    columns = searched_columns(search_titles, search_numbers)
+    if len(columns) < len(SEARCH_COLUMNS):
+        query = f"{{{' '.join(columns)}}} : ({query})"
+
+    return query
+
+def search_essays(cursor, search_text, search_titles=True, search_numbers=True, limit=DEFAULT_LIMIT):
+    """Find essays matching search_text, best matches first
+
+    Returns rows of (book_title, essay_id, essay_number, essay_title). Falls
+    back to a LIKE scan if the database has no search index.
+    """
+    match_query = build_match_query(search_text, search_titles, search_numbers)
+    if match_query is None:
+        return []
+
+    try:
+        cursor.execute(SEARCH_SQL, (match_query, -1 if limit is None else limit))
+        return cursor.fetchall()
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+
+    return _like_search(cursor, search_text, search_titles, search_numbers, limit)
+
+def _like_search(cursor, search_text, search_titles, search_numbers, limit):
+    """Substring search used when the full-text index is unavailable"""
+    conditions = []
+    params = []
+
+    if search_titles:
+        conditions.append("LOWER(e.title) LIKE LOWER(?)")
+        params.append(f"%{search_text}%")
+
+    if search_numbers:
+        conditions.append("e.essay_number LIKE ?")
+        params.append(f"%{search_text}%")
+
+    params.append(-1 if limit is None else limit)
+
+    cursor.execute(f"""
+        SELECT
+            b.title as book_title,
+            e.id as essay_id,
+            e.essay_number,
+            e.title as essay_title
+        FROM essays e
+        JOIN books b ON e.book_id = b.id
+        WHERE ({" OR ".join(conditions)})
+        ORDER BY b.title, CAST(CASE WHEN e.essay_number GLOB '*[0-9]*' THEN e.essay_number ELSE '999999' END AS INTEGER)
+        LIMIT ?
+    """, params)
+    return cursor.fetchall()
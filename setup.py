@@ -32,6 +32,12 @@ def main():
         input("Press Enter to exit...")
         return
     
+    # The embedded player decodes everything but WAV with ffmpeg
+    if shutil.which("ffmpeg") is None:
+        print("Note: ffmpeg was not found. MP3, FLAC and M4A recordings will open in")
+        print("the system's player instead of playing in the app; install ffmpeg")
+        print("(https://ffmpeg.org) and put it on the PATH to play them here.")
+    
     # Set up working directory
     setup_result = setup_working_directory()
     
@@ -77,6 +83,7 @@ def install_dependencies():
         "pillow",  # For image processing
         "python-docx",  # For reading Word documents
         "pygame",  # For audio playback
+        "numpy",  # For precomputing waveforms (waveform_peaks.py)
     ]
     
     try:
@@ -499,6 +506,14 @@ import pygame
 import time
 import re
 
+try:
+    from waveform_view import WaveformCanvas
+    from waveform_peaks import waveform_for
+except ImportError:
+    WaveformCanvas = None
+
+from playback_engine import AudioPlayer, PygameSink
+
 class AdidamAudioLibrary:
     def __init__(self, root, db_path='adidam_recordings.db'):
         self.root = root
@@ -507,6 +522,9 @@ class AdidamAudioLibrary:
         self.books_per_page = 12
         self.current_recording = None
         self.is_playing = False
+        # Embedded player (see playback_engine.py), created on the first play
+        self.player = None
+        self.progress_job = None
         
         # Initialize pygame mixer for audio playback
         pygame.mixer.init()
@@ -613,6 +631,13 @@ class AdidamAudioLibrary:
                                   font=("Arial", 10), anchor="w")
         self.player_info.pack(side="top", fill="x", padx=10)
         
+        # Waveform of the current recording, drawn from its precomputed peaks
+        self.waveform = None
+        if WaveformCanvas is not None:
+            self.waveform = WaveformCanvas(self.player_frame, height=48, bg="#2E4DA7",
+                                           command=lambda fraction: self.seek_position(fraction * 100))
+            self.waveform.pack(side="top", fill="x", padx=10, pady=(5, 0))
+        
         # Controls frame
         controls_frame = tk.Frame(self.player_frame, bg="#2E4DA7")
         controls_frame.pack(side="top", fill="x", padx=10, pady=5)
@@ -659,6 +684,73 @@ class AdidamAudioLibrary:
         # Set initial volume
         self.set_volume(None)
     
+    def show_waveform(self, file_path):
+        """Draw the waveform of the recording being played (see waveform_peaks.py)"""
+        if self.waveform is None:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.waveform.load(waveform_for(conn, file_path))
+        finally:
+            conn.close()
+    
+    def hide_player(self):
+        self.stop_playback()
+        self.player_frame.pack_forget()
+    
+    def play_file(self, file_path):
+        """Play a file, decoding it ahead in the background instead of loading it whole"""
+        if self.player is None:
+            self.player = AudioPlayer(PygameSink())
+            self.set_volume(None)
+        self.player.open(file_path)
+        self.player.play()
+        self.is_playing = True
+        self.play_btn.config(text="❚❚")
+        duration = int(self.player.duration)
+        self.total_time.config(text=f"{duration // 60}:{duration % 60:02d}")
+        self.show_waveform(file_path)
+        self.update_progress()
+    
+    def toggle_playback(self):
+        if self.player is None:
+            return
+        if self.is_playing:
+            self.player.pause()
+        else:
+            self.player.play()
+        self.is_playing = not self.is_playing
+        self.play_btn.config(text="❚❚" if self.is_playing else "▶")
+    
+    def stop_playback(self):
+        if self.player is not None:
+            self.player.stop()
+        self.is_playing = False
+        self.play_btn.config(text="▶")
+    
+    def seek_position(self, value):
+        """Jump to a percentage of the recording (from the progress bar or the waveform)"""
+        if self.player is not None and self.player.duration:
+            self.player.seek(float(value) / 100 * self.player.duration)
+    
+    def set_volume(self, value):
+        if self.player is not None:
+            self.player.sink.set_volume(self.volume_var.get() / 100)
+    
+    def update_progress(self):
+        """Move the progress bar and waveform playhead along with playback"""
+        if self.progress_job is not None:
+            self.root.after_cancel(self.progress_job)
+        if self.player is None or not self.player.duration:
+            return
+        fraction = self.player.position / self.player.duration
+        self.progress_var.set(fraction * 100)
+        position = int(self.player.position)
+        self.current_time.config(text=f"{position // 60}:{position % 60:02d}")
+        if self.waveform is not None:
+            self.waveform.set_position(fraction)
+        self.progress_job = self.root.after(200, self.update_progress)
+    
     def load_books(self):
         """Load books from the database and display them"""
         # Clear existing book widgets
@@ -903,6 +995,38 @@ class AdidamAudioLibrary:
             if conn:
                 conn.close()
 
+    def play_selected_recording(self, event):
+        """Play the recording of the essay double-clicked in a book's essay list"""
+        tree = event.widget
+        selection = tree.selection()
+        if not selection:
+            return
+        tags = tree.item(selection[0], "tags")
+        recording_id = str(tags[0]) if tags else "None"
+        if recording_id == "None":
+            messagebox.showinfo("No Recording", "This essay has no recording yet.")
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT title, reciter, file_path FROM recordings WHERE id = ?",
+                               (int(recording_id),)).fetchone()
+        finally:
+            conn.close()
+        if not row or not row[2] or not os.path.exists(row[2]):
+            messagebox.showinfo("No Audio File", "The audio file for this recording isn't available.")
+            return
+        
+        title, reciter, file_path = row
+        self.current_recording = int(recording_id)
+        self.player_title.config(text=title or "")
+        self.player_info.config(text=reciter or "")
+        self.player_frame.pack(side="bottom", fill="x")
+        try:
+            self.play_file(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to play recording: {str(e)}")
+
     # More methods would go here...
 
 def main():
@@ -0,0 +1,290 @@
+import argparse
+import base64
+import hashlib
+import html
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# A local stand-in for secure.adidam.org serving canned pages, for trying
+# the scraper without the real site:
+#
+#   python stub_site.py --port 8000 --fail-every 5
+#   python scraper.py --base-url http://127.0.0.1:8000
+#
+# Any username and password log in. The recordings' /audio/ links serve
+# deterministic bytes with Range support, for the audio downloader.
+
+LOGIN_PATH = '/Account/LogOn'
+PAGES_PATH = '/academy/ear-of-heart/'
+AUDIO_PATH = '/audio/'
+AUTH_COOKIE = '.ASPXAUTH'
+TOKEN = 'stub-token'
+
+LOGIN_PAGE = f"""<html><body>
+<form action="{LOGIN_PATH}" method="post">
+<input name="__RequestVerificationToken" type="hidden" value="{TOKEN}">
+<input name="UserName" type="text"><input name="Password" type="password">
+<input name="RememberMe" type="checkbox" value="true">
+<button type="submit">Log On</button>
+</form>
+</body></html>"""
+
+def recording_html(page_number, index):
+    """One canned .recording-item as the scraper expects it"""
+    number = (page_number - 1) * 100 + index
+    return f"""<div class="recording-item">
+  <h3 class="recording-title">Talk {number}</h3>
+  <p class="recording-description">Canned recording {index} on page {page_number}</p>
+  <span class="recording-date">January {index % 28 + 1}, {1980 + page_number}</span>
+  <span class="recording-duration">{index % 60}:{index % 60:02d}</span>
+  <a class="recording-file-link" href="/audio/talk-{number}.mp3">Download</a>
+  <span class="recording-tag">Page {page_number}</span><span class="recording-tag">Stub</span>
+  <span class="recording-speaker">Adi Da Samraj</span>
+</div>"""
+
+def page_html(page_number, per_page, revision=0):
+    items = '\n'.join(recording_html(page_number, index) for index in range(1, per_page + 1))
+    return f"""<html><body><a href="/Account/LogOff">Log Off</a>
+<h1>{html.escape(f'Ear of the Heart - page {page_number}')}</h1>
+<!-- revision {revision} -->
+{items}
+</body></html>"""
+
+def audio_bytes(name, size):
+    """Canned content of an audio file: size bytes derived from its name"""
+    block = hashlib.sha256(name.encode('utf-8')).digest() * 64
+    return (block * (size // len(block) + 1))[:size]
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # keep the console quiet
+
+    def send_text(self, status, body, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def logged_in(self):
+        return f"{AUTH_COOKIE}=" in (self.headers.get('Cookie') or '')
+
+    def do_GET(self):
+        site = self.server.site
+        path = self.path.split('?')[0]
+        count = site.record(self.command, path)
+
+        if path == LOGIN_PATH:
+            self.send_text(200, LOGIN_PAGE)
+            return
+
+        if path.startswith(AUDIO_PATH):
+            self.send_audio(path[len(AUDIO_PATH):])
+            return
+
+        if not path.startswith(PAGES_PATH):
+            self.send_text(404, "<html><body>Not found</body></html>")
+            return
+
+        if not self.logged_in():
+            self.send_text(200, LOGIN_PAGE)
+            return
+
+        # Injected failures
+        if site.fail_every and count % site.fail_every == 0:
+            self.send_text(503, "<html><body>Service unavailable</body></html>")
+            return
+        if site.too_fast():
+            self.send_text(429, "<html><body>Too many requests</body></html>", {'Retry-After': '1'})
+            return
+
+        try:
+            page_number = int(path[len(PAGES_PATH):].strip('/'))
+        except ValueError:
+            page_number = 0
+        if not 1 <= page_number <= site.pages:
+            self.send_text(404, "<html><body>No such page</body></html>")
+            return
+
+        time.sleep(site.delay)
+        body = page_html(page_number, site.per_page, site.revisions.get(page_number, 0))
+        etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest()[:16] + '"'
+        modified = site.modified.get(page_number, site.started)
+        validators = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True)}
+
+        # Conditional requests: If-None-Match wins over If-Modified-Since
+        if_none_match = self.headers.get('If-None-Match')
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_none_match is not None:
+            unchanged = etag in [tag.strip() for tag in if_none_match.split(',')]
+        elif if_modified_since is not None:
+            try:
+                unchanged = int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                unchanged = False
+        else:
+            unchanged = False
+
+        if unchanged:
+            self.send_response(304)
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.end_headers()
+        else:
+            self.send_text(200, body, validators)
+
+    def send_audio(self, name):
+        site = self.server.site
+        data = audio_bytes(name, site.audio_size)
+        digest = base64.b64encode(hashlib.sha256(data).digest()).decode('ascii')
+        headers = {'Content-Type': 'audio/mpeg', 'Accept-Ranges': 'bytes',
+                   'Repr-Digest': f"sha-256=:{digest}:"}
+
+        # Single byte ranges: bytes=start- or bytes=start-end
+        start, end, status = 0, len(data) - 1, 200
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+        if match and site.ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(data)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+
+        # Injected failure: drop the connection part way through
+        if site.drop_audio_after and len(body) > site.drop_audio_after:
+            self.wfile.write(body[:site.drop_audio_after])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+    def do_POST(self):
+        site = self.server.site
+        site.record(self.command, self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+
+        if self.path != LOGIN_PATH or form.get('__RequestVerificationToken') != [TOKEN]:
+            self.send_text(400, "<html><body>Bad request</body></html>")
+            return
+        self.send_text(200, "<html><body>Welcome <a>Log Off</a></body></html>",
+                       {'Set-Cookie': f"{AUTH_COOKIE}=stub; Path=/"})
+
+class StubSite:
+    """The stub site running on a local port in a background thread
+
+    fail_every answers every nth page request with a 503; max_rate answers
+    page requests beyond that many per second with a 429 and Retry-After;
+    delay is added to every page response. Pages carry an ETag and
+    Last-Modified and answer conditional requests with 304 until they are
+    changed with change_page(). Audio files are audio_size bytes and
+    honour Range requests unless ranges is off; drop_audio_after cuts
+    every audio response off after that many bytes. requests lists (time,
+    method, path) of everything served.
+    """
+
+    def __init__(self, port=0, pages=17, per_page=10, fail_every=0, max_rate=0, delay=0.0,
+                 audio_size=256 * 1024, ranges=True, drop_audio_after=0):
+        self.pages = pages
+        self.per_page = per_page
+        self.fail_every = fail_every
+        self.max_rate = max_rate
+        self.delay = delay
+        self.audio_size = audio_size
+        self.ranges = ranges
+        self.drop_audio_after = drop_audio_after
+        self.started = int(time.time())
+        self.revisions = {}
+        self.modified = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), StubSiteHandler)
+        self.server.daemon_threads = True
+        self.server.site = self
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def change_page(self, page_number):
+        """Give a page new content (and validators)"""
+        with self.lock:
+            self.revisions[page_number] = self.revisions.get(page_number, 0) + 1
+            # Last-Modified has whole seconds; keep it ahead of any cached copy
+            self.modified[page_number] = max(int(time.time()), self.modified.get(page_number, self.started)) + 1
+
+    def record(self, method, path):
+        """Log a request; returns how many page requests have been served so far"""
+        with self.lock:
+            self.requests.append((time.monotonic(), method, path))
+            return sum(1 for _, _, logged in self.requests if logged.startswith(PAGES_PATH))
+
+    def too_fast(self):
+        if not self.max_rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            recent = [t for t, _, path in self.requests if path.startswith(PAGES_PATH) and now - t < 1.0]
+        return len(recent) > self.max_rate
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Ear of the Heart pages for the scraper")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=17)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every nth page request with a 503")
+    parser.add_argument("--max-rate", type=float, default=0, help="Answer page requests beyond this rate with a 429")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds added to every page response")
+    parser.add_argument("--audio-size", type=int, default=256 * 1024, help="Bytes in each audio file")
+    parser.add_argument("--drop-audio-after", type=int, default=0,
+                        help="Cut audio responses off after this many bytes")
+    args = parser.parse_args()
+
+    site = StubSite(args.port, args.pages, args.per_page, args.fail_every, args.max_rate, args.delay,
+                    audio_size=args.audio_size, drop_audio_after=args.drop_audio_after)
+    print(f"Serving {args.pages} pages at {site.base_url} (Ctrl+C to stop)")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.server.server_close()
+
+if __name__ == "__main__":
+    main()
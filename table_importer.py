@@ -1,12 +1,20 @@
 import sqlite3
 import os
-from datetime import datetime
-from docx import Document
+
+from bulk_import import BulkLoader
+from db_migrations import migrate
+from import_manifest import IncrementalImport
+from ooxml_reader import iter_table_rows
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None  # only needed when fast_reader is off
 
 class EohTableImporter:
-    def __init__(self, db_path='adidam_recordings.db'):
+    def __init__(self, db_path='adidam_recordings.db', fast_reader=True):
         self.db_path = db_path
-        self.current_book_id = None
+        self.fast_reader = fast_reader
         self.current_book_title = None
         
     def import_from_docx(self, docx_path):
@@ -20,33 +28,33 @@ class EohTableImporter:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Open the Word document
-            doc = Document(docx_path)
-            print(f"Document opened: {docx_path}")
+            # Bring the schema up to date (adds the essay sort key columns)
+            migrate(conn)
             
-            if len(doc.tables) == 0:
-                print("No tables found in document")
+            if not self.fast_reader and Document is None:
+                print("Error: python-docx is not installed. Run: pip install python-docx")
                 return False
-                
-            # Process the first table
-            table = doc.tables[0]
-            rows = len(table.rows)
-            print(f"Processing table with {rows} rows")
             
             # Begin transaction
-            conn.execute('BEGIN TRANSACTION')
+            loader = BulkLoader(conn)
+            loader.begin()
+            sync = IncrementalImport(loader, docx_path, 'table_importer')
             
+            print(f"Processing first table of: {docx_path}")
+            row_count = 0
             book_count = 0
             essay_count = 0
             
-            # Process each row
-            for i, row in enumerate(table.rows):
+            # Process each row of the first table as it is read
+            for i, cells in enumerate(self.read_table_rows(docx_path)):
+                row_count += 1
+                
                 # Get cell values
-                if len(row.cells) < 2:
+                if len(cells) < 2:
                     continue
                     
-                cell1 = row.cells[0].text.strip()
-                cell2 = row.cells[1].text.strip()
+                cell1 = cells[0].strip()
+                cell2 = cells[1].strip()
                 
                 if not cell1 or not cell2:
                     continue
@@ -54,23 +62,34 @@ class EohTableImporter:
                 # First row or rows with non-numeric first cell might be book titles
                 if i == 0 or not cell1[0].isdigit():
                     # This is likely a book title
-                    self.process_book_title(cell2, cursor)
+                    self.process_book_title(cell2, sync)
                     book_count += 1
                 else:
                     # This is likely an essay entry
                     essay_number = cell1
                     essay_title = cell2
-                    self.process_essay_entry(essay_number, essay_title, cursor)
+                    self.process_essay_entry(essay_number, essay_title, sync)
                     essay_count += 1
             
-            # Commit the transaction
-            conn.commit()
+            if row_count == 0:
+                print("No tables found in document")
+                loader.rollback()
+                return False
+            
+            # Write the last section and commit the transaction
+            sync.finish()
+            loader.commit()
+            print(loader.report())
+            print(sync.summary())
             
+            print(f"Processed {row_count} table rows")
             print(f"Imported {book_count} books and {essay_count} essays")
             return True
             
         except Exception as e:
-            if 'conn' in locals():
+            if 'loader' in locals():
+                loader.rollback()
+            elif 'conn' in locals():
                 conn.rollback()
             print(f"Error during import: {str(e)}")
             return False
@@ -78,29 +97,30 @@ class EohTableImporter:
             if 'conn' in locals():
                 conn.close()
     
-    def process_book_title(self, book_title, cursor):
-        """Process a book title"""
-        # Check if this book already exists
-        cursor.execute("SELECT id FROM books WHERE title = ?", (book_title,))
-        existing_book = cursor.fetchone()
+    def read_table_rows(self, docx_path):
+        """Yield the cell texts of each row of the document's first table
+        
+        The direct OOXML reader streams the rows; python-docx builds the whole
+        document and re-resolves the table's cells on every row.cells call.
+        """
+        if self.fast_reader:
+            yield from iter_table_rows(docx_path)
+            return
         
-        if existing_book:
-            self.current_book_id = existing_book[0]
-            self.current_book_title = book_title
-            print(f"Found existing book: {book_title} (ID: {self.current_book_id})")
-        else:
-            # Insert new book
-            cursor.execute(
-                "INSERT INTO books (title, display_order) VALUES (?, ?)",
-                (book_title, 0)  # We'll update display order later
-            )
-            self.current_book_id = cursor.lastrowid
-            self.current_book_title = book_title
-            print(f"Added new book: {book_title} (ID: {self.current_book_id})")
+        doc = Document(docx_path)
+        if doc.tables:
+            for row in doc.tables[0].rows:
+                yield [cell.text for cell in row.cells]
     
-    def process_essay_entry(self, essay_number, essay_title, cursor):
+    def process_book_title(self, book_title, sync):
+        """Process a book title"""
+        # Start the book's section; it is written once all its essays are read
+        self.current_book_title = book_title
+        sync.start_section(book_title, 0)  # We'll update display order later
+    
+    def process_essay_entry(self, essay_number, essay_title, sync):
         """Process an essay entry"""
-        if not self.current_book_id:
+        if not self.current_book_title:
             print(f"Warning: Essay {essay_number} found without a book. Skipping.")
             return
             
@@ -111,38 +131,8 @@ class EohTableImporter:
         essay_numbers = [num.strip() for num in essay_number.split(',')]
         
         for num in essay_numbers:
-            # Check if this essay already exists
-            cursor.execute(
-                "SELECT id FROM essays WHERE title = ? AND book_id = ? AND essay_number = ?", 
-                (essay_title, self.current_book_id, num)
-            )
-            existing_essay = cursor.fetchone()
-            
-            if existing_essay:
-                essay_id = existing_essay[0]
-                print(f"  Found existing essay: {essay_title} (ID: {essay_id}, Number: {num})")
-            else:
-                # Insert new essay
-                cursor.execute(
-                    """
-                    INSERT INTO essays 
-                    (title, book_id, essay_number, display_order) 
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (essay_title, self.current_book_id, num, 0)
-                )
-                essay_id = cursor.lastrowid
-                print(f"  Added new essay: {essay_title} (ID: {essay_id}, Number: {num})")
-                
-                # For each essay, create a placeholder recording
-                cursor.execute(
-                    """
-                    INSERT INTO recordings 
-                    (essay_id, title, date_added) 
-                    VALUES (?, ?, ?)
-                    """,
-                    (essay_id, f"Recording of {essay_title}", datetime.now().isoformat())
-                )
+            # Queue the essay in the book's section
+            sync.add_essay(num, essay_title, 0)
 
 def main():
     print("Adidam EOH Table Importer")
@@ -0,0 +1,355 @@
+import argparse
+import hashlib
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from db_migrations import migrate
+from file_index import stat_signature
+
+# Precomputes waveform peaks of the recordings' audio so the player can
+# draw a seek bar waveform without decoding anything:
+#
+#   python waveform_peaks.py --db adidam_recordings.db --dest waveforms
+#
+# Each file is decoded once (WAV directly, anything else through ffmpeg,
+# resampled to mono at DECODE_RATE) and reduced with NumPy to min/max
+# pairs per bucket, BUCKETS_PER_SECOND at the finest level and
+# ZOOM_FACTOR times coarser at each further level. The pairs are stored
+# as int8 in a .peaks file:
+#
+#   header  '<4sHHIQ'  b'PEAK', version, level count, sample rate, total samples
+#   levels  '<IIQ'     samples per bucket, bucket count, data offset (one per level)
+#   data    int8       min, max, min, max, ... per level
+#
+# Reading them (PeaksFile) only needs mmap, not NumPy, so a long
+# recording's peaks are paged in as they are drawn. Files that can't be
+# decoded are recorded with their error and skipped until they change.
+
+MAGIC = b'PEAK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQ')
+LEVEL = struct.Struct('<IIQ')
+
+BUCKETS_PER_SECOND = 50
+ZOOM_FACTOR = 4
+LEVELS = 4
+
+# Sample rate audio is decoded at through ffmpeg; plenty for drawing
+DECODE_RATE = 8000
+
+# Samples decoded at a time
+DECODE_BLOCK = 256 * 1024
+
+FFMPEG = 'ffmpeg'
+
+WAVEFORM_DIR = 'waveforms'
+
+def _wav_blocks(path):
+    """(sample rate, mono int16 blocks) of a PCM WAV file"""
+    wav = wave.open(path, 'rb')
+    channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+    if width not in (1, 2, 3, 4):
+        wav.close()
+        raise ValueError(f"unsupported WAV sample width {width}")
+
+    def blocks():
+        with wav:
+            while True:
+                data = wav.readframes(DECODE_BLOCK)
+                if not data:
+                    return
+                if width == 1:
+                    samples = (np.frombuffer(data, np.uint8).astype(np.int16) - 128) << 8
+                elif width == 2:
+                    samples = np.frombuffer(data, '<i2')
+                elif width == 3:
+                    # The top two bytes of each 24-bit sample
+                    samples = np.frombuffer(data, np.uint8).reshape(-1, 3)[:, 1:].copy().view('<i2').ravel()
+                else:
+                    samples = (np.frombuffer(data, '<i4') >> 16).astype(np.int16)
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                yield samples
+    return rate, blocks()
+
+def _ffmpeg_blocks(path):
+    """(DECODE_RATE, mono int16 blocks) of any file ffmpeg can decode"""
+    if shutil.which(FFMPEG) is None:
+        raise ValueError("ffmpeg is needed to decode anything but WAV")
+
+    def blocks():
+        process = subprocess.Popen([FFMPEG, '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1',
+                                    '-ar', str(DECODE_RATE), '-'],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while True:
+                data = process.stdout.read(DECODE_BLOCK * 2)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) // 2 * 2], '<i2')
+        finally:
+            process.stdout.close()
+            error = process.stderr.read().decode('utf-8', 'replace').strip()
+            process.stderr.close()
+            if process.wait() != 0:
+                raise ValueError(f"ffmpeg failed: {error.splitlines()[-1] if error else process.returncode}")
+    return DECODE_RATE, blocks()
+
+def decode(path):
+    """(sample rate, iterator of mono int16 NumPy blocks) of an audio file"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        try:
+            return _wav_blocks(path)
+        except (wave.Error, ValueError):
+            pass  # e.g. a compressed WAV; let ffmpeg have it
+    return _ffmpeg_blocks(path)
+
+def _reduce(mins, maxs, factor):
+    """Combine every factor buckets into one"""
+    pad = -len(mins) % factor
+    if pad:
+        mins = np.concatenate([mins, np.repeat(mins[-1:], pad)])
+        maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad)])
+    return mins.reshape(-1, factor).min(axis=1), maxs.reshape(-1, factor).max(axis=1)
+
+def compute_peaks(path):
+    """(sample rate, total samples, [(samples per bucket, mins, maxs), ...]) of an audio file
+
+    The finest level comes first; mins and maxs are int8 arrays.
+    """
+    sample_rate, blocks = decode(path)
+    bucket = max(1, sample_rate // BUCKETS_PER_SECOND)
+    mins, maxs = [], []
+    total = 0
+    carry = np.empty(0, np.int16)
+    for block in blocks:
+        total += len(block)
+        samples = np.concatenate([carry, block]) if len(carry) else block
+        whole = len(samples) // bucket * bucket
+        if whole:
+            buckets = samples[:whole].reshape(-1, bucket)
+            mins.append(buckets.min(axis=1))
+            maxs.append(buckets.max(axis=1))
+        carry = samples[whole:]
+    if len(carry):
+        mins.append(carry.min(keepdims=True))
+        maxs.append(carry.max(keepdims=True))
+    if not mins:
+        raise ValueError("no audio decoded")
+
+    # int16 -> int8: the top byte
+    level_mins = (np.concatenate(mins) >> 8).astype(np.int8)
+    level_maxs = (np.concatenate(maxs) >> 8).astype(np.int8)
+    levels = [(bucket, level_mins, level_maxs)]
+    for _ in range(LEVELS - 1):
+        if len(level_mins) <= 1:
+            break
+        level_mins, level_maxs = _reduce(level_mins, level_maxs, ZOOM_FACTOR)
+        bucket *= ZOOM_FACTOR
+        levels.append((bucket, level_mins, level_maxs))
+    return sample_rate, total, levels
+
+def write_peaks(path, sample_rate, total, levels):
+    """Write a .peaks file (atomically, via a temporary file next to it)"""
+    offset = HEADER.size + LEVEL.size * len(levels)
+    table = []
+    for bucket, mins, maxs in levels:
+        table.append(LEVEL.pack(bucket, len(mins), offset))
+        offset += len(mins) * 2
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(levels), sample_rate, total))
+        f.write(b''.join(table))
+        for bucket, mins, maxs in levels:
+            pairs = np.empty(len(mins) * 2, np.int8)
+            pairs[0::2] = mins
+            pairs[1::2] = maxs
+            f.write(pairs.tobytes())
+    os.replace(temp_path, path)
+
+class PeaksFile:
+    """A memory-mapped .peaks file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.sample_rate, self.total_samples = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mmap.close()
+            raise ValueError(f"{path} isn't a version {VERSION} peaks file")
+        # (samples per bucket, bucket count, offset), finest first
+        self.levels = [LEVEL.unpack_from(self.mmap, HEADER.size + index * LEVEL.size) for index in range(count)]
+
+    @property
+    def duration(self):
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
+
+    def choose_level(self, buckets):
+        """The coarsest level with at least buckets buckets (the finest if none has)"""
+        for index in range(len(self.levels) - 1, -1, -1):
+            if self.levels[index][1] >= buckets:
+                return index
+        return 0
+
+    def peaks(self, level):
+        """bytes of interleaved int8 min/max pairs of a level (np.frombuffer(..., np.int8) for an array)"""
+        bucket, count, offset = self.levels[level]
+        return self.mmap[offset:offset + count * 2]
+
+    def columns(self, width, start=0.0, end=1.0):
+        """(min, max) per pixel column for drawing the fraction start-end of the recording"""
+        width = max(1, int(width))
+        level = self.choose_level(int(width / max(end - start, 1e-9)))
+        bucket, count, offset = self.levels[level]
+        first = offset + int(start * count) * 2
+        span = max(1, int((end - start) * count))
+        with memoryview(self.mmap) as view:
+            data = view[first:first + span * 2].cast('b')
+            mins, maxs = data[0::2], data[1::2]
+            span = len(mins)
+            columns = []
+            for x in range(width):
+                a = x * span // width
+                b = max(a + 1, (x + 1) * span // width)
+                if a >= span:
+                    break
+                columns.append((min(mins[a:b]), max(maxs[a:b])))
+            data.release()
+        return columns
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def peaks_path_for(file_path, dest_dir=WAVEFORM_DIR):
+    """Where the peaks of an audio file go"""
+    name = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.abspath(os.path.join(dest_dir, name + '.peaks'))
+
+def build_waveform(job):
+    """Worker: (file path, peaks path, duration, stat signature, error) for a (file path, peaks path) job"""
+    file_path, peaks_path = job
+    signature = stat_signature(file_path)
+    try:
+        if signature is None:
+            raise ValueError("file not found")
+        sample_rate, total, levels = compute_peaks(file_path)
+        write_peaks(peaks_path, sample_rate, total, levels)
+        return file_path, peaks_path, total / sample_rate, signature, None
+    except Exception as e:
+        return file_path, peaks_path, None, signature, str(e) or type(e).__name__
+
+def waveform_for(conn, file_path):
+    """Peaks file of a recording's audio (None if it hasn't been computed)"""
+    try:
+        row = conn.execute("SELECT peaks_path FROM waveforms WHERE file_path = ? AND error IS NULL",
+                           (file_path,)).fetchone()
+    except sqlite3.OperationalError:
+        # Not migrated yet: no waveforms computed
+        return None
+    return row[0] if row and os.path.exists(row[0]) else None
+
+def compute_waveforms(db_path='adidam_recordings.db', dest_dir=WAVEFORM_DIR, workers=None, recompute=False,
+                      batch_size=50):
+    """Compute the peaks of every local recording file that is new or has changed since
+
+    Files that failed before are retried once they change (or with
+    recompute). Returns (files computed, files that failed).
+    """
+    if np is None:
+        print("NumPy is needed to compute waveforms (pip install numpy)")
+        return 0, 0
+
+    start_time = time.perf_counter()
+    os.makedirs(dest_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT file_path FROM recordings
+            WHERE file_path IS NOT NULL AND file_path != ''
+            AND file_path NOT LIKE 'http://%' AND file_path NOT LIKE 'https://%'
+        """)
+        paths = [path for (path,) in cursor.fetchall()]
+        cursor.execute("SELECT file_path, peaks_path, size, mtime_ns, error FROM waveforms")
+        computed = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        jobs = []
+        failed_before = 0
+        for path in paths:
+            known = computed.get(path)
+            signature = stat_signature(path)
+            if not recompute and known and signature and tuple(known[1:3]) == signature[:2]:
+                if known[3]:
+                    failed_before += 1
+                    continue
+                if os.path.exists(known[0]):
+                    continue
+            jobs.append((path, peaks_path_for(path, dest_dir)))
+        print(f"Computing waveforms of {len(jobs)} files ({len(paths) - len(jobs) - failed_before} up to date, "
+              f"{failed_before} unchanged since they failed)")
+
+        insert = """
+            INSERT OR REPLACE INTO waveforms (file_path, peaks_path, size, mtime_ns, duration, date_computed, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        done = failed = 0
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, peaks_path, duration, signature, error in pool.map(build_waveform, jobs):
+                if error is not None:
+                    print(f"  Skipping {path}: {error}")
+                    failed += 1
+                    if signature is None:
+                        continue
+                rows.append((path, peaks_path, signature[0], signature[1], duration,
+                             datetime.now().isoformat(), error))
+                if error is None:
+                    done += 1
+                if len(rows) >= batch_size:
+                    conn.executemany(insert, rows)
+                    conn.commit()
+                    rows = []
+        if rows:
+            conn.executemany(insert, rows)
+            conn.commit()
+
+        print(f"Computed {done} waveforms ({failed} failed) in {time.perf_counter() - start_time:.1f}s")
+        return done, failed
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute waveform peaks of the recordings for the player")
+    parser.add_argument("--db", default="adidam_recordings.db", help="Recordings database")
+    parser.add_argument("--dest", default=WAVEFORM_DIR, help="Directory for the .peaks files")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--recompute", action="store_true", help="Recompute waveforms that are up to date or failed before too")
+    args = parser.parse_args()
+
+    compute_waveforms(args.db, args.dest, args.workers, args.recompute)
+
+if __name__ == "__main__":
+    main()
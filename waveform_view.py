@@ -0,0 +1,74 @@
+import tkinter as tk
+
+from waveform_peaks import PeaksFile
+
+class WaveformCanvas(tk.Canvas):
+    """Seek bar drawing a recording's precomputed peaks (see waveform_peaks.py)
+
+    load() takes a .peaks file; set_position() moves the playhead (0-1);
+    clicking or dragging calls command with the fraction clicked.
+    """
+
+    def __init__(self, parent, command=None, color="#9FB4F0", played_color="white", **kwargs):
+        kwargs.setdefault('height', 48)
+        kwargs.setdefault('highlightthickness', 0)
+        super().__init__(parent, **kwargs)
+        self.command = command
+        self.color = color
+        self.played_color = played_color
+        self.peaks = None
+        self.position = 0.0
+        self.bind('<Configure>', lambda event: self.redraw())
+        self.bind('<Button-1>', self.on_click)
+        self.bind('<B1-Motion>', self.on_click)
+
+    def load(self, peaks_path):
+        """Show the peaks in peaks_path (None to clear the waveform)"""
+        if self.peaks is not None:
+            self.peaks.close()
+            self.peaks = None
+        if peaks_path:
+            try:
+                self.peaks = PeaksFile(peaks_path)
+            except (OSError, ValueError):
+                self.peaks = None
+        self.position = 0.0
+        self.redraw()
+
+    def redraw(self):
+        self.delete('all')
+        width, height = self.winfo_width(), self.winfo_height()
+        if self.peaks is None or width <= 1:
+            self.create_line(0, height // 2, width, height // 2, fill=self.color)
+            return
+
+        # One polygon: the maxima left to right, then the minima back
+        middle = height / 2
+        scale = (height / 2 - 1) / 128
+        columns = self.peaks.columns(width)
+        top = [coord for x, (low, high) in enumerate(columns) for coord in (x, middle - high * scale)]
+        bottom = [coord for x, (low, high) in reversed(list(enumerate(columns)))
+                  for coord in (x, middle - low * scale + 1)]
+        self.create_polygon(top + bottom, fill=self.color, outline=self.color, tags='wave')
+        self.create_line(0, 0, 0, height, fill=self.played_color, width=2, tags='playhead')
+        self.set_position(self.position)
+
+    def set_position(self, fraction):
+        """Move the playhead to a fraction (0-1) of the recording"""
+        self.position = min(1.0, max(0.0, fraction))
+        x = self.position * self.winfo_width()
+        self.coords('playhead', x, 0, x, self.winfo_height())
+
+    def on_click(self, event):
+        width = self.winfo_width()
+        if self.peaks is None or width <= 1:
+            return
+        self.set_position(event.x / width)
+        if self.command is not None:
+            self.command(self.position)
+
+    def destroy(self):
+        if self.peaks is not None:
+            self.peaks.close()
+            self.peaks = None
+        super().destroy()